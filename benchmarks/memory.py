@@ -0,0 +1,51 @@
+'''
+Measures the per-Blob memory overhead and the cost of block-heavy Blob
+workloads such as split(size=1).
+
+Run with: python benchmarks/memory.py [size_in_bytes]
+'''
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import blob  # noqa: E402
+
+
+def blob_overhead(n=100000):
+    '''
+    Returns the number of bytes that each Blob object takes, not counting the
+    data it holds.
+    '''
+    chunks = [ os.urandom(16) for _ in range(n) ]
+    blobs = [ None ] * n
+
+    tracemalloc.start()
+    for i, c in enumerate(chunks):
+        blobs[i] = blob.Blob(data=c)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return used / n
+
+
+def split_time(size, blocksize):
+    b = blob.Blob(data=os.urandom(size))
+    start = time.perf_counter()
+    blocks = b.split(size=blocksize)
+    return len(blocks), time.perf_counter() - start
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1 << 20
+    print("%.1f bytes of overhead per Blob" % blob_overhead())
+    for blocksize in (1, 16):
+        n, t = split_time(size, blocksize)
+        print("split(size=%d) on %d bytes: %d blobs in %.3fs" % (blocksize, size, n, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,426 @@
+'''
+Throughput benchmarks for the core Blob operations and for pyecm.
+
+Run with: python benchmarks/suite.py [--sizes 1K,64K,1M] [--repeat 3]
+          [--filter split] [--json results.json] [--compare baseline.json]
+
+Every size-based benchmark runs on the same pseudo-random data for each size
+(from 1K up to 1G, or plain byte counts), and reports the best and mean of
+--repeat runs. Benchmarks that would need far too much memory or time at some
+size (e.g., a bit string of a gigabyte, or one Blob per byte) have a size
+limit, which --no-limits lifts. pyecm benchmarks factor a fixed set of
+semiprimes instead: with each of its ECM engines alone, and with the quick
+methods (Fermat, rho, p-1, p+1) that run before ECM by default; and larger
+ones with its quadratic sieve.
+
+--json writes the results for later comparison, and --compare prints the
+ratio of every result to the matching one in an earlier JSON file.
+
+The same benchmarks also run under pytest-benchmark, if it is installed:
+pytest benchmarks/test_suite.py (BLOB_BENCH_SIZES picks the sizes).
+'''
+
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import blob  # noqa: E402
+from blob import utils  # noqa: E402
+from blob.pyecm import pyecm  # noqa: E402
+import blob.blob as bb  # noqa: E402
+
+KB = 1 << 10
+MB = 1 << 20
+GB = 1 << 30
+
+DEFAULT_SIZES = (KB, 64 * KB, MB)
+
+# (digits, p, q): products of two primes of the same size
+SEMIPRIMES = (
+    (16, 30000023, 70000027),
+    (20, 3000000019, 7000000001),
+    (24, 300000000077, 700000000009),
+    (28, 30000000000011, 70000000000009),
+)
+
+# (digits, p, q): semiprimes for the quadratic sieve
+SIQS_SEMIPRIMES = (
+    (40, 30000000000000000041, 70000000000000000013),
+    (50, 3000000000000000000000007, 7000000000000000000000061),
+)
+
+Benchmark = collections.namedtuple('Benchmark', 'name setup max_size needs')
+BENCHMARKS = [ ]
+
+
+def benchmark(name, max_size=None, needs=None):
+    '''
+    Registers a data benchmark. The decorated function takes the data and
+    returns the function to time, so that its own setup isn't timed.
+
+    @param max_size: the largest data size to run on, without --no-limits
+    @param needs: the name of an optional module that the benchmark needs
+    '''
+    def register(f):
+        BENCHMARKS.append(Benchmark(name, f, max_size, needs))
+        return f
+    return register
+
+
+def parse_size(s):
+    s = s.strip().upper().rstrip('B')
+    units = { 'K': KB, 'M': MB, 'G': GB }
+    if s[-1:] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+
+def format_size(n):
+    for unit, size in (('G', GB), ('M', MB), ('K', KB)):
+        if n >= size and n % size == 0:
+            return '%d%s' % (n // size, unit)
+    return str(n)
+
+
+def make_data(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+
+def available(needs):
+    return needs is None or not getattr(bb, '_%s_fail' % needs)
+
+#
+# bit strings
+#
+
+@benchmark('to_bitstr', max_size=64 * MB)
+def bench_to_bitstr(data):
+    return lambda: utils.to_bitstr(data)
+
+
+@benchmark('from_bitstr', max_size=64 * MB)
+def bench_from_bitstr(data):
+    bits = utils.to_bitstr(data)
+    return lambda: utils.from_bitstr(bits)
+
+#
+# bitwise ops (_op_str)
+#
+
+@benchmark('xor_str')
+def bench_xor(data):
+    other = make_data(len(data), 1)
+    return lambda: utils.xor_str(data, other)
+
+
+@benchmark('xor_str[16-byte key]')
+def bench_xor_key(data):
+    key = make_data(16, 1)
+    return lambda: utils.xor_str(data, key)
+
+
+@benchmark('and_str')
+def bench_and(data):
+    other = make_data(len(data), 1)
+    return lambda: utils.and_str(data, other)
+
+
+@benchmark('or_str')
+def bench_or(data):
+    other = make_data(len(data), 1)
+    return lambda: utils.or_str(data, other)
+
+
+@benchmark('not_str')
+def bench_not(data):
+    return lambda: utils.not_str(data)
+
+#
+# splitting
+#
+
+@benchmark('split[size=1]', max_size=4 * MB)
+def bench_split_bytes(data):
+    return lambda: blob.Blob(data).split(size=1)
+
+
+@benchmark('split[size=16]', max_size=64 * MB)
+def bench_split_blocks(data):
+    return lambda: blob.Blob(data).split(size=16)
+
+
+@benchmark('split[size_bits=12]', max_size=16 * MB)
+def bench_split_bits(data):
+    return lambda: blob.Blob(data).split(size_bits=12)
+
+
+@benchmark('split[n=64]')
+def bench_split_n(data):
+    return lambda: blob.Blob(data).split(n=64)
+
+
+@benchmark('split[sep]', max_size=256 * MB)
+def bench_split_sep(data):
+    return lambda: blob.Blob(data).split(sep=b'\n')
+
+
+@benchmark('split[sep_bits]', max_size=16 * MB)
+def bench_split_sep_bits(data):
+    return lambda: blob.Blob(data).split(sep_bits='01010101')
+
+#
+# conversions
+#
+
+@benchmark('unpack[<I]', max_size=64 * MB)
+def bench_unpack_uint(data):
+    d = data[:len(data) // 4 * 4]
+    return lambda: blob.Blob(d).unpack('<I')
+
+
+@benchmark('unpack[>Q]', max_size=64 * MB)
+def bench_unpack_ulonglong(data):
+    d = data[:len(data) // 8 * 8]
+    return lambda: blob.Blob(d).unpack('>Q')
+
+#
+# statistics
+#
+
+@benchmark('entropy[blocksize=1]', needs='scipy')
+def bench_entropy(data):
+    return lambda: blob.Blob(data).entropy(blocksize=1)
+
+
+@benchmark('entropy[blocksize=2]', max_size=16 * MB, needs='scipy')
+def bench_entropy_pairs(data):
+    return lambda: blob.Blob(data).entropy(blocksize=2)
+
+
+@benchmark('chisquare[blocksize=1]', needs='scipy')
+def bench_chisquare(data):
+    return lambda: blob.Blob(data).chisquare(blocksize=1)
+
+
+@benchmark('analyze', max_size=256 * MB)
+def bench_analyze(data):
+    return lambda: blob.Blob(data).analyze()
+
+
+def autocorrelation_crossover(n, values):
+    '''
+    The max_shift at which Blob.autocorrelation's cost model rates comparing
+    the shifts and the FFTs the same (at most n - 1). If the model is right,
+    the two autocorrelation[...] benchmarks of each pair take about as long.
+    '''
+    size = bb._autocorrelation_fft_size(n)
+    fft = bb._AUTOCORRELATION_FFT_COST * values * size * size.bit_length()
+    return max(1, min(n - 1, fft // (bb._AUTOCORRELATION_SHIFT_COST + n)))
+
+
+def bench_autocorrelation(values, fft):
+    def setup(data):
+        a = bb.numpy.frombuffer(bytes(b % values for b in data), dtype=bb.numpy.uint8)
+        k = autocorrelation_crossover(len(a), values)
+        if fft:
+            return lambda: bb._autocorrelation_fft(a, range(values), k)
+        return lambda: bb._autocorrelation_direct(a, k)
+    return setup
+
+
+for _values, _max_size in ((4, 4 * MB), (64, 256 * KB)):
+    for _fft in (False, True):
+        benchmark(
+            'autocorrelation[%d values, %s]' % (_values, 'fft' if _fft else 'shifts'),
+            max_size=_max_size, needs='numpy',
+        )(bench_autocorrelation(_values, _fft))
+
+#
+# blocks and rotations
+#
+
+@benchmark('rotating_xors', max_size=16 * KB)
+def bench_rotating_xors(data):
+    def run():
+        for _ in blob.Blob(data).rotating_xors():
+            pass
+    return run
+
+
+@benchmark('blocksize_candidates')
+def bench_blocksize_candidates(data):
+    return lambda: blob.Blob(data).blocksize_candidates()
+
+#
+# pyecm
+#
+
+# (name, engine, quick stages) for the pyecm benchmarks
+PYECM_CONFIGS = (
+    ('weierstrass', 'weierstrass', ()),
+    ('montgomery', 'montgomery', ()),
+    ('quick+montgomery', 'montgomery', None),
+)
+
+
+def bench_factors(n, engine='weierstrass', stages=()):
+    return lambda: sorted(pyecm.factors(n, False, False, 10, 1, engine, stages))
+
+
+def bench_siqs(n):
+    return lambda: pyecm.siqs(n, False)
+
+#
+# running
+#
+
+def time_it(f, repeat):
+    times = [ ]
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def run(sizes=DEFAULT_SIZES, repeat=3, pattern=None, limits=True, ecm=True, log=None):
+    '''
+    Runs the benchmarks.
+
+    @param sizes: the data sizes, in bytes
+    @param repeat: the number of runs of every benchmark
+    @param pattern: only run the benchmarks whose name contains this
+    @param limits: skip sizes above each benchmark's size limit
+    @param ecm: also run the pyecm benchmarks
+    @param log: a function to call with every result as it comes in
+
+    @returns a list of result dicts
+    '''
+    results = [ ]
+
+    def record(r):
+        results.append(r)
+        if log is not None:
+            log(r)
+
+    for size in sizes:
+        data = make_data(size)
+        for b in BENCHMARKS:
+            if pattern is not None and pattern not in b.name:
+                continue
+            r = { 'name': b.name, 'size': size }
+            if not available(b.needs):
+                r['skipped'] = "%s is not installed" % b.needs
+            elif limits and b.max_size is not None and size > b.max_size:
+                r['skipped'] = "above the %s size limit" % format_size(b.max_size)
+            else:
+                best, mean = time_it(b.setup(data), repeat)
+                r.update(best=best, mean=mean, mb_per_s=size / MB / best if best else None)
+            record(r)
+        del data
+
+    if ecm:
+        for config, engine, stages in PYECM_CONFIGS:
+            for digits, p, q in SEMIPRIMES:
+                name = 'pyecm.factors[%s, %d digits]' % (config, digits)
+                if pattern is not None and pattern not in name:
+                    continue
+                f = bench_factors(p * q, engine, stages)
+                if f() != [ p, q ]:
+                    raise RuntimeError("pyecm failed to factor %d" % (p * q))
+                best, mean = time_it(f, repeat)
+                record({ 'name': name, 'size': None, 'best': best, 'mean': mean })
+        for digits, p, q in SIQS_SEMIPRIMES:
+            name = 'pyecm.siqs[%d digits]' % digits
+            if pattern is not None and pattern not in name:
+                continue
+            f = bench_siqs(p * q)
+            if f() not in (p, q):
+                raise RuntimeError("pyecm.siqs failed to factor %d" % (p * q))
+            best, mean = time_it(f, repeat)
+            record({ 'name': name, 'size': None, 'best': best, 'mean': mean })
+
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': not bb._numpy_fail,
+        'scipy': not bb._scipy_fail,
+        'gmpy': pyecm.GMPY_EXISTS,
+        'pyecm_inv_c': pyecm.INV_C,
+        'pyecm_inv_c_measured': pyecm.measure_inv_c(),
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def describe(r):
+    size = '' if r['size'] is None else format_size(r['size'])
+    if 'skipped' in r:
+        return "%-40s %6s  skipped (%s)" % (r['name'], size, r['skipped'])
+    rate = "  %9.1f MB/s" % r['mb_per_s'] if r.get('mb_per_s') else ''
+    return "%-40s %6s  %10.6fs best  %10.6fs mean%s" % (r['name'], size, r['best'], r['mean'], rate)
+
+
+def compare(results, baseline, threshold=0.1):
+    '''
+    Prints how every result compares to the matching result in a baseline.
+    Ratios are new time / old time, so > 1 is slower.
+    '''
+    old = { (r['name'], r['size']): r for r in baseline['results'] if 'best' in r }
+    for r in results:
+        o = old.get((r['name'], r['size']))
+        if o is None or 'best' not in r:
+            continue
+        ratio = r['best'] / o['best'] if o['best'] else float('inf')
+        flag = 'SLOWER' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else ''
+        size = '' if r['size'] is None else format_size(r['size'])
+        print("%-40s %6s  %6.2fx  %s" % (r['name'], size, ratio, flag))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the core Blob operations and pyecm.")
+    parser.add_argument('--sizes', default=','.join(format_size(s) for s in DEFAULT_SIZES),
+                        help="comma-separated data sizes, e.g. 1K,1M,1G (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark (default: %(default)s)")
+    parser.add_argument('--filter', help="only run benchmarks whose name contains this")
+    parser.add_argument('--no-limits', action='store_true', help="ignore the per-benchmark size limits")
+    parser.add_argument('--no-ecm', action='store_true', help="skip the pyecm benchmarks")
+    parser.add_argument('--json', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare the results to this earlier JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(
+        sizes=[ parse_size(s) for s in args.sizes.split(',') ],
+        repeat=args.repeat,
+        pattern=args.filter,
+        limits=not args.no_limits,
+        ecm=not args.no_ecm,
+        log=lambda r: print(describe(r), flush=True),
+    )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({ 'environment': environment(), 'repeat': args.repeat, 'results': results }, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        compare(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Runs the benchmarks in suite.py under pytest-benchmark:
+
+    pytest benchmarks/test_suite.py [--benchmark-json results.json]
+
+The data sizes come from BLOB_BENCH_SIZES (default: 1K,64K,1M).
+'''
+
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import suite  # noqa: E402
+
+SIZES = [ suite.parse_size(s) for s in os.environ.get('BLOB_BENCH_SIZES', '1K,64K,1M').split(',') ]
+_data = { }
+
+
+def data(size):
+    if size not in _data:
+        _data[size] = suite.make_data(size)
+    return _data[size]
+
+
+@pytest.mark.parametrize("size", SIZES, ids=suite.format_size)
+@pytest.mark.parametrize("bench", suite.BENCHMARKS, ids=lambda b: b.name)
+def test_blob(benchmark, bench, size):
+    if not suite.available(bench.needs):
+        pytest.skip("%s is not installed" % bench.needs)
+    if bench.max_size is not None and size > bench.max_size:
+        pytest.skip("above the %s size limit" % suite.format_size(bench.max_size))
+    benchmark.extra_info['size'] = size
+    benchmark(bench.setup(data(size)))
+
+
+@pytest.mark.parametrize("digits,p,q", suite.SEMIPRIMES, ids=lambda x: str(x))
+@pytest.mark.parametrize("config,engine,stages", suite.PYECM_CONFIGS, ids=lambda x: x if isinstance(x, str) else '')
+def test_pyecm_factors(benchmark, config, engine, stages, digits, p, q):
+    assert benchmark(suite.bench_factors(p * q, engine, stages)) == [ p, q ]
+
+
+@pytest.mark.parametrize("digits,p,q", suite.SIQS_SEMIPRIMES, ids=lambda x: str(x))
+def test_pyecm_siqs(benchmark, digits, p, q):
+    assert benchmark(suite.bench_siqs(p * q)) in (p, q)
@@ -1,4 +1,7 @@
 from .blob import Blob
 from . import utils as utils
+from . import modes as modes
+from . import ecc as ecc
+from . import instrument as instrument
 
 B = Blob
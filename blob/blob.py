@@ -1,9 +1,18 @@
 import os
+import re
+import sys
+import copy
+import math
+import zlib
 import struct
+import hashlib
+import binascii
+import weakref
 import operator
 import functools
 import itertools
 import collections
+import concurrent.futures
 
 try:
     import scipy.stats
@@ -11,19 +20,219 @@ try:
 except ImportError:
     _scipy_fail = True
 
+try:
+    import numpy
+    _numpy_fail = False
+except ImportError:
+    _numpy_fail = True
+
 try:
     import mulpyplexer
     _mp_fail = False
 except ImportError:
     _mp_fail = True
 
+try:
+    import multiprocessing
+    from multiprocessing import shared_memory, resource_tracker
+    _shm_fail = False
+except ImportError:
+    _shm_fail = True
+
+# shared memory segments attached by this process, keyed by name, so that
+# every Blob unpickled from the same segment shares a single mapping
+_shm_segments = weakref.WeakValueDictionary()
+
+def _get_shared_memory(name):
+    if _shm_fail:
+        raise BlobError("shared memory is not supported on this platform!")
+
+    shm = _shm_segments.get(name)
+    if shm is None:
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError: # python < 3.13 has no track argument
+            shm = shared_memory.SharedMemory(name=name)
+            # and registers the segment with this process' resource tracker,
+            # which unlinks it when the process exits. Workers started by
+            # multiprocessing share the creator's tracker, so that's harmless
+            # for them, but other processes have to unregister it.
+            if os.name == 'posix' and multiprocessing.parent_process() is None:
+                resource_tracker.unregister(shm._name, 'shared_memory')
+        _shm_segments[name] = shm
+    return shm
+
+def _attach_shared_memory(name, offset, length):
+    return Blob._from_shared_memory(_get_shared_memory(name), offset, length)
+
+def _unpickle_blob(data, filename=None):
+    b = Blob._from_data(data)
+    if filename is not None:
+        b.filename = filename
+    return b
+
+_new = object.__new__
+
+_HASH_CHUNK = 1 << 24
+_HISTOGRAM_CHUNK = 1 << 20
+
+# units from this size on are (de)interleaved by joining slices, rather than
+# with one strided copy per byte of a unit
+_STRIPE_JOIN_UNIT = 128
+
+# the estimated costs of autocorrelation, in byte comparisons: comparing the
+# shifts directly costs this much overhead per shift (on top of one comparison
+# per byte), and the FFTs this much per distinct byte value, FFT point, and
+# bit of the FFT size. The autocorrelation[...] benchmarks in
+# benchmarks/suite.py time both at the crossover that these predict.
+_AUTOCORRELATION_SHIFT_COST = 9000
+_AUTOCORRELATION_FFT_COST = 12
+
+# Blobs longer than this many bytes (or bits, if unaligned) are shown in
+# repr() by only their first and last _REPR_EDGE bytes (or bits)
+_REPR_LIMIT = 64
+_REPR_EDGE = 16
+
+# hexdump lines are rendered this many at a time, with unprintable bytes
+# translated to '.' in the ASCII column
+_HEXDUMP_CHUNK_LINES = 1024
+_HEXDUMP_ASCII = bytes(c if 0x20 <= c < 0x7f else 0x2e for c in range(256))
+
+# key lengths for repeating-key XOR that score within this many standard
+# deviations (of the fraction of differing bits) of one of their multiples
+# are ranked ahead of it
+_XOR_KEYSIZE_NOISE = 1.25
+
+# running checksum functions and their initial values
+_CHECKSUMS = {
+    'crc32': (zlib.crc32, 0),
+    'adler32': (zlib.adler32, 1),
+    'crc_hqx': (binascii.crc_hqx, 0),
+}
+
+def _hash_constructor(algo):
+    # the named constructors skip hashlib.new()'s lookup on every call
+    c = getattr(hashlib, algo, None)
+    if callable(c) and algo in hashlib.algorithms_available:
+        return c
+    if algo not in hashlib.algorithms_available:
+        raise BlobError("unsupported hash algorithm %r" % algo)
+    return functools.partial(hashlib.new, algo)
+
+def _byte_histogram(v):
+    if not _numpy_fail:
+        # bincount widens its input to intp, so count in chunks to bound the
+        # temporary array instead of making one 8 times the size of v
+        a = numpy.frombuffer(v, dtype=numpy.uint8)
+        counts = numpy.zeros(256, dtype=numpy.int64)
+        for i in range(0, len(a), _HISTOGRAM_CHUNK):
+            counts += numpy.bincount(a[i:i+_HISTOGRAM_CHUNK], minlength=256)
+        return tuple(counts.tolist())
+    counts = collections.Counter(v)
+    return tuple(counts.get(i, 0) for i in range(256))
+
+def _autocorrelation_fft_size(n):
+    # big enough that the circular correlation doesn't wrap around
+    return 1 << (2 * n - 1).bit_length()
+
+def _autocorrelation_uses_fft(n, values, max_shift):
+    '''
+    Whether the FFTs of the indicators of the given number of distinct values
+    are expected to be cheaper than comparing max_shift shifts of n bytes.
+    '''
+    size = _autocorrelation_fft_size(n)
+    direct = max_shift * (_AUTOCORRELATION_SHIFT_COST + n)
+    return direct > _AUTOCORRELATION_FFT_COST * values * size * size.bit_length()
+
+def _autocorrelation_direct(a, max_shift):
+    return [ len(a) ] + [ int(numpy.count_nonzero(a[:-k] == a[k:])) for k in range(1, max_shift + 1) ]
+
+def _autocorrelation_fft(a, values, max_shift):
+    # the autocorrelation of each value's indicator counts its matches, and
+    # the sum of those is the inverse FFT of the summed power spectra
+    size = _autocorrelation_fft_size(len(a))
+    power = numpy.zeros(size // 2 + 1)
+    for v in values:
+        f = numpy.fft.rfft((a == v).astype(numpy.float64), size)
+        power += f.real ** 2 + f.imag ** 2
+    return [ int(c) for c in numpy.rint(numpy.fft.irfft(power, size)[:max_shift + 1]) ]
+
+def _duplicate_blocks(d, sizes):
+    '''
+    Counts the aligned blocks of each size that repeat an earlier block, and
+    finds the offsets of the blocks that have a duplicate. A duplicate block is
+    made of duplicate sub-blocks, so when a size is a multiple of a smaller
+    one, only the blocks whose sub-blocks all have duplicates are compared.
+    '''
+    duplicates = { }
+    found = { }
+    for size in sorted(set(sizes)):
+        end = len(d) // size * size
+        base = next((s for s in sorted(found, reverse=True) if size % s == 0), None)
+
+        if base is None and size == 8 and not _numpy_fail:
+            a = numpy.frombuffer(d, dtype=numpy.uint64, count=end // 8)
+            _, inverse, counts = numpy.unique(a, return_inverse=True, return_counts=True)
+            duplicates[size] = len(a) - len(counts)
+            found[size] = set((numpy.flatnonzero(counts[inverse] > 1) * 8).tolist())
+            continue
+
+        if base is None:
+            offsets = range(0, end, size)
+        else:
+            subs = found[base]
+            offsets = sorted(
+                o for o in { x - x % size for x in subs }
+                if o < end and all(o + k in subs for k in range(0, size, base))
+            )
+        blocks = [ d[o:o+size] for o in offsets ]
+        counts = collections.Counter(blocks)
+        duplicates[size] = len(blocks) - len(counts)
+        found[size] = { o for o, b in zip(offsets, blocks) if counts[b] > 1 } if duplicates[size] else set()
+
+    return duplicates, found
+
+# bytes that count as text for Blob.analyze()
+_TEXT_BYTES = (9, 10, 13) + tuple(range(0x20, 0x7f))
+
+# magic numbers of common compressed formats, which analyze() uses to tell
+# compressed data from encrypted data when their byte statistics can't
+_COMPRESSED_MAGIC = (
+    b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00', b'\x5d\x00\x00', b'PK\x03\x04',
+    b'\x28\xb5\x2f\xfd', b"7z\xbc\xaf\x27\x1c", b'\x04\x22\x4d\x18',
+    b'\x78\x01', b'\x78\x5e', b'\x78\x9c', b'\x78\xda',
+)
+
+# the chi-square statistic (with 255 degrees of freedom) above which
+# high-entropy data is considered too uneven to be encrypted, about four
+# standard deviations above its expected value for random data
+_UNIFORM_CHISQUARE_LIMIT = 350
+
+# the smallest blob that analyze() tags as encrypted or compressed
+_ANALYZE_MIN_RANDOM = 256
+
+# a byte that can't be part of any string that Blob.strings() looks for
+_STRINGS_BREAK = re.compile(rb'[^\x00\t\x20-\x7e]')
+_STRINGS_CHUNK = 1 << 24
+
+# the scipy functions that Blobs use, wrapped so that blob.instrument can time
+# them separately
+def _scipy_entropy(counts, base):
+    return scipy.stats.entropy(counts, base=base)
+
+def _scipy_chisquare(counts, f_exp):
+    return scipy.stats.chisquare(counts, f_exp=f_exp)
+
+def _scipy_chi2_sf(statistic, df):
+    return scipy.stats.chi2.sf(statistic, df)
+
 def _blobify(o):
     if isinstance(o, Blob):
         return o
     elif isinstance(o, bytes):
-        return Blob(o)
+        return Blob._from_data(o)
     elif isinstance(o, str):
-        return Blob(o.encode('latin-1'))
+        return Blob._from_data(o.encode('latin-1'))
     else:
         raise BlobError("can't blobify type %s" % type(o))
 
@@ -33,6 +242,49 @@ def _fix_other_type(f):
         return f(self, _blobify(o))
     return fixer
 
+def _split_fmt(fmt):
+    '''
+    Splits a struct format into its effective byte order and its body.
+    '''
+    if fmt[:1] in ('<', '>', '!', '=', '@'):
+        order, body = fmt[0], fmt[1:]
+    else:
+        order, body = '@', fmt
+    if order == '!':
+        order = '>'
+    elif order in ('=', '@'):
+        order = '<' if sys.byteorder == 'little' else '>'
+    return order, body.strip()
+
+class _BlobMeta(object):
+    '''
+    The rarely-needed state of a Blob. It is kept out of the Blob itself, and
+    only allocated on demand, so that block-heavy workloads (e.g.,
+    split(size=1)) only pay for the data of each Blob.
+    '''
+
+    __slots__ = (
+        'filename', 'blocksize_bits', 'alt', 'hash', 'shm', 'shm_offset', 'shm_length',
+        'tracked', 'parent', 'parent_offset', 'derivation', 'cache',
+        'generation', 'parent_generation',
+    )
+
+    def __init__(self):
+        self.filename = None
+        self.blocksize_bits = None
+        self.alt = None # the cached other representation of the data
+        self.hash = None
+        self.shm = None
+        self.shm_offset = 0
+        self.shm_length = 0
+        self.tracked = False
+        self.parent = None
+        self.parent_offset = 0 # in bits
+        self.derivation = None
+        self.cache = None # analysis results, keyed by analysis and arguments
+        self.generation = 0 # bumped whenever the data is replaced
+        self.parent_generation = 0 # the parent's generation at derivation
+
 class Blob(object):
     '''
     A Blob object enables rich operations on unstructured data. By encapsulating
@@ -43,6 +295,10 @@ class Blob(object):
 
     #pylint:disable=invalid-slice-index
 
+    # _data holds the data as either bytes or a string of bits, and _meta holds
+    # a _BlobMeta (or None)
+    __slots__ = ('_data', '_meta')
+
     def __init__(self, data=None, data_bits=None, dirname=None, filename=None):
         '''
         Initializes a Blob object. Blobs can be created from different types of
@@ -56,9 +312,10 @@ class Blob(object):
                             file. $PWD by default.
         '''
 
-        self.filename = filename
-        self._data_bits = None
-        self._data_bytes = None
+        self._data = None
+        self._meta = None
+        if filename is not None:
+            self.filename = filename
 
         if data is not None:
             if isinstance(data, str):
@@ -70,7 +327,163 @@ class Blob(object):
             if dirname is None: dirname = '.'
             with open(os.path.join(dirname, filename), 'rb') as f:
                 self.data = f.read()
-        self.blocksize_bits = None
+
+    @classmethod
+    def _from_data(cls, d):
+        '''
+        Internal fast constructor that skips __init__'s argument parsing. d
+        must already be a bytes object or a string of bits.
+        '''
+        b = _new(cls)
+        b._data = d
+        b._meta = None
+        return b
+
+    def _get_meta(self):
+        if self._meta is None:
+            self._meta = _BlobMeta()
+        return self._meta
+
+    def _reset_meta(self):
+        m = self._meta
+        if m is not None:
+            m.alt = None
+            m.hash = None
+            m.shm = None
+            m.parent = None
+            m.derivation = None
+            m.cache = None
+            m.generation += 1
+
+    @property
+    def filename(self):
+        '''
+        The name of the file that the Blob was loaded from, if any.
+        '''
+        return None if self._meta is None else self._meta.filename
+
+    @filename.setter
+    def filename(self, f):
+        self._get_meta().filename = f
+
+    @property
+    def blocksize_bits(self):
+        return None if self._meta is None else self._meta.blocksize_bits
+
+    @blocksize_bits.setter
+    def blocksize_bits(self, b):
+        self._get_meta().blocksize_bits = b
+
+    #
+    # Hierarchy
+    #
+
+    def track(self, enabled=True):
+        '''
+        Turns hierarchy tracking on (or off) for this Blob. Blobs derived from a
+        tracked Blob (by indexing and slicing, split(), offset(), truncate(), and
+        bitwise ops) record it as their parent, along with their offset in it
+        and how they were derived, and are tracked themselves.
+
+        @returns the Blob itself
+        '''
+        self._get_meta().tracked = enabled
+        return self
+
+    @property
+    def tracked(self):
+        return self._meta is not None and self._meta.tracked
+
+    @property
+    def parent(self):
+        '''
+        The tracked Blob that this Blob was derived from, or None.
+        '''
+        return None if self._meta is None else self._meta.parent
+
+    @property
+    def parent_offset(self):
+        '''
+        The offset of this Blob in its parent: an int number of bytes, or a
+        float number of bits if it doesn't start on a byte boundary. None if
+        the Blob has no parent.
+        '''
+        if self.parent is None:
+            return None
+        off = self._meta.parent_offset
+        return off // 8 if off % 8 == 0 else float(off)
+
+    @property
+    def derivation(self):
+        '''
+        How this Blob was derived from its parent: 'slice', 'stride' (a slice
+        with a step), 'split', 'xor', 'and', 'or', or 'not'. None if the Blob
+        has no parent.
+        '''
+        return None if self._meta is None else self._meta.derivation
+
+    def ancestors(self):
+        '''
+        Returns the chain of parents of this Blob, starting with its parent and
+        ending with the root of its hierarchy.
+
+        @returns a list of Blobs
+        '''
+        chain = [ ]
+        b = self.parent
+        while b is not None:
+            chain.append(b)
+            b = b.parent
+        return chain
+
+    @property
+    def root_offset(self):
+        '''
+        The offset of this Blob in the root of its hierarchy (bytes as an int,
+        or bits as a float), or None if the Blob has no parent.
+        '''
+        if self.parent is None:
+            return None
+        off = 0
+        b = self
+        while b.parent is not None:
+            off += b._meta.parent_offset
+            b = b.parent
+        return off // 8 if off % 8 == 0 else float(off)
+
+    def _derived(self, b, derivation, offset_bits=0):
+        '''
+        Records self as the parent of b, if self is tracked.
+        '''
+        m = self._meta
+        if m is not None and m.tracked:
+            bm = b._get_meta()
+            bm.tracked = True
+            bm.parent = self
+            bm.parent_offset = offset_bits
+            bm.derivation = derivation
+            bm.parent_generation = m.generation
+        return b
+
+    def _cached(self, key, f, *args):
+        '''
+        Returns the cached result of an analysis, computing it with f(*args) the
+        first time. Results live as long as the Blob (and are dropped if its
+        data is replaced). Blobs in shared memory are never cached, since other
+        processes can write to them.
+        '''
+        m = self._get_meta()
+        if m.shm is not None:
+            return f(*args)
+        if m.cache is None:
+            m.cache = { }
+        try:
+            return m.cache[key]
+        except KeyError:
+            r = m.cache[key] = f(*args)
+            return r
+        except TypeError: # unhashable arguments
+            return f(*args)
 
     #
     # Bit access
@@ -84,16 +497,29 @@ class Blob(object):
         @returns a bytes object, representing the data
         '''
 
-        if self._data_bytes is None:
-            self._data_bytes = utils.from_bitstr(self._data_bits)
-        return self._data_bytes
+        d = self._data
+        if type(d) is bytes:
+            return d
+
+        m = self._meta
+        if m is not None and m.alt is not None:
+            return m.alt
+        elif d is None and m is not None and m.shm is not None:
+            # don't keep the copy: other processes can write to the segment,
+            # and holding on to it would double this process' memory use
+            with m.shm.buf[m.shm_offset:m.shm_offset+m.shm_length] as v:
+                return bytes(v)
+        else:
+            d = utils.from_bitstr(d)
+            self._get_meta().alt = d
+            return d
 
     @data.setter
     def data(self, d):
         if isinstance(d, str):
             d = d.encode('latin-1')
-        self._data_bytes = d
-        self._data_bits = None
+        self._data = d
+        self._reset_meta()
 
     @property
     def data_bits(self):
@@ -103,14 +529,154 @@ class Blob(object):
         @returns a string of bits, representing the data
         '''
 
-        if self._data_bits is None:
-            self._data_bits = utils.to_bitstr(self._data_bytes)
-        return self._data_bits
+        d = self._data
+        if type(d) is str:
+            return d
+
+        m = self._meta
+        if m is not None and m.alt is not None:
+            return m.alt
+        d = utils.to_bitstr(self.data)
+        if m is None or m.shm is None:
+            self._get_meta().alt = d
+        return d
 
     @data_bits.setter
     def data_bits(self, d):
-        self._data_bytes = None
-        self._data_bits = d
+        self._data = d
+        self._reset_meta()
+
+    @property
+    def _data_bytes(self):
+        '''
+        The data in bytes if it is already available, or None.
+        '''
+        if type(self._data) is bytes:
+            return self._data
+        elif self._meta is not None and type(self._meta.alt) is bytes:
+            return self._meta.alt
+        return None
+
+    @property
+    def _data_bits(self):
+        '''
+        The data in bits if it is already available, or None.
+        '''
+        if type(self._data) is str:
+            return self._data
+        elif self._meta is not None and type(self._meta.alt) is str:
+            return self._meta.alt
+        return None
+
+    def _view(self):
+        '''
+        Returns a memoryview of the data, mapping shared memory directly rather
+        than copying it. Use it as a context manager, so that the view is
+        released afterwards.
+        '''
+        m = self._meta
+        if self._data is None and m is not None and m.shm is not None:
+            return m.shm.buf[m.shm_offset:m.shm_offset+m.shm_length]
+        return memoryview(self.data)
+
+    def _peek(self, start, stop):
+        '''
+        Returns bytes start:stop of a byte-aligned Blob, converting or copying
+        only that range rather than the whole data.
+        '''
+        d = self._data_bytes
+        if d is not None:
+            return d[start:stop]
+
+        m = self._meta
+        if self._data is None and m is not None and m.shm is not None:
+            start, stop, _ = slice(start, stop).indices(m.shm_length)
+            with m.shm.buf[m.shm_offset+start:m.shm_offset+max(start, stop)] as v:
+                return bytes(v)
+
+        return utils.from_bitstr(self._data[start*8:stop*8])
+
+    @property
+    def _bytes_backed(self):
+        if type(self._data) is bytes:
+            return True
+        m = self._meta
+        return m is not None and (m.shm is not None or type(m.alt) is bytes)
+
+    #
+    # Shared memory
+    #
+
+    @classmethod
+    def _from_shared_memory(cls, shm, offset, length):
+        b = cls._from_data(None)
+        m = b._get_meta()
+        m.shm = shm
+        m.shm_offset = offset
+        m.shm_length = max(min(length, shm.size - offset), 0)
+        return b
+
+    @property
+    def _shm(self):
+        return None if self._meta is None else self._meta.shm
+
+    @classmethod
+    def from_shared_memory(cls, name, offset=0, length=None):
+        '''
+        Creates a Blob backed by an existing shared memory segment, without
+        copying its contents.
+
+        @param name: the name of the multiprocessing.shared_memory segment
+        @param offset: the byte offset of the data in the segment
+        @param length: the number of bytes (default: the rest of the segment)
+
+        @returns a Blob
+        '''
+        shm = _get_shared_memory(name)
+        if length is None:
+            length = shm.size - offset
+        return cls._from_shared_memory(shm, offset, length)
+
+    def share(self):
+        '''
+        Copies the data of the Blob into a new shared memory segment and returns
+        a Blob backed by it. Pickling the returned Blob (for example, to pass it
+        to a multiprocessing worker) only sends the segment name, offset, and
+        length, and the receiving process maps the same memory instead of
+        getting a copy. Slicing a shared Blob along bytes also stays in shared
+        memory.
+
+        The caller owns the segment, and should call shared_memory.unlink() on
+        the returned Blob once all workers are done with it. Other processes
+        can attach to it by name with from_shared_memory().
+
+        @returns a Blob
+        '''
+        if _shm_fail:
+            raise BlobError("shared memory is not supported on this platform!")
+        if not self.byte_aligned:
+            raise BlobError("only byte-aligned blobs can be shared")
+
+        d = self.data
+        shm = shared_memory.SharedMemory(create=True, size=max(len(d), 1))
+        shm.buf[:len(d)] = d
+        _shm_segments[shm.name] = shm
+        return Blob._from_shared_memory(shm, 0, len(d))
+
+    @property
+    def shared_memory(self):
+        '''
+        The multiprocessing.shared_memory.SharedMemory segment backing this
+        Blob, or None if the Blob lives in private memory.
+        '''
+        return self._shm
+
+    def __reduce_ex__(self, protocol):
+        m = self._meta
+        if m is not None and m.shm is not None:
+            return (_attach_shared_memory, (m.shm.name, m.shm_offset, m.shm_length))
+        # only send the primary representation, not any cached conversion
+        return (_unpickle_blob, (self._data, self.filename))
 
     #
     # operations
@@ -118,56 +684,128 @@ class Blob(object):
 
     def __repr__(self):
         if self.byte_aligned:
-            return "B(%r)" % self.data
+            n = self.size
+            if n <= _REPR_LIMIT:
+                return "B(%r)" % self._peek(0, n)
+            return "B(%r...%r, size=%d)" % (self._peek(0, _REPR_EDGE), self._peek(n - _REPR_EDGE, n), n)
         else:
-            return "B(b%r)" % self.data_bits
+            d = self._data
+            if len(d) <= _REPR_LIMIT:
+                return "B(b%r)" % d
+            return "B(b%r...b%r, size_bits=%d)" % (d[:_REPR_EDGE], d[-_REPR_EDGE:], len(d))
 
-    @_fix_other_type
     def __eq__(self, o):
-        return self.data == o.data
+        if o is self:
+            return True
+        elif isinstance(o, Blob):
+            if self.size_bits != o.size_bits:
+                return False
+            # different cached hashes mean different data (except in shared
+            # memory, which other processes can change under the hash)
+            m, om = self._meta, o._meta
+            if m is not None and om is not None and m.hash is not None and om.hash is not None:
+                if m.hash != om.hash and m.shm is None and om.shm is None:
+                    return False
+            if self.byte_aligned:
+                return self.data == o.data
+            else:
+                return self.data_bits == o.data_bits
+        elif isinstance(o, str):
+            o = o.encode('latin-1')
+        elif not isinstance(o, bytes):
+            return NotImplemented
+
+        # compare bytes and strs directly, without building a Blob for them
+        return self.size_bits == len(o) * 8 and self.data == o
 
     def __hash__(self):
-        return hash(self.data)
+        # byte-aligned Blobs hash like their bytes (so that they can be looked
+        # up with bytes keys), and unaligned ones take their bit length into
+        # account so that they don't collide with their padded byte form
+        d = self._data
+        if type(d) is bytes:
+            return hash(d) # bytes objects cache their own hash
+
+        m = self._get_meta()
+        if m.hash is not None:
+            return m.hash
+
+        if self.byte_aligned:
+            h = hash(self.data)
+        else:
+            h = hash((self.size_bits, self.data_bits))
+        # other processes can write to shared memory, so don't keep its hash
+        if m.shm is None:
+            m.hash = h
+        return h
 
     @_fix_other_type
     def __xor__(self, o):
-        return Blob(data=utils.xor_str(self.data, o.data))
+        return self._derived(Blob._from_data(utils.xor_str(self.data, o.data)), 'xor')
 
     @_fix_other_type
     def __and__(self, o):
-        return Blob(data=utils.and_str(self.data, o.data))
+        return self._derived(Blob._from_data(utils.and_str(self.data, o.data)), 'and')
 
     @_fix_other_type
     def __or__(self, o):
-        return Blob(data=utils.or_str(self.data, o.data))
+        return self._derived(Blob._from_data(utils.or_str(self.data, o.data)), 'or')
 
     def __invert__(self):
-        return Blob(data=utils.not_str(self.data))
+        return self._derived(Blob._from_data(utils.not_str(self.data)), 'not')
 
     @_fix_other_type
     def __add__(self, o):
-        if self._data_bytes is not None and o._data_bytes is not None:
-            return Blob(data=self._data_bytes+o._data_bytes)
+        if self._bytes_backed and o._bytes_backed:
+            return Blob._from_data(self.data+o.data)
         else:
-            return Blob(data_bits=self._data_bits+o._data_bits)
+            return Blob._from_data(self.data_bits+o.data_bits)
 
     def __getitem__(self, r):
+        b = self._getitem(r)
+        m = self._meta
+        if m is not None and m.tracked:
+            if isinstance(r, slice):
+                unit = 1 if type(r.start) is float or type(r.stop) is float else 8
+                start, _, _ = slice(*(
+                    None if x is None else int(x) * unit for x in (r.start, r.stop, r.step)
+                )).indices(self.size_bits)
+                self._derived(b, 'slice' if r.step is None or int(r.step) == 1 else 'stride', start)
+            elif isinstance(r, float):
+                self._derived(b, 'slice', int(r) % self.size_bits)
+            else:
+                self._derived(b, 'slice', r % self.size * 8)
+        return b
+
+    def _getitem(self, r):
+        m = self._meta
+        if m is not None and m.shm is not None and isinstance(r, (int, slice)):
+            # stay in shared memory for contiguous byte access
+            if isinstance(r, int):
+                if not -m.shm_length <= r < m.shm_length:
+                    raise IndexError('Blob index out of range')
+                r %= m.shm_length
+                return Blob._from_shared_memory(m.shm, m.shm_offset + r, 1)
+            elif isinstance(r, slice) and type(r.start) is not float and type(r.stop) is not float and r.step in (None, 1):
+                start, stop, _ = r.indices(m.shm_length)
+                return Blob._from_shared_memory(m.shm, m.shm_offset + start, max(stop - start, 0))
+
         if isinstance(r, int):
-            if self._data_bytes is not None:
+            if self._bytes_backed:
                 if r < 0:
                     r += len(self.data)
                 if r < 0 or r >= len(self.data):
                     raise IndexError('Blob index out of range')
-                return Blob(data=self.data[r:r+1])
+                return Blob._from_data(self.data[r:r+1])
             else:
-                return Blob(data_bits=self._data_bits[r*8:r*8+8])
+                return Blob._from_data(self.data_bits[r*8:r*8+8])
         elif isinstance(r, float):
             r = int(r)
 
-            if self._data_bytes is not None and r % 8 == 0:
-                return Blob(data=self.data[r//8:r//8+1])
+            if self._bytes_backed and r % 8 == 0:
+                return Blob._from_data(self._peek(r//8, r//8+1))
             else:
-                return Blob(data_bits=self.data_bits[r])
+                return Blob._from_data(self.data_bits[r])
         elif isinstance(r, slice):
             start = r.start if r.start is not None else None
             stop = r.stop if r.stop is not None else None
@@ -188,16 +826,19 @@ class Blob(object):
                 if step is not None: step *= 8
                 byte_aligned = True
 
-            if byte_aligned and self._data_bytes is not None:
+            if byte_aligned and self._bytes_backed:
                 rr = slice(
                     start//8 if start is not None else None,
                     stop//8 if stop is not None else None,
                     step//8 if step is not None else None
                 )
-                return Blob(data=self.data[rr])
+                if self._data is None:
+                    with self._view() as v:
+                        return Blob._from_data(bytes(v[rr]))
+                return Blob._from_data(self.data[rr])
             else:
                 rr = slice(start, stop, step)
-                return Blob(data_bits=self.data_bits[rr])
+                return Blob._from_data(self.data_bits[rr])
 
     def _rol_bytes(self, n):
         n = n % self.size
@@ -237,10 +878,10 @@ class Blob(object):
             what = b' ' if what is None else what
             if isinstance(what, str):
                 what = what.encode('latin-1')
-            return Blob(data=self.data.ljust(n, what))
+            return Blob._from_data(self.data.ljust(n, what))
         elif type(n) is float:
             what = '0' if what is None else what
-            return Blob(data_bits=self.data_bits.ljust(int(n), what))
+            return Blob._from_data(self.data_bits.ljust(int(n), what))
         else:
             raise ValueError("invalid type for ljust amount")
 
@@ -256,10 +897,10 @@ class Blob(object):
             what = b' ' if what is None else what
             if isinstance(what, str):
                 what = what.encode('latin-1')
-            return Blob(data=self.data.rjust(n, what))
+            return Blob._from_data(self.data.rjust(n, what))
         elif type(n) is float:
             what = '0' if what is None else what
-            return Blob(data_bits=self.data_bits.rjust(int(n), what))
+            return Blob._from_data(self.data_bits.rjust(int(n), what))
         else:
             raise ValueError("invalid type for rjust amount")
 
@@ -282,6 +923,13 @@ class Blob(object):
 
         @returns a int
         '''
+        d = self._data
+        if type(d) is bytes:
+            return len(d)
+        elif type(d) is str and len(d) % 8 == 0:
+            return len(d) // 8
+        elif d is None and self._shm is not None:
+            return self._meta.shm_length
         return len(self.data)
 
     @property
@@ -291,10 +939,11 @@ class Blob(object):
 
         @returns a int
         '''
-        if self._data_bits is None:
-            return len(self.data) * 8
+        d = self._data
+        if type(d) is str:
+            return len(d)
         else:
-            return len(self.data_bits)
+            return self.size * 8
 
     #
     # Blocks
@@ -313,14 +962,15 @@ class Blob(object):
         min_blocks = 2 if min_blocks is None else min_blocks
         min_blocksize = 1 if min_blocksize is None else min_blocksize
 
-        prime_factors = utils.factor(self.size_bits)
+        # the products of proper, non-empty subsets of the prime factors are
+        # the divisors other than 1 and the size itself. They are built from
+        # the factors' multiplicities, since subsets of repeated factors (e.g.,
+        # of power-of-two sizes) blow up exponentially.
+        divisors = { 1 }
+        for p, e in collections.Counter(utils.factor(self.size_bits)).items():
+            divisors = { d * p**k for d in divisors for k in range(e + 1) }
         nonprime_factors = { min_blocksize }
-        for i in range(1, len(prime_factors)):
-            combinations = set(itertools.combinations(prime_factors, i))
-            for c in combinations:
-                npf = functools.reduce(operator.__mul__, c, 1)
-                if npf >= min_blocksize:
-                    nonprime_factors.add(npf)
+        nonprime_factors.update(d for d in divisors if 1 < d < self.size_bits and d >= min_blocksize)
 
         return [ f for f in sorted(nonprime_factors) if self.size_bits // f >= min_blocks ]
 
@@ -352,14 +1002,24 @@ class Blob(object):
         @returns a list of Blobs
         '''
 
-        if sep is not None:
-            if isinstance(sep, str):
-                sep = sep.encode('latin-1')
-            split_args = [ sep ] if maxsplit is None else [ sep, maxsplit ]
-            newblocks = [ Blob(data=d) for d in self.data.split(*split_args) if allow_empty or d != b'' ]
-        elif sep_bits is not None:
-            split_args = [ sep_bits ] if maxsplit is None else [ sep_bits, maxsplit ]
-            newblocks = [ Blob(data_bits=d) for d in self.data_bits.split(*split_args) if allow_empty or d != '' ]
+        tracked = self.tracked
+        if sep is not None or sep_bits is not None:
+            if sep is not None:
+                if isinstance(sep, str):
+                    sep = sep.encode('latin-1')
+                d, s, unit = self.data, sep, 8
+            else:
+                d, s, unit = self.data_bits, sep_bits, 1
+            pieces = d.split(s) if maxsplit is None else d.split(s, maxsplit)
+            newblocks = [ Blob._from_data(p) for p in pieces if allow_empty or p ]
+
+            if tracked:
+                off = 0
+                blocks = iter(newblocks)
+                for p in pieces:
+                    if allow_empty or p:
+                        self._derived(next(blocks), 'split', off * unit)
+                    off += len(p) + len(s)
         else:
             if n is not None:
                 split_bits_size = self.size_bits // n
@@ -367,17 +1027,120 @@ class Blob(object):
                 split_bits_size = self._get_bit_index(byte=size, bit=size_bits)
 
             if split_bits_size % 8 != 0:
-                newblocks = [ Blob(data_bits=self.data_bits[i:i+split_bits_size]) for i in range(0, self.size_bits, split_bits_size) ]
+                d = self.data_bits
+                newblocks = [ Blob._from_data(d[i:i+split_bits_size]) for i in range(0, len(d), split_bits_size) ]
             else:
                 split_byte_size = split_bits_size // 8
-                newblocks = [ Blob(data=self.data[i:i+split_byte_size]) for i in range(0, self.size, split_byte_size) ]
+                if self._shm is not None:
+                    # copy the blocks out of shared memory one at a time
+                    newblocks = [ Blob._from_data(self._peek(i, i+split_byte_size)) for i in range(0, self.size, split_byte_size) ]
+                else:
+                    d = self.data
+                    newblocks = [ Blob._from_data(d[i:i+split_byte_size]) for i in range(0, len(d), split_byte_size) ]
 
             if maxsplit is not None:
                 leftsize = sum(b.size_bits for b in newblocks[:maxsplit])
                 newblocks = newblocks[:maxsplit] + [ self.offset(offset_bits=leftsize) ]
 
+            if tracked:
+                off = 0
+                for b in newblocks:
+                    self._derived(b, 'split', off)
+                    off += b.size_bits
+
         return newblocks
 
+    def deinterleave(self, k, unit=1):
+        '''
+        Splits the Blob into k lanes, dealing out consecutive units round-robin
+        (e.g., the channels of an interleaved stream, or the disks of a striped
+        RAID image). Lane i gets units i, i+k, i+2k, and so on.
+
+        @param k: the number of lanes
+        @param unit: the size of a unit. An int is a number of bytes, a float is
+                     a number of bits (default: 1 byte)
+
+        @returns a list of k Blobs
+        '''
+        if k <= 0 or unit <= 0:
+            raise BlobError("lane count and unit size must be positive")
+
+        if type(unit) is float or not self.byte_aligned:
+            u = int(unit) if type(unit) is float else unit * 8
+            d = self.data_bits
+            if u == 1:
+                return [ Blob._from_data(d[i::k]) for i in range(k) ]
+            return [
+                Blob._from_data(''.join(d[j:j+u] for j in range(i*u, len(d), k*u)))
+                for i in range(k)
+            ]
+
+        d = self.data
+        if len(d) % unit != 0:
+            raise BlobError("unit size does not evenly divide blob size")
+        if unit == 1:
+            return [ Blob._from_data(d[i::k]) for i in range(k) ]
+
+        if unit >= _STRIPE_JOIN_UNIT:
+            v = memoryview(d)
+            return [
+                Blob._from_data(b''.join([ v[j:j+unit] for j in range(i*unit, len(d), k*unit) ]))
+                for i in range(k)
+            ]
+
+        # small units: one extended slice copy per byte within a unit
+        lanes = [ ]
+        units = len(d) // unit
+        for i in range(k):
+            lane = bytearray(max(units - i + k - 1, 0) // k * unit)
+            for t in range(unit):
+                lane[t::unit] = d[i*unit+t::k*unit]
+            lanes.append(Blob._from_data(bytes(lane)))
+        return lanes
+
+    def interleave(self, *others, unit=1):
+        '''
+        Interleaves this Blob with others, taking one unit from each in turn.
+        This is the inverse of deinterleave(), so it can also be called as
+        Blob.interleave(*lanes).
+
+        @param others: the other lanes (Blobs, bytes, or strs)
+        @param unit: the size of a unit. An int is a number of bytes, a float is
+                     a number of bits (default: 1 byte)
+
+        @returns the interleaved Blob
+        '''
+        lanes = [ self ] + [ _blobify(o) for o in others ]
+        k = len(lanes)
+        if unit <= 0:
+            raise BlobError("unit size must be positive")
+
+        if type(unit) is float or not all(l.byte_aligned for l in lanes):
+            u = int(unit) if type(unit) is float else unit * 8
+            units = [ [ l.data_bits[j:j+u] for j in range(0, l.size_bits, u) ] for l in lanes ]
+            return Blob._from_data(''.join(itertools.chain.from_iterable(itertools.zip_longest(*units, fillvalue=''))))
+
+        datas = [ l.data for l in lanes ]
+        if any(len(d) % unit != 0 for d in datas):
+            raise BlobError("unit size does not evenly divide lane size")
+
+        if unit >= _STRIPE_JOIN_UNIT:
+            units = [ [ memoryview(d)[j:j+unit] for j in range(0, len(d), unit) ] for d in datas ]
+            if any(not len(units[i-1]) - 1 <= len(units[i]) <= len(units[i-1]) for i in range(1, k)):
+                raise BlobError("lane sizes can't be interleaved (later lanes may be at most one unit shorter)")
+            return Blob._from_data(b''.join(itertools.chain.from_iterable(itertools.zip_longest(*units, fillvalue=b''))))
+
+        # small units: extended slice assignment into a preallocated buffer, one
+        # pass per lane and byte within a unit
+        out = bytearray(sum(len(d) for d in datas))
+        try:
+            for i, d in enumerate(datas):
+                for t in range(unit):
+                    out[i*unit+t::k*unit] = d[t::unit]
+        except ValueError:
+            raise BlobError("lane sizes can't be interleaved (later lanes may be at most one unit shorter)") from None
+        return Blob._from_data(bytes(out))
+
     def mp_split(self, *args, **kwargs):
         '''
         This is a convenience function that returns a mulpyplexer object
@@ -471,23 +1234,151 @@ class Blob(object):
         if self.size % s.size != 0:
             raise BlobError("format size does not evenly divide blob size")
 
-        if not repeat:
-            if s.size != self.size:
-                raise BlobError("size of non-repeating format is not equal to the blob size")
-            return s.unpack(self.data)
-        else:
-            o = [ ]
-            for b in self.split(size=s.size):
-                o.extend(b.unpack(fmt, repeat=False, s=s))
-            return o
+        with self._view() as d:
+            if not repeat:
+                if s.size != self.size:
+                    raise BlobError("size of non-repeating format is not equal to the blob size")
+                return s.unpack(d)
+            else:
+                return [ v for t in s.iter_unpack(d) for v in t ]
+
+    def byteswap(self, word_size):
+        '''
+        Swaps the endianness of every word of the Blob.
+
+        @param word_size: the size of a word, in bytes
+
+        @returns the swapped Blob
+        '''
+        if self.size % word_size != 0:
+            raise BlobError("word size does not evenly divide blob size")
+        return Blob._from_data(utils.byteswap(self.data, word_size))
+
+    def reverse_bits(self):
+        '''
+        Reverses the order of the bits within each byte of the Blob.
+
+        @returns the reversed Blob
+        '''
+        return Blob._from_data(utils.reverse_bits(self.data))
+
+    def reinterpret(self, from_fmt, to_fmt):
+        '''
+        Converts the whole Blob from one struct format to another, e.g.
+        reinterpret('>I', '<I') to turn a big-endian firmware dump into a
+        little-endian one. When the formats only differ in byte order, this is
+        a single byteswap over the whole buffer; otherwise, values are unpacked
+        with from_fmt and repacked with to_fmt.
+
+        @returns the converted Blob
+        '''
+        f = struct.Struct(from_fmt)
+        t = struct.Struct(to_fmt)
+        if self.size % f.size != 0:
+            raise BlobError("format size does not evenly divide blob size")
+
+        f_order, f_body = _split_fmt(from_fmt)
+        t_order, t_body = _split_fmt(to_fmt)
+        if f_body == t_body and f.size == t.size and len(f_body) == 1 and f_body not in 'xcbB?sp':
+            if f_order == t_order:
+                return Blob._from_data(self.data)
+            return self.byteswap(f.size)
+
+        try:
+            return Blob._from_data(b''.join(t.pack(*v) for v in f.iter_unpack(self.data)))
+        except struct.error as e:
+            raise BlobError("can't reinterpret %r as %r: %s" % (from_fmt, to_fmt, e)) from None
+
+    def iter_hexdump(self, start=0, length=None, width=16):
+        '''
+        Lazily renders a range of the Blob as a hexdump, in the style of
+        `hexdump -C`: an offset, the bytes in hex, and the printable ASCII
+        characters. Only about a thousand lines' worth of data is converted at
+        a time, so this is safe to use on very large Blobs.
+
+        @param start: the offset of the first byte to dump (default: 0)
+        @param length: the number of bytes to dump (default: to the end)
+        @param width: the number of bytes per line (default: 16)
+
+        @returns an iterator over the lines of the hexdump
+        '''
+        if not self.byte_aligned:
+            raise BlobError("only byte-aligned blobs can be hexdumped")
+        if width < 1:
+            raise BlobError("hexdump width must be positive")
+
+        size = self.size
+        if start < 0:
+            start = max(start + size, 0)
+        stop = size if length is None else min(start + max(length, 0), size)
+
+        step = width * _HEXDUMP_CHUNK_LINES
+        for pos in range(start, stop, step):
+            chunk = self._peek(pos, min(pos + step, stop))
+            hexes = chunk.hex(' ')
+            text = chunk.translate(_HEXDUMP_ASCII).decode('ascii')
+            for i in range(0, len(chunk), width):
+                yield "%08x  %-*s  |%s|" % (pos + i, width * 3 - 1, hexes[i*3:(i+width)*3-1], text[i:i+width])
+
+    def hexdump(self, start=0, length=None, width=16):
+        '''
+        Renders a range of the Blob as a hexdump. See iter_hexdump() for the
+        parameters.
+
+        @returns a string, with one line per width bytes
+        '''
+        return "\n".join(self.iter_hexdump(start, length, width))
 
     #
     # Statistical stuff
     #
 
+    def histogram(self):
+        '''
+        Counts the occurrences of every byte value. The result is cached, and a
+        tracked slice of a Blob whose histogram is already known is counted by
+        subtracting the rest of its parent from the parent's histogram, when
+        that is less work.
+
+        @returns a list of 256 ints
+        '''
+        if not self.byte_aligned:
+            raise BlobError("byte histograms need a byte-aligned blob")
+        return list(self._cached('histogram', self._histogram))
+
+    def _histogram(self):
+        m = self._meta
+        p = m.parent
+        # the parent's histogram only helps if its data hasn't been replaced
+        # since this Blob was derived from it
+        pc = p._meta.cache if p is not None and p._meta.generation == m.parent_generation else None
+        if pc and 'histogram' in pc:
+            ph = pc['histogram']
+            if m.derivation == 'not':
+                return ph[::-1]
+            elif m.derivation in ('slice', 'split') and m.parent_offset % 8 == 0 and 2 * self.size > p.size:
+                start = m.parent_offset // 8
+                with p._view() as v:
+                    before = _byte_histogram(v[:start])
+                    after = _byte_histogram(v[start+self.size:])
+                return tuple(a - b - c for a, b, c in zip(ph, before, after))
+
+        with self._view() as v:
+            return _byte_histogram(v)
+
+    def _element_counts(self, blocksize, blocksize_bits, split_kwargs):
+        '''
+        Counts the elements of a split, as a list of counts. Byte-sized elements
+        come from the (cached) histogram.
+        '''
+        if not split_kwargs and (blocksize == 1 or blocksize_bits == 8) and self.byte_aligned:
+            return [ c for c in self.histogram() if c ]
+        elements = self.split(size=blocksize, size_bits=blocksize_bits, **split_kwargs)
+        return list(collections.Counter(elements).values())
+
     def entropy(self, blocksize=None, blocksize_bits=None, base=2, **split_kwargs):
         '''
-        Calculate the entropy of the data.
+        Calculate the entropy of the data. The result is cached.
 
         @param blocksize: use this blocksize (in bytes) for splitting
                                 data for the probability calculation.
@@ -499,17 +1390,18 @@ class Blob(object):
 
         @param base: an alternate base for the entropy
         '''
-        elements = self.split(size=blocksize, size_bits=blocksize_bits, **split_kwargs)
-        counts = collections.Counter(elements)
-
         if _scipy_fail:
             raise BlobError("please install the scipy to use statistical analyses!")
 
-        return float(scipy.stats.entropy(list(counts.values()), base=base))
+        return self._cached(
+            ('entropy', blocksize, blocksize_bits, base, tuple(sorted(split_kwargs.items()))),
+            lambda: float(_scipy_entropy(self._element_counts(blocksize, blocksize_bits, split_kwargs), base))
+        )
 
     def chisquare(self, blocksize=None, blocksize_bits=None, f_exp=None, **split_kwargs):
         '''
-        Perform the chi-squared test on the data.
+        Perform the chi-squared test on the data. The result is cached, unless
+        f_exp is given.
 
         @param blocksize: use this blocksize (in bytes) for splitting
                                 data for the probability calculation.
@@ -523,14 +1415,507 @@ class Blob(object):
 
         @param base: an alternate base for the entropy
         '''
-        elements = self.split(size=blocksize, size_bits=blocksize_bits, **split_kwargs)
-        counts = collections.Counter(elements)
-
         if _scipy_fail:
             raise BlobError("please install the scipy to use statistical analyses!")
 
-        result = scipy.stats.chisquare(list(counts.values()), f_exp=f_exp)
-        return [float(result.statistic), float(result.pvalue)]
+        def chisquare():
+            if f_exp is None:
+                counts = self._element_counts(blocksize, blocksize_bits, split_kwargs)
+            else:
+                # f_exp lines up with the elements in order of appearance
+                elements = self.split(size=blocksize, size_bits=blocksize_bits, **split_kwargs)
+                counts = list(collections.Counter(elements).values())
+            result = _scipy_chisquare(counts, f_exp)
+            return (float(result.statistic), float(result.pvalue))
+
+        if f_exp is not None:
+            return list(chisquare())
+        return list(self._cached(('chisquare', blocksize, blocksize_bits, tuple(sorted(split_kwargs.items()))), chisquare))
+
+    def ngrams(self, n, bits=False, overlapping=True, top=None):
+        '''
+        Counts the n-grams of the Blob in a single pass, without creating a Blob
+        for each of them. Each n-gram is keyed by its (big-endian) integer
+        value.
+
+        @param n: the size of the n-grams, in bytes (or bits, if bits is True)
+        @param bits: count n-bit grams instead of n-byte grams
+        @param overlapping: count the n-grams starting at every byte (or bit),
+                            rather than only consecutive ones (default: True)
+        @param top: only keep this many of the most common n-grams
+
+        @returns a collections.Counter of n-gram values
+        '''
+        if n <= 0:
+            raise BlobError("n-gram size must be positive")
+
+        if not bits:
+            if not self.byte_aligned:
+                raise BlobError("byte n-grams need a byte-aligned blob")
+            counts = utils.count_ngrams(self.data, n, overlapping)
+        elif not overlapping and n % 8 == 0 and self.byte_aligned:
+            counts = utils.count_ngrams(self.data, n // 8, False)
+        elif overlapping and self.byte_aligned:
+            counts = self._overlapping_bit_ngrams(n)
+        else:
+            d = self.data_bits
+            step = 1 if overlapping else n
+            counts = collections.Counter(d[i:i+n] for i in range(0, len(d) - n + 1, step))
+            counts = collections.Counter({ int(k, 2): v for k, v in counts.items() })
+
+        if top is not None:
+            counts = collections.Counter(dict(counts.most_common(top)))
+        return counts
+
+    def _overlapping_bit_ngrams(self, n):
+        '''
+        Counts the n-bit grams starting at every bit by counting the k-byte
+        windows starting at every byte (with k large enough to hold an n-gram
+        at any of the 8 bit offsets), and then breaking each distinct window
+        into its 8 n-grams.
+        '''
+        d = self.data
+        k = (n + 14) // 8
+        mask = (1 << n) - 1
+
+        counts = collections.Counter()
+        for w, c in utils.count_ngrams(d, k).items():
+            for s in range(8):
+                counts[(w >> (8*k - s - n)) & mask] += c
+
+        # the n-grams starting in the last k-1 bytes have no full window
+        tail = utils.to_bitstr(d[max(len(d) - k + 1, 0):])
+        for i in range(len(tail) - n + 1):
+            counts[int(tail[i:i+n], 2)] += 1
+
+        return counts
+
+    #
+    # Content extraction
+    #
+
+    def strings(self, min_len=4, encodings=('ascii', 'utf-16le')):
+        '''
+        Finds printable strings in the Blob, like GNU strings. The data is
+        scanned in chunks, and shared memory blobs are scanned in place.
+
+        @param min_len: the minimum number of characters in a string
+        @param encodings: the encodings to look for: 'ascii', 'utf-16le' and/or
+                          'utf-16be'
+
+        @returns a list of (offset, string) tuples, sorted by offset
+        '''
+        if not self.byte_aligned:
+            raise BlobError("strings need a byte-aligned blob")
+        for encoding in encodings:
+            if encoding not in utils.STRING_ENCODINGS:
+                raise BlobError("unsupported string encoding %r" % encoding)
+
+        found = [ ]
+        with self._view() as v:
+            start = 0
+            while start < len(v):
+                # cut chunks after a byte that no string can span
+                end = start + _STRINGS_CHUNK
+                if end < len(v):
+                    m = _STRINGS_BREAK.search(v, end)
+                    end = len(v) if m is None else m.end()
+
+                chunk = bytes(v[start:end])
+                for encoding in encodings:
+                    for offset, st in utils.find_strings(chunk, min_len, encoding):
+                        found.append((start + offset, st.decode(encoding)))
+                start = end
+
+        found.sort()
+        return found
+
+    #
+    # Hashes and checksums
+    #
+
+    def digest(self, algo='sha256'):
+        '''
+        Hashes the data of the Blob with a hashlib algorithm. The data is fed to
+        hashlib in chunks, without copying it, and the digest is cached.
+
+        @param algo: the name of the hashlib algorithm (default: 'sha256')
+
+        @returns the digest, as bytes
+        '''
+        if not self.byte_aligned:
+            raise BlobError("hashes need a byte-aligned blob")
+        return self._cached(('digest', algo), self._digest, algo)
+
+    def _digest(self, algo):
+        h = _hash_constructor(algo)()
+        with self._view() as v:
+            for i in range(0, len(v), _HASH_CHUNK):
+                h.update(v[i:i+_HASH_CHUNK])
+        return h.digest()
+
+    def checksum(self, algo='crc32'):
+        '''
+        Computes a checksum of the data of the Blob.
+
+        @param algo: 'crc32', 'adler32' or 'crc_hqx' (default: 'crc32')
+
+        @returns the checksum, as an int
+        '''
+        if not self.byte_aligned:
+            raise BlobError("checksums need a byte-aligned blob")
+        try:
+            f, value = _CHECKSUMS[algo]
+        except KeyError:
+            raise BlobError("unsupported checksum %r" % algo) from None
+
+        with self._view() as v:
+            for i in range(0, len(v), _HASH_CHUNK):
+                value = f(v[i:i+_HASH_CHUNK], value)
+        return value
+
+    def block_digests(self, size, algo='sha256', workers=None):
+        '''
+        Hashes each block of the Blob, without splitting it into Blobs first.
+        hashlib releases the GIL for blocks larger than 2 KB, so big blocks can
+        be hashed in parallel threads.
+
+        @param size: the block size, in bytes (the last block may be shorter)
+        @param algo: the name of the hashlib algorithm (default: 'sha256')
+        @param workers: the number of threads to hash with (default: hash in
+                        the calling thread)
+
+        @returns a list of digests, as bytes, one per block
+        '''
+        if not self.byte_aligned:
+            raise BlobError("hashes need a byte-aligned blob")
+        if size <= 0:
+            raise BlobError("block size must be positive")
+
+        c = _hash_constructor(algo)
+        with self._view() as v:
+            def hash_blocks(r):
+                return [ c(v[i:i+size]).digest() for i in r ]
+
+            offsets = range(0, len(v), size)
+            if workers is None or workers <= 1:
+                return hash_blocks(offsets)
+
+            # hand each thread a run of blocks to keep the overhead down
+            step = max(len(offsets) // (workers * 4), 1)
+            with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+                runs = pool.map(hash_blocks, [ offsets[i:i+step] for i in range(0, len(offsets), step) ])
+                return [ d for run in runs for d in run ]
+
+    #
+    # Bit counting
+    #
+
+    def popcount(self):
+        '''
+        Counts the set bits in the Blob.
+
+        @returns an int
+        '''
+        if type(self._data) is str:
+            return self._data.count('1')
+        return utils.popcount(self.data)
+
+    @_fix_other_type
+    def hamming(self, o):
+        '''
+        Computes the Hamming distance (the number of differing bits) between
+        this Blob and another one of the same size.
+
+        @returns an int
+        '''
+        if self.size_bits != o.size_bits:
+            raise BlobError("hamming distance needs blobs of the same size")
+        if self.byte_aligned:
+            return utils.hamming(self.data, o.data)
+        else:
+            return (int(self.data_bits, 2) ^ int(o.data_bits, 2)).bit_count()
+
+    @staticmethod
+    def hamming_matrix(blocks):
+        '''
+        Computes the pairwise Hamming distances between equally-sized blocks
+        (Blobs, bytes, or strs), e.g. from Blob.split().
+
+        @returns a list of lists, where m[i][j] is the distance between blocks
+                 i and j
+        '''
+        blocks = [ _blobify(b) for b in blocks ]
+        if len({ b.size_bits for b in blocks }) > 1:
+            raise BlobError("hamming distance needs blobs of the same size")
+        if all(b.byte_aligned for b in blocks):
+            return utils.hamming_matrix([ b.data for b in blocks ])
+        else:
+            return [ [ a.hamming(b) for b in blocks ] for a in blocks ]
+
+    #
+    # Repeating-key XOR
+    #
+
+    def xor_keysize_scores(self, max_len=40, min_len=1):
+        '''
+        Scores key lengths for repeating-key XOR. For each key length k, the
+        Blob is XORed with itself shifted by k bytes in one big-int operation.
+        When k is (a multiple of) the key length, the key cancels out, leaving
+        plaintext XORed with plaintext, which has fewer differing bits and more
+        coinciding bytes than random data.
+
+        @param max_len: the largest key length to try (default: 40)
+        @param min_len: the smallest key length to try (default: 1)
+
+        Since multiples of the key length score as well as the key length, a
+        length is ranked right before its multiples that don't score clearly
+        better than it does.
+
+        @returns a list of (keysize, distance, ic) tuples, best first, where
+                 distance is the normalized Hamming distance (the fraction of
+                 differing bits) between bytes that are keysize apart, and ic
+                 is the index of coincidence between the Blob and itself
+                 shifted by keysize (the fraction of equal bytes, as in
+                 Friedman's kappa test)
+        '''
+        if not self.byte_aligned:
+            raise BlobError("xor analysis needs a byte-aligned blob")
+
+        d = self.data
+        n = len(d)
+        whole = int.from_bytes(d, 'big')
+
+        scores = [ ]
+        for k in range(max(min_len, 1), min(max_len, n - 1) + 1):
+            head = whole >> (8 * k)
+            tail = whole & ((1 << (8 * (n - k))) - 1)
+            diff = head ^ tail
+            distance = diff.bit_count() / (8 * (n - k))
+            ic = diff.to_bytes(n - k, 'big').count(0) / (n - k)
+            scores.append((k, distance, ic))
+
+        # multiples of the key length score about as well as the key length
+        # itself, and on short inputs, often a little better by chance, so
+        # each length is ranked with its smallest divisor that scores within
+        # the noise of it
+        distances = { k: d for k, d, _ in scores }
+        def rank(s):
+            k, d, _ = s
+            tolerance = _XOR_KEYSIZE_NOISE / math.sqrt(8 * (n - k))
+            base = next(j for j in distances if k % j == 0 and distances[j] <= d + tolerance)
+            return (distances[base], base, k)
+
+        scores.sort(key=rank)
+        return scores
+
+    def xor_key_recover(self, keylen, freqs=None):
+        '''
+        Recovers the key of repeating-key XOR by frequency analysis: each byte of
+        the key is chosen to make its column of the Blob look most like the
+        expected plaintext distribution.
+
+        @param keylen: the key length (see xor_keysize_scores())
+        @param freqs: a mapping of characters (or byte values) to the expected
+                      relative frequencies of the plaintext (default: English)
+
+        @returns the key, as a Blob
+        '''
+        if not self.byte_aligned:
+            raise BlobError("xor analysis needs a byte-aligned blob")
+        if keylen <= 0:
+            raise BlobError("key length must be positive")
+
+        d = self.data
+        table = utils.xor_score_table(freqs)
+
+        key = bytearray(keylen)
+        for j in range(keylen):
+            counts = [ 0 ] * 256
+            for v, c in collections.Counter(d[j::keylen]).items():
+                counts[v] = c
+            scores = [ sum(map(operator.mul, counts, row)) for row in table ]
+            key[j] = scores.index(max(scores))
+
+        return Blob._from_data(bytes(key))
+
+    def index_of_coincidence(self):
+        '''
+        Calculates the index of coincidence of the bytes of the Blob: the
+        probability that two bytes picked at random are equal. This is about
+        1/256 for random data and much higher for text.
+
+        @returns a float
+        '''
+        n = self.size
+        if n < 2:
+            return 0.0
+        counts = collections.Counter(self.data).values()
+        return sum(c * (c - 1) for c in counts) / (n * (n - 1))
+
+    def autocorrelation(self, max_shift=None):
+        '''
+        Counts, for every shift k, the bytes that are equal to the byte k
+        positions later. Data with a period (even a noisy one) shows peaks at
+        multiples of that period.
+
+        Without numpy, every shift is one XOR of the data with itself as a big
+        int. With numpy, the shifts are compared as arrays, or, when that is
+        estimated to be slower, computed all at once from the FFTs of each byte
+        value's indicator.
+
+        @param max_shift: the largest shift (default: the size of the Blob - 1)
+
+        @returns a list of match counts, indexed by shift (so the first entry
+                 is the size of the Blob)
+        '''
+        if not self.byte_aligned:
+            raise BlobError("autocorrelation needs a byte-aligned blob")
+
+        d = self.data
+        n = len(d)
+        max_shift = n - 1 if max_shift is None else min(max_shift, n - 1)
+        if max_shift < 0:
+            return [ ]
+
+        if _numpy_fail:
+            whole = int.from_bytes(d, 'big')
+            counts = [ n ]
+            for k in range(1, max_shift + 1):
+                diff = (whole >> (8 * k)) ^ (whole & ((1 << (8 * (n - k))) - 1))
+                counts.append(diff.to_bytes(n - k, 'big').count(0))
+            return counts
+
+        a = numpy.frombuffer(d, dtype=numpy.uint8)
+        values = numpy.flatnonzero(numpy.bincount(a, minlength=256))
+        if _autocorrelation_uses_fft(n, len(values), max_shift):
+            return _autocorrelation_fft(a, values, max_shift)
+        return _autocorrelation_direct(a, max_shift)
+
+    #
+    # Automatic analysis
+    #
+
+    def analyze(self, block_sizes=(8, 16, 32, 64), min_run=16):
+        '''
+        Triages the Blob in a handful of passes over the data, rather than one
+        per statistic: the (cached) byte histogram gives the entropy, the
+        chi-square test and the printable ratio, one pass finds the runs of
+        repeated bytes, and one pass per block size counts duplicate blocks.
+        The result is cached.
+
+        @param block_sizes: the block sizes (in bytes) to count duplicate blocks
+                            at (default: 8, 16, 32, and 64)
+        @param min_run: the shortest run of repeated bytes to report
+
+        @returns a dict with:
+            size: the size, in bytes
+            histogram: the byte histogram (see histogram())
+            entropy: the entropy, in bits per byte
+            chisquare: [statistic, p-value] of a chi-square test against
+                       uniformly distributed bytes (the p-value needs scipy,
+                       and is None without it)
+            printable_ratio: the fraction of text bytes (printable ASCII,
+                             tabs, and newlines)
+            null_runs: (offset, length) of every run of null bytes
+            longest_repeats: (offset, length, value) of the (up to 5) longest
+                             runs of a repeated byte
+            duplicate_blocks: the number of aligned blocks that repeat an
+                              earlier block, keyed by block size
+            blocksize_candidates: see blocksize_candidates()
+            tags: a list of 'empty', 'text', 'encrypted', 'compressed', 'ecb'
+                  (encrypted-looking, with duplicate 16-byte blocks), and
+                  'structured' (binary data without near-maximal entropy)
+        '''
+        if not self.byte_aligned:
+            raise BlobError("analysis needs a byte-aligned blob")
+        block_sizes = tuple(block_sizes)
+        return copy.deepcopy(self._cached(('analyze', block_sizes, min_run), self._analyze, block_sizes, min_run))
+
+    def _analyze(self, block_sizes, min_run):
+        d = self.data
+        n = len(d)
+        hist = self.histogram()
+
+        if n:
+            entropy = -sum(c / n * math.log2(c / n) for c in hist if c)
+            expected = n / 256
+            statistic = sum((c - expected) ** 2 for c in hist) / expected
+            pvalue = None if _scipy_fail else float(_scipy_chi2_sf(statistic, 255))
+            printable = sum(hist[c] for c in _TEXT_BYTES) / n
+        else:
+            entropy, statistic, pvalue, printable = 0.0, 0.0, None, 0.0
+
+        runs = utils.byte_runs(d, min_run)
+        duplicates, found = _duplicate_blocks(d, block_sizes + (16,))
+        # ECB repeats whole cipher blocks, unlike padding and other runs
+        ecb = any(d[o:o+16].count(d[o:o+1]) != 16 for o in found[16])
+        duplicates = { size: duplicates[size] for size in block_sizes }
+
+        tags = [ ]
+        if n == 0:
+            tags.append('empty')
+        elif printable >= 0.95:
+            tags.append('text')
+        elif n >= _ANALYZE_MIN_RANDOM and entropy >= 0.95 * min(8, math.log2(n)):
+            if ecb:
+                tags += [ 'encrypted', 'ecb' ]
+            elif d.startswith(_COMPRESSED_MAGIC) or statistic > _UNIFORM_CHISQUARE_LIMIT:
+                tags.append('compressed')
+            else:
+                tags.append('encrypted')
+        elif n >= _ANALYZE_MIN_RANDOM:
+            tags.append('structured')
+
+        return {
+            'size': n,
+            'histogram': hist,
+            'entropy': entropy,
+            'chisquare': [ statistic, pvalue ],
+            'printable_ratio': printable,
+            'null_runs': [ (o, l) for o, l, v in runs if v == 0 ],
+            'longest_repeats': sorted(runs, key=lambda r: r[1], reverse=True)[:5],
+            'duplicate_blocks': duplicates,
+            'blocksize_candidates': self.blocksize_candidates() if n else [ ],
+            'tags': tags,
+        }
+
+    #
+    # Error correction
+    #
+
+    def rs_encode_blocks(self, n, k, prim=None, fcr=0):
+        '''
+        Reed-Solomon-encodes the Blob as RS(n, k) codewords over GF(2^8): every
+        k bytes become a codeword of n bytes (the last one may be shortened).
+
+        @param prim: the primitive polynomial of the field (default: 0x11d)
+        @param fcr: the first consecutive root of the generator polynomial
+
+        @returns the encoded Blob
+        '''
+        if not 0 < k < n:
+            raise BlobError("RS(n, k) needs 0 < k < n")
+        codec = ecc.RSCodec(n - k, ecc.PRIM if prim is None else prim, fcr)
+        return Blob._from_data(codec.encode_blocks(self.data, k))
+
+    def rs_decode_blocks(self, n, k, prim=None, fcr=0):
+        '''
+        Splits the Blob into RS(n, k) codewords over GF(2^8) (the last one may
+        be shortened), corrects up to (n-k)/2 errors in each, and strips the
+        parity. The syndromes of all codewords are computed together, so blobs
+        with few errors decode quickly. Raises an ECCError if a codeword can't
+        be corrected.
+
+        @param prim: the primitive polynomial of the field (default: 0x11d)
+        @param fcr: the first consecutive root of the generator polynomial
+
+        @returns the decoded Blob
+        '''
+        if not 0 < k < n:
+            raise BlobError("RS(n, k) needs 0 < k < n")
+        codec = ecc.RSCodec(n - k, ecc.PRIM if prim is None else prim, fcr)
+        return Blob._from_data(codec.decode_blocks(self.data, n)[0])
 
     #
     # Some other weird operations
@@ -564,11 +1949,12 @@ class Blob(object):
         for e in i:
             eb = _blobify(e)
             if eb.byte_aligned:
-                count += self._data_bytes.count(eb._data_bytes)
+                count += self.data.count(eb.data)
             else:
-                count += self._data_bits.count(eb._data_bits)
+                count += self.data_bits.count(eb.data_bits)
 
         return count
 
 from . import utils
+from . import ecc
 from .errors import BlobError
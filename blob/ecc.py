@@ -0,0 +1,368 @@
+'''
+Reed-Solomon error correction over GF(2^8).
+
+Field arithmetic uses log/antilog tables. When many codewords are processed at
+once, they are handled column by column: multiplying every codeword's byte by
+the same constant is a single bytes.translate() with that constant's 256-entry
+multiplication table, and adding is a single XOR, so syndromes (and parity)
+are computed for all codewords together. Only the codewords that actually have
+errors go through the (per-codeword) Berlekamp-Massey, Chien search and Forney
+steps.
+'''
+
+import functools
+
+from .errors import ECCError
+
+# the field polynomial used by QR codes (and most other RS(255, k) users)
+PRIM = 0x11d
+
+
+@functools.lru_cache(maxsize=None)
+def _gf_tables(prim):
+    exp = [ 0 ] * 512
+    log = [ 0 ] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= prim
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return exp, log
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+class RSCodec(object):
+    '''
+    A Reed-Solomon codec over GF(2^8) with nsym parity symbols, which corrects
+    up to nsym/2 errors (or nsym erasures) per codeword. Codewords are at most
+    255 bytes long, and shorter ones are treated as shortened codes.
+    '''
+
+    def __init__(self, nsym, prim=PRIM, fcr=0):
+        '''
+        @param nsym: the number of parity symbols (n - k)
+        @param prim: the primitive polynomial of the field (default: 0x11d)
+        @param fcr: the first consecutive root of the generator polynomial,
+                    as a power of the generator 2 (default: 0)
+        '''
+        if not 0 < nsym < 255:
+            raise ECCError("the number of parity symbols must be between 1 and 254")
+
+        self.nsym = nsym
+        self.prim = prim
+        self.fcr = fcr
+        self._exp, self._log = _gf_tables(prim)
+        self._mul_tables = { }
+
+        self.generator = [ 1 ]
+        for i in range(nsym):
+            self.generator = self._poly_mul(self.generator, [ 1, self._pow(2, i + fcr) ])
+
+    #
+    # field arithmetic
+    #
+
+    def _mul(self, x, y):
+        if x == 0 or y == 0:
+            return 0
+        return self._exp[self._log[x] + self._log[y]]
+
+    def _div(self, x, y):
+        if y == 0:
+            raise ZeroDivisionError()
+        if x == 0:
+            return 0
+        return self._exp[(self._log[x] + 255 - self._log[y]) % 255]
+
+    def _pow(self, x, power):
+        return self._exp[(self._log[x] * power) % 255]
+
+    def _inverse(self, x):
+        return self._exp[255 - self._log[x]]
+
+    def _mul_table(self, c):
+        '''
+        Returns the translate table that multiplies every byte by c.
+        '''
+        t = self._mul_tables.get(c)
+        if t is None:
+            t = self._mul_tables[c] = bytes(self._mul(x, c) for x in range(256))
+        return t
+
+    def _poly_scale(self, p, x):
+        return [ self._mul(c, x) for c in p ]
+
+    def _poly_add(self, p, q):
+        r = [ 0 ] * max(len(p), len(q))
+        for i, c in enumerate(p):
+            r[i + len(r) - len(p)] = c
+        for i, c in enumerate(q):
+            r[i + len(r) - len(q)] ^= c
+        return r
+
+    def _poly_mul(self, p, q):
+        r = [ 0 ] * (len(p) + len(q) - 1)
+        for j, qc in enumerate(q):
+            for i, pc in enumerate(p):
+                r[i + j] ^= self._mul(pc, qc)
+        return r
+
+    def _poly_div(self, dividend, divisor):
+        out = list(dividend)
+        for i in range(len(dividend) - (len(divisor) - 1)):
+            coef = out[i]
+            if coef != 0:
+                for j in range(1, len(divisor)):
+                    if divisor[j] != 0:
+                        out[i + j] ^= self._mul(divisor[j], coef)
+        separator = -(len(divisor) - 1)
+        return out[:separator], out[separator:]
+
+    def _poly_eval(self, p, x):
+        y = p[0]
+        for c in p[1:]:
+            y = self._mul(y, x) ^ c
+        return y
+
+    #
+    # single codewords
+    #
+
+    def encode(self, msg):
+        '''
+        Encodes a message of at most 255 - nsym bytes.
+
+        @returns the codeword (the message followed by nsym parity bytes)
+        '''
+        msg = bytes(msg)
+        if len(msg) + self.nsym > 255:
+            raise ECCError("message is too long for a 255-byte codeword")
+
+        out = bytearray(msg) + bytearray(self.nsym)
+        gen_log = [ self._log[g] if g else None for g in self.generator ]
+        exp, log = self._exp, self._log
+        for i in range(len(msg)):
+            coef = out[i]
+            if coef != 0:
+                lc = log[coef]
+                for j in range(1, len(gen_log)):
+                    if gen_log[j] is not None:
+                        out[i + j] ^= exp[lc + gen_log[j]]
+        out[:len(msg)] = msg
+        return bytes(out)
+
+    def syndromes(self, codeword):
+        '''
+        Computes the syndromes of a codeword (all zero if it has no errors).
+        '''
+        return [ self._poly_eval(codeword, self._pow(2, i + self.fcr)) for i in range(self.nsym) ]
+
+    def decode(self, codeword, erase_pos=None):
+        '''
+        Corrects a codeword.
+
+        @param codeword: the (possibly corrupted) codeword
+        @param erase_pos: positions in the codeword that are known to be bad
+
+        @returns a (message, corrected_positions) tuple
+        '''
+        msg = list(codeword)
+        if len(msg) > 255:
+            raise ECCError("codewords can be at most 255 bytes long")
+        if len(msg) <= self.nsym:
+            raise ECCError("codeword is shorter than its parity")
+
+        erase_pos = list(erase_pos or [ ])
+        if len(erase_pos) > self.nsym:
+            raise ECCError("too many erasures to correct")
+        for p in erase_pos:
+            msg[p] = 0
+
+        synd = self.syndromes(msg)
+        if max(synd) == 0:
+            return bytes(msg[:-self.nsym]), erase_pos
+
+        fsynd = self._forney_syndromes(synd, erase_pos, len(msg))
+        err_loc = self._find_error_locator(fsynd, len(erase_pos))
+        err_pos = self._find_errors(err_loc[::-1], len(msg))
+        positions = erase_pos + err_pos
+        msg = self._correct_errata(msg, [ 0 ] + synd, positions)
+
+        if max(self.syndromes(msg)) != 0:
+            raise ECCError("could not correct the codeword")
+        return bytes(msg[:-self.nsym]), sorted(positions)
+
+    def _forney_syndromes(self, synd, pos, nmess):
+        fsynd = list(synd)
+        for p in pos:
+            x = self._pow(2, nmess - 1 - p)
+            for j in range(len(fsynd) - 1):
+                fsynd[j] = self._mul(fsynd[j], x) ^ fsynd[j + 1]
+        return fsynd
+
+    def _find_error_locator(self, synd, erase_count):
+        '''
+        Berlekamp-Massey.
+        '''
+        err_loc = [ 1 ]
+        old_loc = [ 1 ]
+        for k in range(self.nsym - erase_count):
+            delta = synd[k]
+            for j in range(1, len(err_loc)):
+                delta ^= self._mul(err_loc[-(j + 1)], synd[k - j])
+            old_loc = old_loc + [ 0 ]
+            if delta != 0:
+                if len(old_loc) > len(err_loc):
+                    new_loc = self._poly_scale(old_loc, delta)
+                    old_loc = self._poly_scale(err_loc, self._inverse(delta))
+                    err_loc = new_loc
+                err_loc = self._poly_add(err_loc, self._poly_scale(old_loc, delta))
+
+        while err_loc and err_loc[0] == 0:
+            del err_loc[0]
+        if (len(err_loc) - 1) * 2 + erase_count > self.nsym:
+            raise ECCError("too many errors to correct")
+        return err_loc
+
+    def _find_errors(self, err_loc, nmess):
+        '''
+        Chien search.
+        '''
+        err_pos = [ nmess - 1 - i for i in range(nmess) if self._poly_eval(err_loc, self._pow(2, i)) == 0 ]
+        if len(err_pos) != len(err_loc) - 1:
+            raise ECCError("too many errors to correct")
+        return err_pos
+
+    def _correct_errata(self, msg, synd, err_pos):
+        '''
+        Forney's algorithm.
+        '''
+        coef_pos = [ len(msg) - 1 - p for p in err_pos ]
+
+        err_loc = [ 1 ]
+        for i in coef_pos:
+            err_loc = self._poly_mul(err_loc, self._poly_add([ 1 ], [ self._pow(2, i), 0 ]))
+
+        nsym = len(err_loc) - 1
+        _, err_eval = self._poly_div(self._poly_mul(synd[::-1], err_loc), [ 1 ] + [ 0 ] * (nsym + 1))
+        err_eval = err_eval[::-1]
+
+        X = [ self._pow(2, p) for p in coef_pos ]
+        e = [ 0 ] * len(msg)
+        for i, Xi in enumerate(X):
+            Xi_inv = self._inverse(Xi)
+            err_loc_prime = 1
+            for j, Xj in enumerate(X):
+                if j != i:
+                    err_loc_prime = self._mul(err_loc_prime, 1 ^ self._mul(Xi_inv, Xj))
+            y = self._mul(self._pow(Xi, 1 - self.fcr), self._poly_eval(err_eval[::-1], Xi_inv))
+            e[err_pos[i]] = self._div(y, err_loc_prime)
+
+        return self._poly_add(msg, e)
+
+    #
+    # many codewords
+    #
+
+    @staticmethod
+    def _columns(data, length):
+        '''
+        Pads the last (shortened) block with leading zeros, and returns the
+        byte columns of the blocks, along with the padding.
+        '''
+        pad = -len(data) % length
+        if pad:
+            last = len(data) - (length - pad)
+            data = data[:last] + bytes(pad) + data[last:]
+        return [ data[j::length] for j in range(length) ], pad
+
+    def encode_blocks(self, data, k):
+        '''
+        Splits data into k-byte messages (the last one may be shorter) and
+        encodes each into a codeword of k + nsym bytes. The parity of all the
+        messages is computed together, column by column.
+
+        @returns the concatenated codewords
+        '''
+        n = k + self.nsym
+        if k <= 0 or n > 255:
+            raise ECCError("invalid message size")
+        if not data:
+            return b''
+
+        cols, pad = self._columns(bytes(data), k)
+        m = len(cols[0])
+        zero = bytes(m)
+        tables = [ self._mul_table(g) for g in self.generator[1:] ]
+
+        reg = [ zero ] * self.nsym
+        for col in cols:
+            feedback = _xor(col, reg[0])
+            reg = reg[1:] + [ zero ]
+            for t, table in enumerate(tables):
+                reg[t] = _xor(reg[t], feedback.translate(table))
+
+        out = bytearray(m * n)
+        for j, col in enumerate(cols + reg):
+            out[j::n] = col
+        if pad:
+            del out[(m - 1) * n:(m - 1) * n + pad]
+        return bytes(out)
+
+    def decode_blocks(self, data, n):
+        '''
+        Splits data into n-byte codewords (the last one may be shorter) and
+        corrects each one. Syndromes are computed for all the codewords
+        together, and only the codewords with errors are decoded one by one.
+
+        @returns a (messages, corrected) tuple, where messages is the
+                 concatenated messages and corrected maps the index of each
+                 corrected codeword to the corrected positions in it
+        '''
+        if not self.nsym < n <= 255:
+            raise ECCError("invalid codeword size")
+        data = bytes(data)
+        if not data:
+            return b'', { }
+
+        cols, pad = self._columns(data, n)
+        if pad and n - pad <= self.nsym:
+            raise ECCError("the last codeword is shorter than its parity")
+        m = len(cols[0])
+
+        bad = 0
+        for i in range(self.nsym):
+            table = self._mul_table(self._pow(2, i + self.fcr))
+            s = bytes(m)
+            for col in cols:
+                s = _xor(s.translate(table), col)
+            bad |= int.from_bytes(s, 'big')
+
+        k = n - self.nsym
+        messages = [ data[b*n:b*n+k] for b in range(m) ]
+        if pad:
+            messages[-1] = data[(m - 1) * n:len(data) - self.nsym]
+
+        corrected = { }
+        flags = bad.to_bytes(m, 'big')
+        for b in range(m):
+            if flags[b]:
+                codeword = data[b*n:(b+1)*n]
+                p = pad if b == m - 1 else 0
+                try:
+                    message, positions = self.decode(bytes(p) + codeword)
+                except ECCError as e:
+                    raise ECCError("codeword %d: %s" % (b, e)) from None
+                if any(message[:p]):
+                    raise ECCError("codeword %d: too many errors to correct" % b)
+                messages[b] = message[p:]
+                corrected[b] = [ q - p for q in positions ]
+
+        return b''.join(messages), corrected
@@ -3,3 +3,6 @@ class BlobError(Exception):
 
 class XORError(BlobError):
     pass
+
+class ECCError(BlobError):
+    pass
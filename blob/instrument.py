@@ -0,0 +1,223 @@
+'''
+Opt-in instrumentation of Blob operations.
+
+While a Recorder (or a hook) is active, every Blob method, the bitwise op
+helper in utils, the scipy functions that Blobs call, and the conversions
+between the byte and bit representations of Blobs record how often they are
+called, how long they take, and how many bytes they work on:
+
+    with blob.instrument.record() as r:
+        triage(b)
+    print(r.to_json())
+
+Nothing is wrapped until the first recorder or hook starts: the wrappers are
+swapped into place then, and the original functions are put back when the
+last one stops, so instrumentation costs nothing while it is off. Times are
+wall-clock and inclusive, so an operation's time includes the operations that
+it calls.
+'''
+
+import collections
+import functools
+import inspect
+import json
+import time
+import types
+
+from . import utils
+from . import blob as _blob
+from .blob import Blob
+
+# the operator methods that are instrumented along with the public methods
+_DUNDER_OPS = ('__getitem__', '__xor__', '__and__', '__or__', '__invert__', '__add__')
+
+# the functions that convert between representations, and what they count as
+CONVERSIONS = {
+    'utils.to_bitstr': 'bytes_to_bits',
+    'utils.from_bitstr': 'bits_to_bytes',
+}
+
+_recorders = [ ]
+_hooks = [ ]
+_originals = [ ] # (owner, attribute, original value) of everything swapped in
+
+
+def _nbytes(args):
+    '''
+    Guesses the number of bytes that a call works on from its first Blob,
+    bytes, or bit string argument.
+    '''
+    for a in args:
+        if isinstance(a, Blob):
+            return a.size_bits // 8 # unlike size, this never converts
+        elif isinstance(a, (bytes, bytearray, memoryview)):
+            return len(a)
+        elif isinstance(a, str):
+            return len(a) // 8
+    return 0
+
+
+def _emit(name, seconds, nbytes):
+    for r in _recorders:
+        r._add(name, seconds, nbytes)
+    for h in _hooks:
+        h(name, seconds, nbytes)
+
+
+def _wrap(name, f):
+    if inspect.isgeneratorfunction(f):
+        @functools.wraps(f)
+        def generator_wrapper(*args, **kwargs):
+            # only the time spent producing values counts, not the consumer's
+            nbytes = _nbytes(args)
+            it = f(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        v = next(it)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield v
+            finally:
+                _emit(name, elapsed, nbytes)
+        return generator_wrapper
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            _emit(name, time.perf_counter() - start, _nbytes(args))
+    return wrapper
+
+
+def _targets():
+    '''
+    Yields (owner, attribute, name) for everything that gets instrumented.
+    '''
+    for attr, v in vars(Blob).items():
+        if attr.startswith('_') and attr not in _DUNDER_OPS:
+            continue
+        if isinstance(v, (types.FunctionType, staticmethod, classmethod)):
+            yield Blob, attr, 'Blob.' + attr
+    for attr in ('to_bitstr', 'from_bitstr', '_op_str'):
+        yield utils, attr, 'utils.' + attr
+    for attr, name in (('_scipy_entropy', 'scipy.stats.entropy'), ('_scipy_chisquare', 'scipy.stats.chisquare'), ('_scipy_chi2_sf', 'scipy.stats.chi2.sf')):
+        yield _blob, attr, name
+
+
+def _install():
+    for owner, attr, name in _targets():
+        v = vars(owner)[attr]
+        if isinstance(v, (staticmethod, classmethod)):
+            wrapped = type(v)(_wrap(name, v.__func__))
+        else:
+            wrapped = _wrap(name, v)
+        _originals.append((owner, attr, v))
+        setattr(owner, attr, wrapped)
+
+
+def _uninstall():
+    while _originals:
+        owner, attr, v = _originals.pop()
+        setattr(owner, attr, v)
+
+
+def _activate():
+    if not _originals:
+        _install()
+
+
+def _deactivate():
+    if not _recorders and not _hooks:
+        _uninstall()
+
+
+def add_hook(hook):
+    '''
+    Calls hook(name, seconds, nbytes) after every instrumented call, until it
+    is removed with remove_hook().
+    '''
+    _hooks.append(hook)
+    _activate()
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+    _deactivate()
+
+
+def enabled():
+    '''
+    Returns True if Blob operations are currently instrumented.
+    '''
+    return bool(_originals)
+
+
+class Recorder(object):
+    '''
+    Collects call counts, times, and bytes per operation, and counts the
+    conversions between byte and bit representations. Use it as a context
+    manager, or call start() and stop().
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+        self.bytes = collections.Counter()
+
+    def _add(self, name, seconds, nbytes):
+        self.calls[name] += 1
+        self.seconds[name] += seconds
+        self.bytes[name] += nbytes
+
+    def start(self):
+        if self not in _recorders:
+            _recorders.append(self)
+            _activate()
+        return self
+
+    def stop(self):
+        if self in _recorders:
+            _recorders.remove(self)
+            _deactivate()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def as_dict(self):
+        '''
+        @returns a dict with the per-operation stats, as
+                 { 'operations': { name: { 'calls', 'seconds', 'bytes' } },
+                   'conversions': { 'bytes_to_bits'/'bits_to_bytes': { 'calls', 'seconds', 'bytes' } } }
+        '''
+        operations = { }
+        conversions = { }
+        for name in sorted(self.calls, key=lambda n: -self.seconds[n]):
+            stats = { 'calls': self.calls[name], 'seconds': self.seconds[name], 'bytes': self.bytes[name] }
+            if name in CONVERSIONS:
+                conversions[CONVERSIONS[name]] = stats
+            else:
+                operations[name] = stats
+        return { 'operations': operations, 'conversions': conversions }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.as_dict(), **kwargs)
+
+
+def record():
+    '''
+    Returns a new Recorder, for use in a with statement.
+    '''
+    return Recorder()
@@ -0,0 +1,195 @@
+'''
+Block cipher modes of operation over Blobs.
+
+Each mode takes a block function that encrypts (or, for ECB and CBC
+decryption, decrypts) a single block of bytes, and applies it across a Blob.
+The XORs are done on whole buffers at once, and the modes whose block
+function calls are independent (ECB, CTR, CBC decryption and CFB decryption)
+can spread those calls over a thread pool, which helps with block functions
+that release the GIL.
+'''
+
+import concurrent.futures
+
+from . import utils
+from .blob import Blob, _blobify
+from .errors import BlobError
+
+
+def _blocks(data, blocksize, partial=False):
+    if not partial and len(data) % blocksize != 0:
+        raise BlobError("data size is not a multiple of the block size")
+    return [ data[i:i+blocksize] for i in range(0, len(data), blocksize) ]
+
+
+def _map(f, blocks, workers):
+    if workers is None or workers <= 1:
+        return [ f(b) for b in blocks ]
+
+    # hand each thread a run of blocks to keep the overhead down
+    # (ThreadPoolExecutor.map ignores chunksize)
+    step = max(len(blocks) // (workers * 4), 1)
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        runs = pool.map(lambda r: [ f(b) for b in r ], [ blocks[i:i+step] for i in range(0, len(blocks), step) ])
+        return [ o for run in runs for o in run ]
+
+
+def _xor(a, b):
+    return utils.xor_str(a, b, cycle=False) if a else b''
+
+
+def _check_iv(iv, blocksize):
+    iv = _blobify(iv).data
+    if len(iv) != blocksize:
+        raise BlobError("the IV must be exactly one block long")
+    return iv
+
+#
+# padding
+#
+
+def pad(data, blocksize=16):
+    '''
+    PKCS#7-pads data to a multiple of the block size.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    n = blocksize - len(d) % blocksize
+    return Blob._from_data(d + bytes([n]) * n)
+
+
+def unpad(data, blocksize=16):
+    '''
+    Strips PKCS#7 padding, raising a BlobError if it is invalid (which is what
+    a padding oracle leaks).
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    if not d or len(d) % blocksize != 0:
+        raise BlobError("padded data size is not a multiple of the block size")
+    n = d[-1]
+    if n == 0 or n > blocksize or d[-n:] != bytes([n]) * n:
+        raise BlobError("invalid padding")
+    return Blob._from_data(d[:-n])
+
+#
+# modes
+#
+
+def ecb(data, f, blocksize=16, workers=None):
+    '''
+    Applies f to each block independently (ECB encryption or decryption).
+
+    @param data: the Blob (or bytes) to process
+    @param f: the block function, taking and returning bytes
+    @param blocksize: the block size, in bytes
+    @param workers: the number of threads to call f from (default: call it
+                    from the calling thread)
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    return Blob._from_data(b''.join(_map(f, _blocks(d, blocksize), workers)))
+
+
+def cbc_encrypt(data, encrypt, iv, blocksize=16):
+    '''
+    CBC-encrypts data with the block encryption function encrypt.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    prev = _check_iv(iv, blocksize)
+    out = [ ]
+    for block in _blocks(d, blocksize):
+        prev = encrypt(_xor(block, prev))
+        out.append(prev)
+    return Blob._from_data(b''.join(out))
+
+
+def cbc_decrypt(data, decrypt, iv, blocksize=16, workers=None):
+    '''
+    CBC-decrypts data with the block decryption function decrypt. Every block
+    is decrypted independently, and the chaining is undone with one XOR over
+    the whole buffer.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    iv = _check_iv(iv, blocksize)
+    decrypted = b''.join(_map(decrypt, _blocks(d, blocksize), workers))
+    return Blob._from_data(_xor(decrypted, iv + d[:-blocksize]))
+
+
+def ctr(data, encrypt, nonce=b'', counter=0, blocksize=16, byteorder='big', workers=None):
+    '''
+    CTR-encrypts (or decrypts) data with the block encryption function encrypt.
+    Counter block i is the nonce followed by counter + i, encoded in the
+    remaining bytes of the block with the given byte order. For example, the
+    usual NIST layout is nonce=b'', counter=int.from_bytes(iv, 'big'), and an
+    8-byte nonce with byteorder='little' gives a 64-bit little-endian block
+    counter.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    nonce = _blobify(nonce).data
+    width = blocksize - len(nonce)
+    if width < 0:
+        raise BlobError("the nonce is longer than a block")
+
+    mask = (1 << (8 * width)) - 1
+    counters = [
+        nonce + ((counter + i) & mask).to_bytes(width, byteorder)
+        for i in range((len(d) + blocksize - 1) // blocksize)
+    ]
+    keystream = b''.join(_map(encrypt, counters, workers))
+    return Blob._from_data(_xor(d, keystream[:len(d)]))
+
+
+def ofb(data, encrypt, iv, blocksize=16):
+    '''
+    OFB-encrypts (or decrypts) data with the block encryption function encrypt.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    prev = _check_iv(iv, blocksize)
+    keystream = [ ]
+    for _ in range((len(d) + blocksize - 1) // blocksize):
+        prev = encrypt(prev)
+        keystream.append(prev)
+    return Blob._from_data(_xor(d, b''.join(keystream)[:len(d)]))
+
+
+def cfb_encrypt(data, encrypt, iv, blocksize=16):
+    '''
+    CFB-encrypts data (with full-block feedback) with the block encryption
+    function encrypt.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    prev = _check_iv(iv, blocksize)
+    out = [ ]
+    for block in _blocks(d, blocksize, partial=True):
+        prev = _xor(block, encrypt(prev)[:len(block)])
+        out.append(prev)
+    return Blob._from_data(b''.join(out))
+
+
+def cfb_decrypt(data, encrypt, iv, blocksize=16, workers=None):
+    '''
+    CFB-decrypts data (with full-block feedback) with the block encryption
+    function encrypt. Every keystream block only depends on the ciphertext, so
+    they are computed independently.
+
+    @returns a Blob
+    '''
+    d = _blobify(data).data
+    iv = _check_iv(iv, blocksize)
+    feedback = _blocks(iv + d, blocksize, partial=True)[:(len(d) + blocksize - 1) // blocksize]
+    keystream = b''.join(_map(encrypt, feedback, workers))
+    return Blob._from_data(_xor(d, keystream[:len(d)]))
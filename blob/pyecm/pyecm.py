@@ -11,12 +11,23 @@ Description: Factors a number using the Elliptic Curve Method, a fast algorithm
 We are using curves in Suyama's parametrization, but points are in affine coordinates, and the curve is in Wierstrass form.
 The idea is to do many curves in parallel to take advantage of batch inversion algorithms. This gives asymptotically 7 modular multiplications per bit.
 
+Alternatively (engine='montgomery' in ecm and factors, or -m on the command line), curves are in Montgomery form and points are in x-only projective coordinates, which needs no inversions at all. This is much faster without gmpy, where inversion is slow. See the Montgomery curves section below.
+
+ECM is the wrong method for composites whose smallest factor is big, such as balanced semiprimes of 50 digits or more, so factors switches to a self-initializing quadratic sieve (siqs) for composites of SIQS_DIGITS digits or more that a short run of ECM cannot split. See the Self-initializing quadratic sieve section below.
+
 WARNING: pyecm is NOT a general-purpose number theory or elliptic curve library. Many of the functions have confusing calling syntax, and some will rather unforgivingly crash or return bad output if the input is not formatted exactly correctly. That said, there are a couple of functions that you CAN safely import into another program. These are: factors, isprime. However, be sure to read the documentation for each function that you use.
 '''
 
+import bisect
+import concurrent.futures
+import functools
+import itertools
+import json
 import math
+import os
 import sys
 import random
+import time
 
 try:
    import psyco
@@ -38,154 +49,71 @@ except ImportError:
    except ImportError:
       GMPY_EXISTS = False
 
-if not GMPY_EXISTS:
-   PRIMES = (5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71, 73, 79, 83, 89, 97, 101, 103, 107, 109, 113, 127, 131, 137, 139, 149, 151, 167)
-   GMPY_EXISTS = False
-
-   def gcd(a, b):
-      '''Computes the Greatest Common Divisor of a and b using the standard quadratic time improvement to the Euclidean Algorithm.
-
-   Returns the GCD of a and b.'''
-      if b == 0:
-         return a
-      elif a == 0:
-         return b
-
-      count = 0
-
-      if a < 0:
-         a = -a
-      if b < 0:
-         b = -b
-
-      while not ((a & 1) | (b & 1)):
-         count += 1
-         a >>= 1
-         b >>= 1
-
-      while not a & 1:
-         a >>= 1
-
-      while not b & 1:
-         b >>= 1
-
-      if b > a:
-         b,a = a,b
-
-      while b != 0 and a != b:
-         a -= b
-         while not (a & 1):
-            a >>= 1
+try: # numpy makes the quadratic sieve much faster, but it works without it
+   import numpy
+   NUMPY_EXISTS = True
+except ImportError:
+   NUMPY_EXISTS = False
 
-         if b > a:
-            b, a = a, b
+if not GMPY_EXISTS:
+   # Python's own big-int primitives are much faster than anything we could
+   # write in pure Python, so the fallbacks are thin wrappers around them.
+   from math import gcd
+   from math import isqrt as sqrt
 
-      return a << count
+   SIEVE_LIMIT = 1 << 22 # next_prime looks up primes below this in a table
+   _prime_table = [0, []] # the table's current limit, and the primes below it
+   _prime_window = [0, 0, [], True] # start, end, sieve survivors, and whether they are all prime
 
    def invert(a, b):
-      '''Computes the inverse of a modulo b. b must be odd.
+      '''Computes the inverse of a modulo b.
 
-Returns the inverse of a (mod b).'''
-      if a == 0 or b == 0:
+Returns the inverse of a (mod b), or 0 if there is none.'''
+      try:
+         return pow(a, -1, b)
+      except ValueError:
          return 0
 
-      truth = False
-      if a < 0:
-         truth = True
-         a = -a
-
-      b_orig = b
-      alpha = 1
-      beta = 0
-
-      while not a & 1:
-         if alpha & 1:
-            alpha += b_orig
-         alpha >>= 1
-         a >>= 1
-
-      if b > a:
-         a, b = b, a
-         alpha, beta = beta, alpha
-
-      while b != 0 and a != b:
-         a -= b
-         alpha -= beta
-
-         while not a & 1:
-            if alpha & 1:
-               alpha += b_orig
-            alpha >>= 1
-            a >>= 1
-
-         if b > a:
-            a,b = b,a
-            alpha, beta = beta, alpha
-
-      if a == b:
-         a -= b
-         alpha -= beta
-         a, b = b, a
-         alpha, beta = beta, alpha
-
-      if a != 1:
-         return 0
-
-      if truth:
-         alpha = b_orig - alpha
-
-      return alpha
-
    def next_prime(n):
-      '''Finds the next prime after n.
+      '''Finds the next prime after n. Primes below SIEVE_LIMIT come from a table, which is sieved (and grown) as needed. Above that, a window of numbers after n is sieved with the primes in the table, and what is left gets strong probable prime tests to bases 2, 3, 5 and 7, unless the sieve alone was enough to prove them prime. The last window is kept, since next_prime is mostly called on increasing numbers.
 
 Returns the next prime after n.'''
-      n += 1
-      if n <= 167:
-         if n <= 23:
-            if n <= 3:
-               return 3 - (n <= 2)
-            n += (n & 1) ^ 1
-            return n + (((4 - (n % 3)) >> 1) & 2)
-
-         n += (n & 1) ^ 1
-         inc = n % 3
-         n += ((4 - inc) >> 1) & 2
-         inc = 6 - ((inc + ((2 - inc) & 2)) << 1)
-
-         while 0 in (n % 5, n % 7, n % 11):
-            n += inc
-            inc = 6 - inc
-         return n
-
-      n += (n & 1) ^ 1
-      inc = n % 3
-      n += ((4 - inc) >> 1) & 2
-      inc = 6 - ((inc + ((2 - inc) & 2)) << 1)
-      should_break = False
-
-      while 1:
-         for prime in PRIMES:
-            if not n % prime:
-               should_break = True
+      if n < 2:
+         return 2
+
+      if n < SIEVE_LIMIT >> 1: # There is always a prime between n and 2n.
+         primes = _primes_below(2 * n + 2)
+         return primes[bisect.bisect_right(primes, n)]
+
+      start, end, candidates, exact = _prime_window
+      while True:
+         if start <= n + 1 and n < end:
+            for i in range(bisect.bisect_right(candidates, n), len(candidates)):
+               c = candidates[i]
+               if exact or all(sprp(c, a) for a in (2, 3, 5, 7)):
+                  return c
+            n = max(n, end - 1)
+
+         start = n + 1
+         end = start + (1 << 16)
+         exact = end <= SIEVE_LIMIT**2
+         s = bytearray([1]) * (end - start)
+         for prime in _primes_below(sqrt(end) + 1 if exact else 1 << 16):
+            if prime * prime >= end or not exact and prime >= 1 << 16:
                break
+            first = -start % prime
+            s[first::prime] = bytes(len(range(first, end - start, prime)))
+         candidates = list(itertools.compress(range(start, end), s))
+         _prime_window[:] = [start, end, candidates, exact]
 
-         if should_break:
-            should_break = False
-            n += inc
-            inc = 6 - inc
-            continue
-
-         p = 1
-         for i in range(int(math.log(n) / LOG_2), 0, -1):
-            p <<= (n >> i) & 1
-            p = (p * p) % n
+   def _primes_below(limit):
+      '''Grows the table of primes (4 times at a time, up to SIEVE_LIMIT) until it has all primes below limit.
 
-         if p == 1:
-            return n
-
-         n += inc
-         inc = 6 - inc
+Returns the table.'''
+      while _prime_table[0] < min(limit, SIEVE_LIMIT):
+         size = min(max(_prime_table[0] << 2, 1 << 16), SIEVE_LIMIT)
+         _prime_table[:] = [size, prime_sieve(size)]
+      return _prime_table[1]
 
    def mpz(n):
       '''A dummy function to ensure compatibility with those that do not have gmpy.
@@ -194,33 +122,27 @@ Returns n.'''
       return n
 
    def root(n, k):
-      '''Finds the floor of the kth root of n. This is a duplicate of gmpy's root function.
-
-Returns a tuple. The first item is the floor of the kth root of n. The second is 1 if the root is exact (as in, sqrt(16)) and 0 if it is not.'''
-      low = 0
-      high = n + 1
-      while high > low + 1:
-         mid = (low + high) >> 1
-         mr = mid**k
-         if mr == n:
-            return (mid, 1)
-         if mr < n:
-            low = mid
-         if mr > n:
-            high = mid
-      return (low, 0)
-
-   def sqrt(n):
-      return root(n, 2)[0]
+      '''Finds the floor of the kth root of n, with Newton's method. This is a duplicate of gmpy's root function.
+
+Returns a tuple. The first item is the floor of the kth root of n. The second is True if the root is exact (as in, root(16, 2)) and False if it is not.'''
+      if n < 2:
+         return (n, True)
+      if k == 2:
+         r = sqrt(n)
+      else:
+         r = 1 << -(-n.bit_length() // k) # at least the root
+         while True:
+            s = ((k - 1) * r + n // r**(k - 1)) // k
+            if s >= r:
+               break
+            r = s
+      return (r, r**k == n)
 
 # We're done importing. Now for some constants.
 if GMPY_EXISTS:
    INV_C = 1.4
 else:
-   if PSYCO_EXISTS:
-      INV_C = 7.3
-   else:
-      INV_C = 13.0
+   INV_C = 4.3 # Calibrated by timing factors() on 17-24 digit semiprimes with CPython 3.11; measure_inv_c() gives 4-9.
 LOG_2 = math.log(2)
 LOG_4 = math.log(4)
 LOG_3_MINUS_LOG_LOG_2 = math.log(3) - math.log(LOG_2)
@@ -234,6 +156,23 @@ MULT = math.log(3) / LOG_2
 ONE = mpz(1)
 SMALL = 2.0**(-30)
 SMALLEST_COUNTEREXAMPLE_FASTPRIME = 2047
+SMALL_PRIME_LIMIT = 1000 # isprime looks up numbers below this, and trial divides by the primes below it
+SMALL_PRIMES = frozenset(p for p in range(2, SMALL_PRIME_LIMIT) if all(p % d for d in range(2, int(p**0.5) + 1)))
+SMALL_PRIMORIAL = mpz(math.prod(SMALL_PRIMES))
+# (limit, bases): Miller-Rabin with these bases is exact below the limit (Jaeschke; Zhang and Tang; Sorenson and Webster)
+MR_BASES = (
+   (2047, (2,)),
+   (1373653, (2, 3)),
+   (25326001, (2, 3, 5)),
+   (3215031751, (2, 3, 5, 7)),
+   (2152302898747, (2, 3, 5, 7, 11)),
+   (3474749660383, (2, 3, 5, 7, 11, 13)),
+   (341550071728321, (2, 3, 5, 7, 11, 13, 17)),
+   (3825123056546413051, (2, 3, 5, 7, 11, 13, 17, 19, 23)),
+   (318665857834031151167461, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)),
+   (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+)
+ISPRIME_CACHE_SIZE = 1 << 12 # how many recent results isprime remembers
 T = (type(mpz(1)), type(1))
 DUMMY = 'dummy' # Dummy value throughout the program
 VERSION = '2.0.2'
@@ -334,7 +273,7 @@ def add(p1, p2,  n):
    '''Adds first argument to second (second argument is not preserved). The arguments are points on an elliptic curve. The first argument may be a tuple instead of a list. The addition is thus done pointwise. This function has bizzare input/output because there are fast algorithms for inverting a bunch of numbers at once.
 
 Returns a list of the addition results.'''
-   inv = range(len(p1))
+   inv = list(range(len(p1)))
 
    for i in range(len(p1)):
       inv[i] = p1[i][0] - p2[i][0]
@@ -356,8 +295,8 @@ def add_sub_x_only(p1, p2,  n):
 p1[i] + p2[i] and p1[i] - p2[i] for each i.
 
 Returns two lists, the first being the sums and the second the differences.'''
-   sums = range(len(p1))
-   difs = range(len(p1))
+   sums = list(range(len(p1)))
+   difs = list(range(len(p1)))
 
    for i in range(len(p1)):
       sums[i] = p2[i][0] - p1[i][0]
@@ -404,43 +343,19 @@ Returns a copy of p.'''
    return answer
 
 def could_be_prime(n):
-   '''Performs some trials to compute whether n could be prime. Run time is O(N^3 / (log N)^2) for N bits.
+   '''Trial divides n by the primes below SMALL_PRIME_LIMIT, all at once with one gcd.
 
 Returns whether it is possible for n to be prime (True or False).
 '''
-   if n < 2:
-      return False
-   if n == 2:
-      return True
-   if not n & 1:
-      return False
-
-   product = ONE
-   log_n = int(math.log(n)) + 1
-   bound = int(math.log(n) / (LOG_2 * math.log(math.log(n))**2)) + 1
-   if bound * log_n >= n:
-      bound = 1
-      log_n = int(sqrt(n))
-   prime_bound = 0
-   prime = 3
-
-   for _ in range(bound):
-      p = []
-      prime_bound += log_n
-      while prime <= prime_bound:
-         p.append(prime)
-         prime = next_prime(prime)
-      if p != []:
-         p = prod(p)
-         product = (product * p) % n
-
-   return gcd(n, product) == 1
+   if n < SMALL_PRIME_LIMIT:
+      return n in SMALL_PRIMES
+   return gcd(n, SMALL_PRIMORIAL) == 1
 
 def double(p, n):
    '''Doubles each point in the input list. Much like the add function, we take advantage of fast inversion.
 
 Returns the doubled list.'''
-   inv = range(len(p))
+   inv = list(range(len(p)))
 
    for i in range(len(p)):
       inv[i] = p[i][1] << 1
@@ -460,41 +375,14 @@ Returns the doubled list.'''
    return p
 
 def fastprime(n):
-   '''Tests for primality of n using an algorithm that is very fast, O(N**3 / log(N)) (assuming quadratic multiplication) where n has N digits, but ocasionally inaccurate for n >= 2047.
+   '''Tests for primality of n with trial division and a strong probable prime test to base 2, which is very fast, but ocasionally inaccurate for n >= 2047.
 
 Returns the primality of n (True or False).'''
    if not could_be_prime(n):
       return False
-   if n == 2:
-      return True
-
-   j = 1
-   d = n >> 1
-
-   while not d & 1:
-      d >>= 1
-      j += 1
-
-   p = 1
-   pos = int(math.log(d) / LOG_2)
-
-   while pos >= 0:
-      p = (p * p) % n
-      p <<= (d >> pos) & 1
-      pos -= 1
-
-   if p in (n - 1, n + 1):
+   if n < SMALL_PRIME_LIMIT**2:
       return True
-
-   for _ in range(j):
-      p = (p * p) % n
-
-      if p == 1:
-         return False
-      elif p == n - 1:
-         return True
-
-   return False
+   return sprp(n, 2)
 
 def greatest_n(phi_max):
    '''Finds the greatest n such that phi(n) < phi_max.
@@ -510,7 +398,7 @@ Returns the greatest n such that phi(n) < phi_max.'''
 
    n_max = (phi_max * product) // phi_product
 
-   phi_values = range(n_max)
+   phi_values = list(range(n_max))
 
    prime = 2
    while prime <= n_max:
@@ -529,6 +417,29 @@ def inv_const(n):
 Returns the constant for a given n.'''
    return int(INV_C * math.log(n)**0.42)
 
+def measure_inv_c(bits=256, count=200, repeat=5):
+   '''Measures INV_C, the cost of a modular inversion in modular multiplications divided by log(n)**0.42 (see inv_const), for a random odd n of the given size. INV_C is not measured when pyecm is imported because the curves that mainloop runs, and so the results with ra set to False, depend on it.
+
+Returns the measured constant.'''
+   rand = random.Random(bits)
+   n = rand.getrandbits(bits) | (1 << (bits - 1)) | 1
+   a = [rand.randrange(1, n) for _ in range(count)]
+   b = [rand.randrange(1, n) for _ in range(count)]
+   mul = inv = BIG
+
+   for _ in range(repeat):
+      start = time.perf_counter()
+      for x, y in zip(a, b):
+         (x * y) % n
+      mul = min(mul, time.perf_counter() - start)
+
+      start = time.perf_counter()
+      for x in a:
+         invert(x, n)
+      inv = min(inv, time.perf_counter() - start)
+
+   return inv / mul / math.log(n)**0.42
+
 def naf(d):
    '''Finds a number's non-adjacent form, reverses the bits, replaces the
 -1's with 3's, and interprets the result base 4.
@@ -764,7 +675,7 @@ def subtract(p1, p2,  n):
    '''Given two points on an elliptic curve, subtract them pointwise.
 
 Returns the resulting point.'''
-   inv = range(len(p1))
+   inv = list(range(len(p1)))
 
    for i in range(len(p1)):
       inv[i] = p2[i][0] - p1[i][0]
@@ -792,11 +703,11 @@ Returns nothing.'''
 
    return
 
-def sure_factors(n, u, curve_params, veb, ra, ov, tdb, pr):
+def sure_factors(n, u, curve_params, veb, ra, ov, tdb, pr, budget=None):
    '''Factor n as far as possible with given smoothness bound and curve parameters, including possibly (but very rarely) calling ecm again.
 
 Yields factors of n.'''
-   f = mainloop(n, u, curve_params)
+   f = mainloop(n, u, curve_params, budget)
 
    if f == 1:
       return
@@ -822,7 +733,7 @@ Yields factors of n.'''
       else:
          if veb:
             print('entering new ecm loop to deal with stubborn factor:', factor)
-         for factor_of_factor in ecm(factor, True, ov, veb, tdb, pr):
+         for factor_of_factor in ecm(factor, True, ov, veb, tdb, pr, budget=budget):
             yield factor_of_factor
       n //= factor
 
@@ -843,10 +754,11 @@ Returns a list.'''
 
    return tuple(answer)
 
-def mainloop(n, u, p1):
+def mainloop(n, u, p1, budget=None):
    ''' Input:   n  -- an integer to (try) to factor.
          u  -- the phase 1 smoothness bound
          p1 -- a list of sigma parameters to try
+         budget -- A Budget to check between batches of primes, or None
 
    Output:   A factor of n. (1 is returned on faliure).
 
@@ -871,7 +783,7 @@ def mainloop(n, u, p1):
    max_order = n + sqrt(n << 2) + 1 # By Hasse's theorem.
    det_bound = ((1 << w) - 1 + ((w & 1) << 1)) // 3
    log_mo = math.log(max_order)
-   p = range(number_of_primes)
+   p = list(range(number_of_primes))
    prime = mpz(2)
 
    p1 = get_points(p1, n)
@@ -892,6 +804,8 @@ def mainloop(n, u, p1):
                return p1
 
    while prime < sqrt(u) and isinstance(p1, list):
+      if budget is not None:
+         budget.check()
       for i in range(number_of_primes):
          prime = next_prime(prime)
          p[i] = prime ** max(1, int(log_u / math.log(prime)))
@@ -901,6 +815,8 @@ def mainloop(n, u, p1):
       return p1
 
    while prime < u and isinstance(p1, list):
+      if budget is not None:
+         budget.check()
       for i in range(number_of_primes):
          prime = next_prime(prime)
          p[i] = prime
@@ -957,6 +873,8 @@ def mainloop(n, u, p1):
    ptotal_jump = to_tuple(ptotal_jump)
 
    while big_multiple < u2:
+      if budget is not None:
+         budget.check()
       big_multiple += total_jump
       center_up = big_multiple
       center_down = big_multiple
@@ -1081,48 +999,122 @@ Returns the points.'''
 
    return p1
 
-def isprime(n):
-   ''' Tests for primality of n trying first fastprime and then a slower but accurate algorithm. Time complexity is O(N**3) (assuming quadratic multiplication), where n has N digits.
-
-Returns the primality of n (True or False).'''
-   if not fastprime(n):
-      return False
-   elif n < SMALLEST_COUNTEREXAMPLE_FASTPRIME:
-      return True
-
-   do_loop = False
-   j = 1
-   d = n >> 1
-   a = 2
-   bound = int(0.75 * math.log(math.log(n)) * math.log(n)) + 1
+def sprp(n, a):
+   '''Tests whether an odd n > 2 is a strong probable prime to base a.
 
+Returns True or False.'''
+   d = n - 1
+   j = 0
    while not d & 1:
       d >>= 1
       j += 1
+   x = pow(a, d, n)
+   if x == 1 or x == n - 1:
+      return True
+   for _ in range(j - 1):
+      x = (x * x) % n
+      if x == n - 1:
+         return True
+   return False
 
-   while a < bound:
-      a = next_prime(a)
-      p = atdn(a, d, n)
+def jacobi(a, n):
+   '''Computes the Jacobi symbol (a/n) for an odd n > 0.
 
-      if p == 1 or p == n - 1:
-         continue
+Returns -1, 0 or 1.'''
+   a %= n
+   result = 1
+   while a:
+      while not a & 1:
+         a >>= 1
+         if n & 7 in (3, 5):
+            result = -result
+      a, n = n, a
+      if a & 3 == 3 and n & 3 == 3:
+         result = -result
+      a %= n
+   return result if n == 1 else 0
 
-      for _ in range(j):
-         p = (p * p) % n
+def strong_lucas(n):
+   '''Tests whether an odd n, with no small factors, is a strong Lucas probable prime, with the parameters of Selfridge's method A: D is the first of 5, -7, 9, -11, ... with (D/n) = -1, P = 1 and Q = (1 - D) / 4.
 
-         if p == 1:
-            return False
-         elif p == n - 1:
-            do_loop = True
-            break
+Returns True or False.'''
+   if sqrt(n)**2 == n: # No D would do for a square.
+      return False
+   d = 5
+   while True:
+      j = jacobi(d, n)
+      if j == -1:
+         break
+      if j == 0 and abs(d) != n:
+         return False
+      d = -d - 2 if d > 0 else -d + 2
+   q = (1 - d) // 4
+
+   k = n + 1
+   s = 0
+   while not k & 1:
+      k >>= 1
+      s += 1
+
+   # U_1 = 1 and V_1 = P = 1, then double (and add one) along the bits of k.
+   u, v, qk = 1, 1, q % n
+   for bit in bin(k)[3:]:
+      u, v = (u * v) % n, (v * v - 2 * qk) % n
+      qk = (qk * qk) % n
+      if bit == '1':
+         u, v = u + v, (d * u + v) % n
+         if u & 1:
+            u += n
+         if v & 1:
+            v += n
+         u, v = (u >> 1) % n, v >> 1
+         qk = (qk * q) % n
+
+   if u == 0 or v == 0:
+      return True
+   for _ in range(s - 1):
+      v = (v * v - 2 * qk) % n
+      qk = (qk * qk) % n
+      if v == 0:
+         return True
+   return False
 
-      if do_loop:
-         do_loop = False
-         continue
+@functools.lru_cache(maxsize=ISPRIME_CACHE_SIZE)
+def isprime(n):
+   ''' Tests for primality of n: trial division by the small primes, then Miller-Rabin with the bases from MR_BASES, which is deterministic for n < 3.3 * 10**24, or above that, the Baillie-PSW test (a strong probable prime test to base 2 and a strong Lucas test), which has no known counterexamples. The results for the last ISPRIME_CACHE_SIZE numbers are cached, since factoring tests the same cofactors again and again.
 
+Returns the primality of n (True or False).'''
+   if not could_be_prime(n):
       return False
+   if n < SMALL_PRIME_LIMIT**2:
+      return True
 
-   return True
+   for limit, bases in MR_BASES:
+      if n < limit:
+         for a in bases:
+            if not sprp(n, a):
+               return False
+         return True
+
+   return sprp(n, 2) and strong_lucas(n)
+
+def isprime_many(numbers, workers=None):
+   '''Tests every number in numbers for primality, like isprime, but each distinct number only once.
+
+Input:
+   numbers -- Integers to test
+   workers -- How many processes to test them in, or None for just this one
+
+Returns a list of True or False, one for each number.'''
+   numbers = list(numbers)
+   distinct = list(dict.fromkeys(numbers))
+   if workers is not None and workers > 1 and len(distinct) > 1:
+      with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+         results = list(pool.map(isprime, distinct, chunksize=max(1, len(distinct) // (workers << 2))))
+   else:
+      results = [isprime(n) for n in distinct]
+   primality = dict(zip(distinct, results))
+   return [primality[n] for n in numbers]
 
 def multiply(p1, d, n):
    '''Multiplies each element of a list by a number, without using too much overhead.
@@ -1143,81 +1135,1108 @@ Returns a list p multiplied through by d.'''
 
    return p
 
-def ecm(n, ra, ov, veb, tdb, pr): # DOCUMENTATION
+### Montgomery curves ###
+#
+# An alternative to the Weierstrass engine above. Curves are in Montgomery
+# form, B*y^2 = x^3 + A*x^2 + x (still with Suyama's parametrization), and
+# points are kept as x-only projective coordinates (X : Z), so that neither
+# stage needs any modular inversions: stage 1 is a Montgomery ladder over the
+# product of all prime powers up to B1, and stage 2 is a baby-step giant-step
+# continuation up to B2 = MONT_B2_RATIO * B1 that pairs the primes mD - j and
+# mD + j, which share x(jQ). Curves are run one at a time.
+
+# (factor digits, B1, curves to run before moving on to the next level)
+MONT_PARAMS = (
+   (10, 150, 10),
+   (15, 2000, 25),
+   (20, 11000, 90),
+   (25, 50000, 300),
+   (30, 250000, 700),
+   (35, 1000000, 1800),
+   (40, 3000000, 5100),
+   (45, 11000000, 10600),
+   (50, 43000000, 19300),
+   (55, 110000000, 49000),
+   (60, 260000000, 124000),
+)
+MONT_B2_RATIO = 100
+MONT_D = (30, 210, 2310, 30030) # stage 2 giant step sizes to choose from
+ENGINES = ('weierstrass', 'montgomery')
+_mont_multiplier = [0, 1] # B1 and the stage 1 multiplier for it
+
+def prime_sieve(n):
+   '''Finds all primes less than n with the sieve of Eratosthenes.
+
+Returns a list of primes.'''
+   if n < 3:
+      return []
+   s = bytearray([1]) * n
+   s[0] = s[1] = 0
+   for i in range(2, int(sqrt(n - 1)) + 1):
+      if s[i]:
+         s[i*i::i] = bytes(len(range(i*i, n, i)))
+   return list(itertools.compress(range(n), s))
+
+def prime_range(low, high):
+   '''Generates the primes p with low <= p < high, in increasing order, using
+a segmented sieve so that memory use does not depend on high.
+
+Yields primes.'''
+   low = max(low, 2)
+   base = prime_sieve(int(sqrt(high)) + 2)
+   for start in range(low, high, 1 << 18):
+      end = min(start + (1 << 18), high)
+      s = bytearray([1]) * (end - start)
+      for prime in base:
+         if prime * prime >= end:
+            break
+         first = max(prime * prime, -(-start // prime) * prime) - start
+         s[first::prime] = bytes(len(range(first, end - start, prime)))
+      for prime in itertools.compress(range(start, end), s):
+         yield prime
+
+def prime_powers(b1):
+   '''Generates the largest power of every prime that is at most b1, in order of the primes.
+
+Yields prime powers.'''
+   for prime in prime_sieve(b1 + 1):
+      q = prime
+      while q * prime <= b1:
+         q *= prime
+      yield q
+
+def stage2_d(b1, b2):
+   '''Chooses the giant step D for a baby-step giant-step stage 2 from b1 to b2, balancing the D/2 baby steps against the b2/D giant steps. D is at most 2*b1, so that the giant steps start at D or more.
+
+Returns D.'''
+   return min((D for D in MONT_D if D <= b1 << 1), key=lambda D: D // 2 + b2 // D)
+
+def mont_add(x1, z1, x2, z2, xd, zd, n):
+   '''Adds two points on a Montgomery curve, given the difference of the two.
+
+Returns the (X, Z) of the sum.'''
+   u = (x1 - z1) * (x2 + z2)
+   v = (x1 + z1) * (x2 - z2)
+   return (zd * (u + v)**2) % n, (xd * (u - v)**2) % n
+
+def mont_double(x, z, a24, n):
+   '''Doubles a point on a Montgomery curve. a24 is (A + 2) / 4.
+
+Returns the (X, Z) of the double.'''
+   s = ((x + z)**2) % n
+   d = ((x - z)**2) % n
+   t = s - d
+   return (s * d) % n, (t * (d + a24 * t)) % n
+
+def mont_multiply(x, z, k, a24, n):
+   '''Multiplies a point on a Montgomery curve by k > 0 with the Montgomery ladder.
+
+Returns the (X, Z) of the multiple.'''
+   x0, z0 = x, z
+   s = ((x + z)**2) % n
+   d = ((x - z)**2) % n
+   t = s - d
+   x1, z1 = (s * d) % n, (t * (d + a24 * t)) % n
+
+   for bit in bin(k)[3:]:
+      u = (x0 - z0) * (x1 + z1)
+      v = (x0 + z0) * (x1 - z1)
+      xa, za = (z * (u + v)**2) % n, (x * (u - v)**2) % n
+      if bit == '1':
+         s = ((x1 + z1)**2) % n
+         d = ((x1 - z1)**2) % n
+         t = s - d
+         x0, z0 = xa, za
+         x1, z1 = (s * d) % n, (t * (d + a24 * t)) % n
+      else:
+         s = ((x0 + z0)**2) % n
+         d = ((x0 - z0)**2) % n
+         t = s - d
+         x0, z0 = (s * d) % n, (t * (d + a24 * t)) % n
+         x1, z1 = xa, za
+
+   return x0, z0
+
+def mont_curve(sigma, n):
+   '''Finds a Montgomery curve and a point on it from sigma using Suyama's
+parametrization. The point is normalized to Z = 1, which takes the only
+inversion that a Montgomery curve needs.
+
+Returns (x, a24), or a factor of n (possibly n) if the inversion fails.'''
+   u = (sigma * sigma - 5) % n
+   v = (sigma << 2) % n
+   u3 = pow(u, 3, n)
+   v3 = pow(v, 3, n)
+   d = (((u3 * v) % n) * v3 << 4) % n
+   try:
+      inv = invert(d, n)
+   except ZeroDivisionError:
+      inv = 0
+   if inv == 0:
+      return gcd(d, n)
+
+   x = (((u3 * u3) % n) * (v << 4) % n * inv) % n
+   a24 = (((pow(v - u, 3, n) * (3 * u + v)) % n) * ((v3 * inv) % n)) % n
+   return x, a24
+
+def mont_multiplier(b1):
+   '''Finds the product of the largest powers of all primes that are at most b1.
+
+Returns the product.'''
+   if _mont_multiplier[0] != b1:
+      _mont_multiplier[:] = [b1, prod([mpz(q) for q in prime_powers(b1)])]
+   return _mont_multiplier[1]
+
+def mont_stage2(x, z, a24, n, b1, b2):
+   '''Montgomery's baby-step giant-step continuation: for every prime q in
+(b1, b2], writes q = m*D +- j and accumulates X(mDQ) - x(jQ) * Z(mDQ), which
+is 0 modulo p if q times the stage 1 point is the identity mod p. The baby
+steps x(jQ) are normalized with a single batch inversion.
+
+Returns a factor of n (1 on failure, possibly n).'''
+   d = stage2_d(b1, b2)
+   half = d >> 1
+
+   babies = {}
+   x2, z2 = mont_double(x, z, a24, n)
+   prev, cur = (x, z), mont_add(x2, z2, x, z, x, z, n)
+   babies[1] = prev
+   for j in range(3, half, 2):
+      if gcd(j, d) == 1:
+         babies[j] = cur
+      prev, cur = cur, mont_add(cur[0], cur[1], x2, z2, prev[0], prev[1], n)
+
+   js = list(babies)
+   invs = parallel_invert([babies[j][1] for j in js], n)
+   if not isinstance(invs, list):
+      return invs
+   xs = {}
+   for j, inv in zip(js, invs):
+      xs[j] = (babies[j][0] * inv) % n
+
+   m = (b1 + 1 + half) // d
+   xd, zd = mont_multiply(x, z, d, a24, n)
+   xp, zp = mont_multiply(x, z, m * d, a24, n)
+   xg, zg = mont_multiply(x, z, (m + 1) * d, a24, n)
+   paired = set()
+   product = 1
+
+   for prime in prime_range(b1 + 1, b2 + 1):
+      m_prime = (prime + half) // d
+      if m_prime != m:
+         paired = set()
+         while m < m_prime:
+            xp, zp, (xg, zg) = xg, zg, mont_add(xg, zg, xd, zd, xp, zp, n)
+            m += 1
+      j = abs(prime - m * d)
+      if j not in paired:
+         paired.add(j)
+         product = (product * (xp - xs[j] * zp)) % n
+
+   return gcd(product, n)
+
+def mont_factor(n, sigma, b1, b2):
+   '''Runs both stages of ECM on the Montgomery curve given by sigma.
+
+Returns a factor of n (1 on failure, possibly n).'''
+   curve = mont_curve(sigma, n)
+   if not isinstance(curve, tuple):
+      return curve
+   x, a24 = curve
+
+   x, z = mont_multiply(x, 1, mont_multiplier(b1), a24, n)
+   g = gcd(z, n)
+   if g == n: # Every factor was found at once, so go prime by prime to separate them.
+      x, z = curve[0], 1
+      for q in prime_powers(b1):
+         x, z = mont_multiply(x, z, q, a24, n)
+         g = gcd(z, n)
+         if g != 1:
+            return g
+   if g != 1:
+      return g
+
+   return mont_stage2(x, z, a24, n, b1, b2)
+
+def mont_level(level):
+   '''Finds the parameters for a level of the Montgomery engine. Past the end of MONT_PARAMS, B1 grows by 2.5 times and the number of curves doubles for every 5 digits.
+
+Returns (digits, B1, curves).'''
+   if level < len(MONT_PARAMS):
+      return MONT_PARAMS[level]
+   extra = level - len(MONT_PARAMS) + 1
+   digits, b1, curves = MONT_PARAMS[-1]
+   return digits + 5 * extra, int(b1 * 2.5**extra), curves << extra
+
+def mont_ecm(n, ra, veb, pr, level=0, sigma=6, budget=None, save=None, state=None):
+   '''Input:
+   n      -- An integer to factor, without small factors
+   ra     -- If True, select sigma values randomly
+   veb    -- If True, be verbose
+   pr     -- What portion of the total processing power this run gets
+   level  -- The first level of MONT_PARAMS to run
+   sigma  -- The last sigma used, if ra is False
+   budget -- A Budget to spend a curve of before every curve, or None
+   save   -- A function to call with the state before every curve, or None
+   state  -- A state given to save by an earlier run, to resume from instead of starting on n
+
+Output: Factors of n, via a generator.
+
+Notes:
+1. Each level runs its number of curves (times pr) before going on to the next, larger, level, until n is completely factored.
+2. The numbers left to factor are kept on a stack of [number, level, curves run at that level], which (with sigma) is the state that save gets.'''
+   if state is None:
+      todo = [[n, level, 0]]
+   else:
+      todo = [[mpz(m), l, c] for m, l, c in state['todo']]
+      sigma = state['sigma']
+
+   while todo:
+      n, level, curve = todo[-1]
+      digits, b1, curves = mont_level(level)
+
+      if curve == 0:
+         if isprime(n):
+            congrats(n, veb)
+            yield n
+            todo.pop()
+            continue
+
+         power = 0
+         for i in range(2, int(math.log(n) / LOG_2) + 1):
+            r = root(n, i)
+            if r[1]:
+               power = i
+               break
+         if power:
+            todo[-1:] = [[mpz(r[0]), level, 0] for _ in range(power)]
+            continue
+
+         if veb:
+            print('Searching for primes around', digits, 'digits')
+
+      if curve >= max(1, int(curves * pr)):
+         todo[-1] = [n, level + 1, 0]
+         continue
+
+      if save is not None:
+         save({'engine': 'montgomery', 'todo': [[int(m), l, c] for m, l, c in todo], 'sigma': sigma})
+      if budget is not None:
+         budget.spend(1)
+
+      if ra:
+         sigma = 6 + random.randrange(BILLION)
+      else:
+         sigma += 1
+      todo[-1][2] = curve + 1
+
+      f = mont_factor(n, sigma, b1, MONT_B2_RATIO * b1)
+      if f in (1, n):
+         continue
+
+      if veb:
+         print('Found factor:', f)
+         print('Curve was: sigma =', sigma, 'B1 =', b1)
+      todo[-1:] = [[n // f, level, 0], [f, 0, 0]]
+
+### Quick methods ###
+#
+# Cheap methods that factors() tries before ECM, each of which finds some
+# kinds of factors almost instantly: Fermat's method finds factors close to
+# sqrt(n), Pollard's rho finds small factors, and Pollard's p-1 and Williams'
+# p+1 find primes p where p-1 or p+1 is smooth. Each takes n and its bounds,
+# and returns a factor of n (1 on failure).
+
+PP1_SEEDS = ((2, 7), (6, 5)) # Montgomery's choices of A for p+1, as fractions
+
+def fermat(n, iterations):
+   '''Fermat's method: looks for n = a**2 - b**2 = (a - b)(a + b), starting from a = ceil(sqrt(n)). This finds factors that are close to sqrt(n), as with RSA keys whose primes were picked too close together.
+
+Returns a factor of n (1 on failure).'''
+   a = sqrt(n)
+   if a * a == n:
+      return a
+   a += 1
+   b2 = a * a - n
+
+   for _ in range(iterations):
+      b = sqrt(b2)
+      if b * b == b2:
+         return a - b if a - b > 1 else 1
+      b2 += (a << 1) + 1
+      a += 1
+
+   return 1
+
+def brent_rho(n, iterations, c=1):
+   '''Pollard's rho with Brent's cycle detection, taking a gcd only once per 128 steps. It finds factors up to about iterations**2.
+
+Returns a factor of n (1 on failure).'''
+   y = 2
+   r = 1
+   q = 1
+   g = 1
+   steps = 0
+
+   while g == 1 and steps < iterations:
+      x = y
+      for _ in range(r):
+         y = (y * y + c) % n
+      k = 0
+      while k < r and g == 1:
+         ys = y
+         for _ in range(min(128, r - k)):
+            y = (y * y + c) % n
+            q = (q * (x - y)) % n
+         g = gcd(q, n)
+         k += 128
+      steps += r << 1
+      r <<= 1
+
+   if g == n: # The last 128 steps found every factor at once, so redo them one at a time.
+      g = 1
+      while g == 1:
+         ys = (ys * ys + c) % n
+         g = gcd(x - ys, n)
+
+   return g if g != n else 1
+
+def lucas_v(v, k, n):
+   '''Computes V_k of the Lucas sequence V_0 = 2, V_1 = v, V_(i+1) = v*V_i - V_(i-1) modulo n, with a ladder on V_2i = V_i**2 - 2 and V_(2i+1) = V_i*V_(i+1) - v. If v = a + 1/a, then V_k = a**k + 1/a**k.
+
+Returns V_k mod n.'''
+   if k == 0:
+      return 2
+   x, y = v, (v * v - 2) % n
+   for bit in bin(k)[3:]:
+      if bit == '1':
+         x, y = (x * y - v) % n, (y * y - 2) % n
+      else:
+         x, y = (x * x - 2) % n, (x * y - v) % n
+   return x
+
+def lucas_stage2(v, n, b1, b2):
+   '''The stage 2 of p-1 and p+1: for every prime q in (b1, b2], writes q = m*D +- j and accumulates V_mD - V_j, which is 0 modulo p if V_q = 2 modulo p (see mont_stage2).
+
+Returns a factor of n (1 on failure, possibly n).'''
+   d = stage2_d(b1, b2)
+   half = d >> 1
+
+   babies = {1: v}
+   v2 = (v * v - 2) % n
+   prev, cur = v, (v * v2 - v) % n
+   for j in range(3, half, 2):
+      if gcd(j, d) == 1:
+         babies[j] = cur
+      prev, cur = cur, (cur * v2 - prev) % n
+
+   m = (b1 + 1 + half) // d
+   vd = lucas_v(v, d, n)
+   vp, vg = lucas_v(v, m * d, n), lucas_v(v, (m + 1) * d, n)
+   paired = set()
+   product = 1
+
+   for prime in prime_range(b1 + 1, b2 + 1):
+      m_prime = (prime + half) // d
+      if m_prime != m:
+         paired = set()
+         while m < m_prime:
+            vp, vg = vg, (vg * vd - vp) % n
+            m += 1
+      j = abs(prime - m * d)
+      if j not in paired:
+         paired.add(j)
+         product = (product * (vp - babies[j])) % n
+
+   return gcd(product, n)
+
+def pollard_pm1(n, b1, b2):
+   '''Pollard's p-1: finds primes p where every prime factor of p - 1 is at most b1, except for one that may be up to b2.
+
+Returns a factor of n (1 on failure).'''
+   a = pow(2, mont_multiplier(b1), n)
+   g = gcd(a - 1, n)
+   if g == n: # Every factor was found at once, so go prime by prime to separate them.
+      a = 2
+      for q in prime_powers(b1):
+         a = pow(a, q, n)
+         g = gcd(a - 1, n)
+         if g != 1:
+            break
+
+   if g == 1 and b2 > b1:
+      inv = invert(a, n)
+      if inv == 0:
+         return 1
+      g = lucas_stage2((a + inv) % n, n, b1, b2)
+
+   return g if g != n else 1
+
+def williams_pp1(n, b1, b2, seeds=PP1_SEEDS):
+   '''Williams' p+1: finds primes p where every prime factor of p + 1 (or of p - 1, depending on the seed) is at most b1, except for one that may be up to b2. Each seed A = num/den is tried in turn.
+
+Returns a factor of n (1 on failure).'''
+   for num, den in seeds:
+      inv = invert(den, n)
+      if inv == 0:
+         g = gcd(den, n)
+         if g != n:
+            return g
+         continue
+      v0 = (num * inv) % n
+
+      v = lucas_v(v0, mont_multiplier(b1), n)
+      g = gcd(v - 2, n)
+      if g == n: # Every factor was found at once, so go prime by prime to separate them.
+         v = v0
+         for q in prime_powers(b1):
+            v = lucas_v(v, q, n)
+            g = gcd(v - 2, n)
+            if g != 1:
+               break
+
+      if g == 1 and b2 > b1:
+         g = lucas_stage2(v, n, b1, b2)
+      if g not in (1, n):
+         return g
+
+   return 1
+
+# The quick methods, by name, and the ones that factors() runs by default, as
+# (name, bounds after n) pairs, in order.
+QUICK_METHODS = {'fermat': fermat, 'rho': brent_rho, 'pm1': pollard_pm1, 'pp1': williams_pp1}
+DEFAULT_STAGES = (('fermat', (1000,)), ('rho', (5000,)), ('pm1', (10000, 200000)), ('pp1', (5000, 100000)))
+
+def quick_split(n, stages, veb, budget=None):
+   '''Splits n with the quick methods in stages, trying them in order on every piece until none of them finds anything. If budget is not None, it is checked before every method.
+
+Returns a list of numbers whose product is n: primes, and composites that none of the methods could split.'''
+   pieces = []
+   todo = [n]
+   while todo:
+      m = todo.pop()
+      if isprime(m):
+         pieces.append(m)
+         continue
+      for name, bounds in stages:
+         if budget is not None:
+            budget.check()
+         f = QUICK_METHODS[name](m, *bounds)
+         if f not in (1, m):
+            if veb:
+               print('Found factor with %s:' % name, f)
+            todo += [f, m // f]
+            break
+      else:
+         pieces.append(m)
+   return pieces
+
+### Self-initializing quadratic sieve ###
+#
+# For composites of SIQS_DIGITS digits or more without small factors (such as
+# balanced semiprimes), the quadratic sieve is much faster than ECM, so
+# factors() switches to it after a short run of ECM. This is Contini's
+# self-initializing variant: a = q_1 * ... * q_s is a product of factor base
+# primes, each a gives 2**(s-1) polynomials (a*x + b)**2 - kn whose roots
+# modulo every factor base prime follow from the previous polynomial's with
+# one addition (the Gray code order of the b values), and the values that the
+# sieve picks out over x in [-M, M) are factored over the factor base, with
+# one large prime allowed. The multiplier k is Knuth and Schroeppel's. Every
+# a is sieved separately, so the sieving can be spread over processes.
+
+# (digits, factor base size, M) for numbers of up to that many digits
+SIQS_PARAMS = (
+   (24, 100, 16384),
+   (30, 200, 32768),
+   (36, 400, 32768),
+   (40, 600, 32768),
+   (45, 1000, 32768),
+   (50, 1500, 65536),
+   (55, 2500, 65536),
+   (60, 4000, 65536),
+   (65, 6000, 98304),
+   (70, 9000, 131072),
+)
+SIQS_DIGITS = 40 # factors() uses SIQS for composites of at least this many digits
+SIQS_ECM_RATIO = 0.3 # before that, ECM looks for factors up to this fraction of the digits
+SIQS_MULTIPLIERS = (1, 2, 3, 5, 6, 7, 10, 11, 13, 14, 15, 17, 19, 21, 22, 23, 26, 29, 30, 31, 33, 34, 35, 37, 38, 39, 41, 42, 43, 46, 47)
+SIQS_SMALL_PRIME = 30 # primes below this are not sieved with, only trial divided by
+SIQS_LARGE_PRIME = 50 # the large prime bound, in multiples of the largest factor base prime
+SIQS_EXTRA = 30 # how many more relations than factor base primes to collect
+SIQS_SLICE_HITS = 200 # with numpy, primes that hit the sieve at least this often are sieved with slices
+SIQS_SLACK = 12 # how far below the size of a value the sieve threshold is, in bits, besides the large prime
+_siqs_context = [None] # the sieving parameters, in a worker process
+
+def sqrt_mod(a, p):
+   '''Finds a square root of a modulo an odd prime p with the Tonelli-Shanks algorithm. a must be a quadratic residue.
+
+Returns the root.'''
+   a %= p
+   if a == 0:
+      return 0
+   if p % 4 == 3:
+      return pow(a, (p + 1) >> 2, p)
+   q, s = p - 1, 0
+   while not q & 1:
+      q >>= 1
+      s += 1
+   z = 2
+   while pow(z, (p - 1) >> 1, p) != p - 1:
+      z += 1
+   c, r, t = pow(z, q, p), pow(a, (q + 1) >> 1, p), pow(a, q, p)
+   while t != 1:
+      i, t2 = 0, t
+      while t2 != 1:
+         t2 = (t2 * t2) % p
+         i += 1
+      b = pow(c, 1 << (s - i - 1), p)
+      s, c = i, (b * b) % p
+      r, t = (r * b) % p, (t * c) % p
+   return r
+
+def siqs_params(n):
+   '''Finds the parameters for sieving n.
+
+Returns (factor base size, M).'''
+   digits = len(str(n))
+   for max_digits, size, m in SIQS_PARAMS:
+      if digits <= max_digits:
+         return size, m
+   return SIQS_PARAMS[-1][1:]
+
+def siqs_ecm_curves(n):
+   '''Finds how many curves of ECM factors() runs on n before it switches to SIQS: as many as the levels of MONT_PARAMS for factors of up to SIQS_ECM_RATIO times the digits of n have.
+
+Returns the number of curves.'''
+   digits = max(len(str(n)) * SIQS_ECM_RATIO, MONT_PARAMS[0][0])
+   return sum(curves for d, b1, curves in MONT_PARAMS if d <= digits)
+
+def siqs_multiplier(n):
+   '''Chooses the multiplier k that makes the most small primes (weighted by how often, and how much, they divide the sieved values) quadratic residues modulo kn, with the Knuth-Schroeppel function.
+
+Returns k.'''
+   best, best_score = 1, None
+   primes = prime_sieve(1000)[1:]
+   for k in SIQS_MULTIPLIERS:
+      kn = k * n
+      score = -0.5 * math.log(k)
+      if kn % 8 == 1:
+         score += 2 * LOG_2
+      elif kn % 8 == 5:
+         score += LOG_2
+      elif kn & 3 == 3:
+         score += 0.5 * LOG_2
+      for p in primes:
+         if k % p == 0:
+            score += math.log(p) / p
+         elif pow(kn % p, (p - 1) >> 1, p) == 1:
+            score += 2 * math.log(p) / (p - 1)
+      if best_score is None or score > best_score:
+         best, best_score = k, score
+   return best
+
+def siqs_factor_base(kn, size):
+   '''Finds the first size primes p (starting with 2) modulo which kn is a square, and a square root of kn modulo each.
+
+Returns (primes, roots).'''
+   primes = [2]
+   roots = [kn & 1]
+   p = 2
+   while len(primes) < size:
+      p = int(next_prime(p))
+      r = kn % p
+      if r == 0 or pow(r, (p - 1) >> 1, p) == 1:
+         primes.append(p)
+         roots.append(sqrt_mod(r, p))
+   return primes, roots
+
+def siqs_choose_a(fb, roots, first, target, rng, used):
+   '''Chooses a new a close to target, as a product of factor base primes (from index first on, and not dividing kn) of about the same size, with the last one picked to get as close to target as possible.
+
+Returns the indices of the primes, or None if no new a could be found.'''
+   typical = min(2000, fb[(len(fb) << 1) // 3])
+   s = max(1, int(round(math.log(target) / math.log(typical))))
+   q0 = target ** (1.0 / s)
+   usable = [i for i in range(first, len(fb)) if roots[i]]
+   pool = sorted(usable, key=lambda i: abs(math.log(fb[i] / q0)))[:max(s + 1, 40)]
+   for _ in range(100):
+      qs = rng.sample(pool, s - 1)
+      a = 1
+      for q in qs:
+         a *= fb[q]
+      i = min(max(bisect.bisect_left(fb, target // a), first), len(fb) - 1)
+      for j in (i, i - 1, i + 1, i - 2, i + 2):
+         if first <= j < len(fb) and j not in qs and roots[j]:
+            key = tuple(sorted(qs + [j]))
+            if key not in used:
+               used.add(key)
+               return list(key)
+   return None
+
+def siqs_sieve(context, qs):
+   '''Sieves all 2**(s-1) polynomials (a*x + b)**2 - kn, over x in [-m, m), for the a that is the product of the s factor base primes at indices qs, and factors the values that the sieve picks out. context is (kn, factor base, roots, rounded log2s of the primes, m, threshold, large prime bound, index of the first prime to sieve with).
+
+Returns a list of relations (u, sign, indices, large): u**2 = (-1)**sign * large * the product of the factor base primes at the indices (mod kn), where large is 1 or a prime between the factor base and the large prime bound.'''
+   kn, fb, roots, logs, m, threshold, large, first = context
+   a = 1
+   for q in qs:
+      a *= fb[q]
+   bs = []
+   for q in qs:
+      p = fb[q]
+      g = (roots[q] * invert(a // p % p, p)) % p
+      if g > p >> 1:
+         g = p - g
+      bs.append(a // p * g)
+   b = sum(bs)
+
+   sieved = [i for i in range(first, len(fb)) if i not in qs]
+   unsieved = list(range(first)) + list(qs) # trial divided by every value
+   ps = [fb[i] for i in sieved]
+   ls = [logs[i] for i in sieved]
+   ainvs = [invert(a % p, p) for p in ps]
+   soln1 = [(ainv * (roots[i] - b)) % p for i, p, ainv in zip(sieved, ps, ainvs)]
+   soln2 = [(ainv * (-roots[i] - b)) % p for i, p, ainv in zip(sieved, ps, ainvs)]
+   deltas = [[(((bl << 1) % p) * ainv) % p for p, ainv in zip(ps, ainvs)] for bl in bs]
+   size = m << 1
+   if NUMPY_EXISTS:
+      ps_a = numpy.array(ps, dtype=numpy.int64)
+      soln1, soln2 = numpy.array(soln1, dtype=numpy.int64), numpy.array(soln2, dtype=numpy.int64)
+      deltas = [numpy.array(d, dtype=numpy.int64) for d in deltas]
+      # Small primes hit so often that adding to a slice of the sieve is fastest for them. Larger ones hit so
+      # rarely that the cost of each numpy call would dominate, so their hits are all counted by one bincount,
+      # in blocks of primes within a factor of 2 of each other, which hit at most a given number of times.
+      small = bisect.bisect_left(ps, size // SIQS_SLICE_HITS)
+      blocks = []
+      start = small
+      while start < len(ps):
+         end = bisect.bisect_left(ps, ps[start] << 1, start)
+         steps = numpy.arange(-(-size // ps[start]), dtype=numpy.int64)[None, :] * ps_a[start:end, None]
+         weights = numpy.broadcast_to(numpy.array(ls[start:end], dtype=numpy.float64)[:, None], steps.shape).ravel()
+         blocks.append((start, end, steps, weights))
+         start = end
+      if blocks:
+         all_weights = numpy.concatenate([w for start, end, steps, w in blocks for _ in (0, 1)])
+         reach = max(int(steps.max()) for start, end, steps, w in blocks) + ps[-1]
+
+   signs = [1] * len(qs)
+   relations = []
+   for i in range(1 << (len(qs) - 1)):
+      if i: # Flip the sign of one B, as in a Gray code, which moves every root by the same amount.
+         v = (i & -i).bit_length() - 1
+         e = -signs[v]
+         signs[v] = e
+         b += 2 * e * bs[v]
+         if NUMPY_EXISTS:
+            soln1 = (soln1 - e * deltas[v]) % ps_a
+            soln2 = (soln2 - e * deltas[v]) % ps_a
+         else:
+            soln1 = [(r - e * d) % p for r, d, p in zip(soln1, deltas[v], ps)]
+            soln2 = [(r - e * d) % p for r, d, p in zip(soln2, deltas[v], ps)]
+
+      if NUMPY_EXISTS:
+         r1, r2 = (soln1 + m) % ps_a, (soln2 + m) % ps_a
+         if blocks: # Hits past the end of the sieve land in bins that are cut off.
+            hits = [(r[start:end, None] + steps).ravel() for start, end, steps, w in blocks for r in (r1, r2)]
+            sieve = numpy.bincount(numpy.concatenate(hits), all_weights, reach)[:size]
+         else:
+            sieve = numpy.zeros(size)
+         for p, l, x1, x2 in zip(ps[:small], ls[:small], r1[:small].tolist(), r2[:small].tolist()):
+            sieve[x1::p] += l
+            if x2 != x1:
+               sieve[x2::p] += l
+         candidates = numpy.flatnonzero(sieve >= threshold).tolist()
+      else:
+         r1 = [(r + m) % p for r, p in zip(soln1, ps)]
+         r2 = [(r + m) % p for r, p in zip(soln2, ps)]
+         sieve = [0] * size
+         for p, l, x1, x2 in zip(ps, ls, r1, r2):
+            for j in range(x1, size, p):
+               sieve[j] += l
+            if x2 != x1:
+               for j in range(x2, size, p):
+                  sieve[j] += l
+         candidates = [j for j, s in enumerate(sieve) if s >= threshold]
+
+      for c in candidates:
+         u = a * (c - m) + b
+         value = (u * u - kn) // a
+         sign = int(value < 0)
+         value = abs(value)
+         indices = list(qs)
+         for j in unsieved:
+            while not value % fb[j]:
+               value //= fb[j]
+               indices.append(j)
+         if NUMPY_EXISTS:
+            hits = numpy.flatnonzero(((c - r1) % ps_a == 0) | ((c - r2) % ps_a == 0)).tolist()
+         else:
+            hits = [h for h, p in enumerate(ps) if not (c - r1[h]) % p or not (c - r2[h]) % p]
+         for h in hits:
+            p = ps[h]
+            while not value % p:
+               value //= p
+               indices.append(sieved[h])
+         if value == 1 or fb[-1] < value < large:
+            relations.append((u, sign, indices, value))
+
+   return relations
+
+def _siqs_init(context):
+   _siqs_context[0] = context
+
+def _siqs_task(qs):
+   return siqs_sieve(_siqs_context[0], qs)
+
+def siqs_solve(n, fb, relations):
+   '''Looks for a product of relations whose right-hand side is a square, by Gaussian elimination over GF(2) of their exponent vectors, one relation at a time. Every such product gives x**2 = y**2 (mod n), and so maybe a factor gcd(x - y, n).
+
+Returns a factor of n, or 1 if every product was a trivial one.'''
+   pivots = {}
+   for r, (u, sign, indices, large) in enumerate(relations):
+      row = sign
+      for j in indices:
+         row ^= 2 << j
+      combination = 1 << r
+      while row:
+         c = row.bit_length()
+         if c not in pivots:
+            pivots[c] = (row, combination)
+            break
+         pivot, pivot_combination = pivots[c]
+         row ^= pivot
+         combination ^= pivot_combination
+      else:
+         x = y = 1
+         exponents = {}
+         while combination:
+            low = combination & -combination
+            combination ^= low
+            u, sign, indices, large = relations[low.bit_length() - 1]
+            x = (x * u) % n
+            y = (y * large) % n
+            for j in indices:
+               exponents[j] = exponents.get(j, 0) + 1
+         for j, e in exponents.items():
+            y = (y * pow(fb[j], e >> 1, n)) % n
+         g = gcd(x - y, n)
+         if 1 < g < n:
+            return g
+   return 1
+
+def siqs(n, veb, workers=None, budget=None):
+   '''Finds a factor of a composite n with the self-initializing quadratic sieve.
+
+Input:
+   n       -- A composite integer to factor
+   veb     -- If True, be verbose
+   workers -- How many processes to sieve in, or None to sieve in this one
+   budget  -- A Budget to check between values of a, or None
+
+Returns a factor of n other than 1 and n.'''
+   for i in range(2, int(math.log(n) / LOG_2) + 1):
+      r = root(n, i)
+      if r[1]:
+         return mpz(r[0])
+
+   k = siqs_multiplier(n)
+   kn = int(k * n)
+   size, m = siqs_params(n)
+   fb, roots = siqs_factor_base(kn, size)
+   for p in fb:
+      if not n % p and p != n:
+         return mpz(p)
+
+   logs = [int(round(math.log2(p))) for p in fb]
+   first = bisect.bisect_left(fb, SIQS_SMALL_PRIME)
+   large = min(fb[-1] * SIQS_LARGE_PRIME, fb[-1] ** 2)
+   threshold = int(math.log2(m) + math.log2(kn) / 2 - 0.5 - math.log2(large) - SIQS_SLACK)
+   context = (kn, fb, roots, logs, m, threshold, large, first)
+   target = sqrt(2 * kn) // m
+   rng = random.Random(int(n))
+   used = set()
+   if veb:
+      print('Sieving with the quadratic sieve: multiplier %d, %d primes up to %d, M = %d' % (k, len(fb), fb[-1], m))
+
+   relations = []
+   partials = {}
+   needed = len(fb) + SIQS_EXTRA
+   pool = None
+   pending = set()
+   if workers is not None and workers > 1:
+      pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_siqs_init, initargs=(context,))
+
+   try:
+      while True:
+         while len(relations) < needed:
+            if budget is not None:
+               budget.check()
+            if pool is None:
+               qs = siqs_choose_a(fb, roots, first, target, rng, used)
+               if qs is None:
+                  raise ValueError('SIQS ran out of polynomials for %d' % n)
+               new = siqs_sieve(context, qs)
+            else:
+               while len(pending) < workers << 1:
+                  qs = siqs_choose_a(fb, roots, first, target, rng, used)
+                  if qs is None:
+                     break
+                  pending.add(pool.submit(_siqs_task, qs))
+               if not pending:
+                  raise ValueError('SIQS ran out of polynomials for %d' % n)
+               done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+               new = [relation for future in done for relation in future.result()]
+
+            for u, sign, indices, large in new:
+               if large == 1:
+                  relations.append((u, sign, indices, 1))
+               elif not n % large:
+                  return mpz(large)
+               elif large in partials:
+                  u2, sign2, indices2 = partials[large]
+                  relations.append(((u * u2) % n, sign ^ sign2, indices + indices2, large))
+               else:
+                  partials[large] = (u, sign, indices)
+            if veb:
+               print('Relations: %d of %d (%d partial)' % (len(relations), needed, len(partials)))
+
+         f = siqs_solve(n, fb, relations)
+         if f != 1:
+            if veb:
+               print('Found factor:', f)
+            return mpz(f)
+         needed += SIQS_EXTRA
+   finally:
+      if pool is not None:
+         pool.shutdown(wait=False, cancel_futures=True)
+
+### Budgets and checkpoints ###
+#
+# ecm and factors run until n is completely factored, which can take forever.
+# A Budget limits them by time and by number of curves, or stops them on
+# request (from another thread, say): they check it between curves (and, in
+# the Weierstrass engine, between batches of primes inside a batch of curves)
+# and raise Stopped when it runs out. factors can also keep a checkpoint file
+# of how far it got, which it writes every CHECKPOINT_INTERVAL seconds and
+# when it is stopped, and which a later call with the same n resumes from.
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_INTERVAL = 60 # seconds between checkpoint writes
+
+class Stopped(Exception):
+   '''Raised when a Budget runs out or is cancelled. factors fills in what it had done so far:
+   reason     -- 'cancelled', 'out of time' or 'out of curves'
+   budget     -- The Budget that ran out
+   found      -- The factors found (and generated) so far
+   remaining  -- The unfactored numbers whose product, times the found factors, is n
+   checkpoint -- The checkpoint file to resume from, or None'''
+
+   def __init__(self, reason, budget=None):
+      Exception.__init__(self, reason)
+      self.reason = reason
+      self.budget = budget
+      self.found = []
+      self.remaining = []
+      self.checkpoint = None
+
+class Budget:
+   '''A limit on how long ecm and factors run, in seconds (counted from when the Budget is made) and in curves, either of which may be None for no limit. cancel() stops them at the next check, and may be called from another thread. A Budget with a parent also runs out when its parent does.'''
+
+   def __init__(self, seconds=None, curves=None, parent=None):
+      self.seconds = seconds
+      self.curves = curves
+      self.parent = parent
+      self.used = 0
+      self.cancelled = False
+      self.start = time.monotonic()
+
+   def cancel(self):
+      self.cancelled = True
+
+   def check(self):
+      '''Raises Stopped if the budget is cancelled or out of time.'''
+      if self.parent is not None:
+         self.parent.check()
+      if self.cancelled:
+         raise Stopped('cancelled', self)
+      if self.seconds is not None and time.monotonic() - self.start >= self.seconds:
+         raise Stopped('out of time', self)
+
+   def spend(self, curves):
+      '''Checks the budget before running more curves, which are counted against it. Raises Stopped if the budget is cancelled or used up.'''
+      self.check()
+      if self.curves is not None and self.used >= self.curves:
+         raise Stopped('out of curves', self)
+      if self.parent is not None:
+         self.parent.spend(curves)
+      self.used += curves
+
+class Checkpoint:
+   '''How far factors got with n: the factors found, the numbers still to factor (with the first one in progress), whether the quick methods have run on them, and the state of ecm on the first one (or {'engine': 'siqs'} once it is left to siqs). Kept in a JSON file at path, if path is not None.'''
+
+   def __init__(self, path, n, engine):
+      self.path = None if path is None else os.fspath(path)
+      self.n = n
+      self.engine = engine
+      self.found = []
+      self.pending = []
+      self.split = False
+      self.tdb = 100
+      self.state = None
+      self.written = time.monotonic()
+
+   def load(self):
+      '''Reads the checkpoint file. A state from another engine is dropped, so its number starts over.
+
+Returns True if there was a file to read, False if not.'''
+      if self.path is None or not os.path.exists(self.path):
+         return False
+      with open(self.path) as f:
+         d = json.load(f)
+      if d.get('version') != CHECKPOINT_VERSION:
+         raise ValueError('Unsupported checkpoint version: %s' % d.get('version'))
+      if d['n'] != self.n:
+         raise ValueError('Checkpoint %s is for another number: %d' % (self.path, d['n']))
+      self.found = [mpz(f) for f in d['found']]
+      self.pending = [mpz(m) for m in d['pending']]
+      self.split = d['split']
+      self.tdb = d['tdb']
+      if d['engine'] == self.engine:
+         self.state = d['state']
+      return True
+
+   def update(self, state):
+      '''Keeps the latest ecm state, and writes the file if it has not been written for CHECKPOINT_INTERVAL seconds.'''
+      self.state = state
+      if self.path is not None and time.monotonic() - self.written >= CHECKPOINT_INTERVAL:
+         self.write()
+
+   def write(self):
+      '''Writes the file, atomically, so that it is never left half written.'''
+      if self.path is None:
+         return
+      d = {'version': CHECKPOINT_VERSION, 'n': int(self.n), 'engine': self.engine,
+           'found': [int(f) for f in self.found], 'pending': [int(m) for m in self.pending],
+           'split': self.split, 'tdb': int(self.tdb), 'state': self.state}
+      tmp = self.path + '.tmp'
+      with open(tmp, 'w') as f:
+         json.dump(d, f)
+      os.replace(tmp, self.path)
+      self.written = time.monotonic()
+
+   def remove(self):
+      if self.path is not None and os.path.exists(self.path):
+         os.remove(self.path)
+
+def ecm(n, ra, ov, veb, tdb, pr, engine='weierstrass', budget=None, save=None, state=None): # DOCUMENTATION
    '''Input:
-   n   -- An integer to factor
-   veb -- If True, be verbose
-   ra  -- If True, select sigma values randomly
-   ov  -- How asymptotically fast the calculation is
-   pr  -- What portion of the total processing power this run gets
+   n      -- An integer to factor
+   veb    -- If True, be verbose
+   ra     -- If True, select sigma values randomly
+   ov     -- How asymptotically fast the calculation is
+   pr     -- What portion of the total processing power this run gets
+   engine -- 'weierstrass' (affine points, many curves at once) or
+             'montgomery' (x-only projective points, no inversions)
+   budget -- A Budget to spend curves of, which raises Stopped when it runs out, or None
+   save   -- A function to call with the state of the search before every batch of curves (every curve, for Montgomery), or None
+   state  -- A state given to save by an earlier run, to resume from
 
 Output: Factors of n, via a generator.
 
 Notes:
 1. A good value of ov for typical numbers is somewhere around 10. If this parameter is too high, overhead and memory usage grow.
-2. If ra is set to False and veb is set to True, then results are reproducible. If ra is set to True, then one number may be done in parallel on disconnected machines (at only a small loss of efficiency, which is less if pr is set correctly).'''
+2. If ra is set to False and veb is set to True, then results are reproducible. If ra is set to True, then one number may be done in parallel on disconnected machines (at only a small loss of efficiency, which is less if pr is set correctly).
+3. ov and tdb only matter to the Weierstrass engine.
+4. States are dicts that json can serialize. A Weierstrass state holds the sigma of the next batch of curves, its bound u, and prime_probs; resuming from it reruns that batch on n, which is what is left of the original n after dividing out every factor generated since. A Montgomery state holds everything that is left to factor, so n is ignored.'''
+
+   if engine == 'montgomery':
+      for factor in mont_ecm(n, ra, veb, pr, budget=budget, save=save, state=state):
+         yield factor
+      return
 
    if veb:
       looking_for = 0
-   k = inv_const(n)
 
-   if ra:
-      sigma = 6 + random.randrange(BILLION)
-   else:
-      sigma = 6
+   if state is None:
+      k = inv_const(n)
 
-   for factor in sure_factors(n, k, range(sigma, sigma + k), veb, ra, ov, tdb, pr):
-      yield factor
-      n //= factor
+      if ra:
+         sigma = 6 + random.randrange(BILLION)
+      else:
+         sigma = 6
 
-   if n == 1:
-      return
+      if budget is not None:
+         budget.spend(k)
+      for factor in sure_factors(n, k, range(sigma, sigma + k), veb, ra, ov, tdb, pr, budget):
+         yield factor
+         n //= factor
+
+      if n == 1:
+         return
 
-   if ra:
-      sigma += k + random.randrange(BILLION)
+      if ra:
+         sigma += k + random.randrange(BILLION)
+      else:
+         sigma += k
+
+      x_max = 0.5 * math.log(n) / math.log(k)
+      u = None
    else:
-      sigma += k
+      if n == 1:
+         return
+      if isprime(n):
+         yield n
+         return
+      k, sigma, u, x_max = state['k'], state['sigma'], state['u'], state['x_max']
 
-   x_max = 0.5 * math.log(n) / math.log(k)
    t = rho_ts(int(x_max))
-   prime_probs = []
    nc = 1 + int(_12_LOG_2_OVER_49 * ov * ov * k)
    eff_nc = nc / pr
 
-   for i in range(1 + (int(math.log(n)) >> 1)):
-      if i < math.log(tdb):
-         prime_probs.append(0)
-      else:
-         prime_probs.append(1.0/i)
+   if state is None:
+      prime_probs = []
+      for i in range(1 + (int(math.log(n)) >> 1)):
+         if i < math.log(tdb):
+            prime_probs.append(0)
+         else:
+            prime_probs.append(1.0/i)
 
-   for i in range(len(prime_probs)):
-      p_success = rho_ev((i - 2.65) / math.log(k), t)
-      p_fail = max(0, (1 - p_success * math.log(math.log(k)))) ** (k / pr)
-      prime_probs[i] = p_fail * prime_probs[i] / (p_fail * prime_probs[i] + 1 - prime_probs[i])
+      for i in range(len(prime_probs)):
+         p_success = rho_ev((i - 2.65) / math.log(k), t)
+         p_fail = max(0, (1 - p_success * math.log(math.log(k)))) ** (k / pr)
+         prime_probs[i] = p_fail * prime_probs[i] / (p_fail * prime_probs[i] + 1 - prime_probs[i])
+   else:
+      prime_probs = list(state['prime_probs'])
 
    while n != 1:
-      low = int(k)
-      high = n
-      while high > low + 1:
-         u = (high + low) >> 1
-         sum = 0
-         log_u = math.log(u)
-         for i in range(len(prime_probs)):
-            log_p = i - 2.65
+      if u is None:
+         low = int(k)
+         high = n
+         while high > low + 1:
+            u = (high + low) >> 1
+            sum = 0
             log_u = math.log(u)
-            quot = log_p / log_u
-            sum += prime_probs[i] * (rho_ev(quot - 1, t) - rho_ev(quot, t) * log_u)
-         if sum < 0:
-            high = u
+            for i in range(len(prime_probs)):
+               log_p = i - 2.65
+               log_u = math.log(u)
+               quot = log_p / log_u
+               sum += prime_probs[i] * (rho_ev(quot - 1, t) - rho_ev(quot, t) * log_u)
+            if sum < 0:
+               high = u
+            else:
+               low = u
+
+         if ra:
+            sigma += nc + random.randrange(BILLION)
          else:
-            low = u
+            sigma += nc
 
-      if ra:
-         sigma += nc + random.randrange(BILLION)
-      else:
-         sigma += nc
+      if save is not None:
+         save({'engine': 'weierstrass', 'k': k, 'sigma': sigma, 'u': int(u), 'x_max': x_max, 'prime_probs': list(prime_probs)})
+      if budget is not None:
+         budget.spend(nc)
 
-      for factor in sure_factors(n, u, range(sigma, sigma + nc), veb, ra, ov, tdb, pr):
+      for factor in sure_factors(n, u, range(sigma, sigma + nc), veb, ra, ov, tdb, pr, budget):
          yield factor
          n //= factor
 
@@ -1226,6 +2245,7 @@ Notes:
          p_fail = max(0, (1 - p_success * math.log(math.log(u)))) ** eff_nc
          prime_probs[i] = p_fail * prime_probs[i] / (p_fail * prime_probs[i] + 1 - prime_probs[i])
       prime_probs = prime_probs[:1 + (int(math.log(n)) >> 1)]
+      u = None
 
       if veb and n != 1:
          m = max(prime_probs)
@@ -1241,55 +2261,119 @@ Notes:
 
    return
 
-def factors(n, veb, ra, ov, pr):
+def factors(n, veb, ra, ov, pr, engine='weierstrass', stages=None, budget=None, checkpoint=None, workers=None):
    '''Generates factors of n.
-Strips small primes, then feeds to ecm function.
+Strips small primes, tries the quick methods, then feeds what is left to the ecm function, or for composites of SIQS_DIGITS digits or more, to ecm for a few curves (see siqs_ecm_curves) and then to siqs.
 
 Input:
-   n   -- An integer to factor
-   veb -- If True, be verbose
-   ra  -- If True, select sigma values randomly
-   ov  -- How asymptotically fast the calculation is
-   pr  -- What portion of the total processing power this run gets
+   n          -- An integer to factor
+   veb        -- If True, be verbose
+   ra         -- If True, select sigma values randomly
+   ov         -- How asymptotically fast the calculation is
+   pr         -- What portion of the total processing power this run gets
+   engine     -- 'weierstrass' or 'montgomery' (see ecm)
+   stages     -- The quick methods to try before ECM, as (name, bounds) pairs (see
+                 QUICK_METHODS), or () to go straight to ECM. Default: DEFAULT_STAGES
+   budget     -- A Budget, which raises Stopped when it runs out (see Stopped), or None
+   checkpoint -- The path of a checkpoint file to keep, or None
+   workers    -- How many processes siqs sieves in, or None for just this one
 
 Output: Factors of n, via a generator.
 
 Notes:
 1. A good value of ov for typical numbers is somewhere around 10. If this parameter is too high, overhead and memory usage grow.
-2. If ra is set to False and veb is set to True, then results are reproducible. If ra is set to True, then one number may be done in parallel on disconnected machines (at only a small loss of efficiency, which is less if pr is set correctly).'''
+2. If ra is set to False and veb is set to True, then results are reproducible. If ra is set to True, then one number may be done in parallel on disconnected machines (at only a small loss of efficiency, which is less if pr is set correctly).
+3. If the checkpoint file exists, factors resumes from it: it generates the factors found before, then goes on where it stopped. The file is removed once n is completely factored.'''
 
 
    if type(n) not in T:
       raise ValueError('Number given must be integer or long.')
 
+   if engine not in ENGINES:
+      raise ValueError('Engine must be one of: %s' % ', '.join(ENGINES))
+
+   if stages is None:
+      stages = DEFAULT_STAGES
+   for name, _ in stages:
+      if name not in QUICK_METHODS:
+         raise ValueError('Quick methods must be some of: %s' % ', '.join(QUICK_METHODS))
+
    if not 0 < pr <= 1:
       yield 'Error: pr must be between 0 and 1'
       return
 
-   while not n & 1:
-      n >>= 1
-      yield 2
+   cp = Checkpoint(checkpoint, n, engine)
+   if cp.load():
+      for factor in cp.found:
+         yield factor
+   else:
+      while not n & 1:
+         n >>= 1
+         cp.found.append(2)
+         yield 2
 
-   n = mpz(n)
-   k = inv_const(n)
-   prime = 2
-   trial_division_bound = max(10 * k**2, 100)
+      n = mpz(n)
+      k = inv_const(n)
+      prime = 2
+      cp.tdb = max(10 * k**2, 100)
 
-   while prime < trial_division_bound:
-      prime = next_prime(prime)
-      while not n % prime:
-         n //= prime
-         yield prime
+      while prime < cp.tdb:
+         prime = next_prime(prime)
+         while not n % prime:
+            n //= prime
+            cp.found.append(prime)
+            yield prime
 
-   if isprime(n):
-      yield n
-      return
+      if isprime(n):
+         yield n
+         return
 
-   if n == 1:
-      return
+      if n == 1:
+         return
 
-   for factor in ecm(n, ra, ov, veb, trial_division_bound, pr):
-      yield factor
+      cp.pending = [n]
+
+   try:
+      if not cp.split:
+         cp.pending = quick_split(cp.pending[0], stages, veb, budget)
+         cp.split = True
+
+      while cp.pending:
+         piece = cp.pending[0]
+         if isprime(piece):
+            cp.found.append(piece)
+            yield piece
+         elif cp.state is not None and cp.state['engine'] == 'siqs':
+            f = siqs(piece, veb, workers, budget)
+            cp.pending[0:1] = [f, piece // f]
+            cp.state = None
+            continue
+         else:
+            ecm_budget = budget
+            if len(str(piece)) >= SIQS_DIGITS:
+               ecm_budget = Budget(curves=siqs_ecm_curves(piece), parent=budget)
+            try:
+               for factor in ecm(piece, ra, ov, veb, cp.tdb, pr, engine, ecm_budget, cp.update, cp.state):
+                  cp.found.append(factor)
+                  cp.pending[0] //= factor
+                  yield factor
+            except Stopped as e:
+               if ecm_budget is budget or e.budget is not ecm_budget:
+                  raise
+               if veb:
+                  print('Switching to the quadratic sieve')
+               cp.update({'engine': 'siqs'})
+               continue
+         cp.pending.pop(0)
+         cp.state = None
+   except Stopped as e:
+      cp.write()
+      e.found = list(cp.found)
+      e.remaining = list(cp.pending)
+      e.checkpoint = cp.path
+      raise
+
+   cp.remove()
 
 ### End of algorithm code; beginning of interface code ##
 
@@ -1349,6 +2433,9 @@ report results.
 determines the trade-off between memory and time usage. Do not touch if you do
 not know what you are doing. Please read all the documentation and understand
 the full implications of the parameter before using this switch.
+   -m, --montgomery  Uses Montgomery curves with x-only projective coordinates
+instead of Weierstrass curves in affine coordinates. This avoids modular
+inversions, and is usually much faster without gmpy.
    -n, --noverbose   Terse. On by default. Needed to cancel the -v from the
 --portion or --random switches. If both -n and -v are specified, the one
 specified last takes precedence.
@@ -1363,7 +2450,7 @@ With no integers to factor given via command-line, read standard input.
 Please report bugs to Eric Larson <elarson3@uoregon.edu>.''')
    sys.exit()
 
-def command_line(veb, ra, ov, pr):
+def command_line(veb, ra, ov, pr, engine):
    l = len(sys.argv)
    for i in range(1, l):
       if not is_switch(sys.argv[i]):
@@ -1396,10 +2483,10 @@ def command_line(veb, ra, ov, pr):
 
       if ov == DUMMY:
          ov = 2*math.log(math.log(n))
-      for factor in factors(n, veb, ra, ov, pr):
+      for factor in factors(n, veb, ra, ov, pr, engine):
          print(factor)
 
-def interactive(veb, ra, ov, pr):
+def interactive(veb, ra, ov, pr, engine):
    print('pyecm v. %s (interactive mode):' % VERSION)
    print('Type "exit" at any time to quit.')
    print()
@@ -1433,7 +2520,7 @@ def interactive(veb, ra, ov, pr):
 
       if ov == DUMMY:
          ov = 2*math.log(math.log(n))
-      for factor in factors(n, veb, ra, ov, pr):
+      for factor in factors(n, veb, ra, ov, pr, engine):
          print(factor)
       print()
       response = input()
@@ -1442,9 +2529,12 @@ def main():
    ra = veb = False
    pr = 1.0
    ov = DUMMY
+   engine = 'weierstrass'
    for item in sys.argv[1:]:
       if item == '--help':
          help()
+      elif item == '--montgomery':
+         engine = 'montgomery'
       elif item == '--noverbose':
          veb = False
       elif item == '--random':
@@ -1460,6 +2550,8 @@ def main():
          for char in item:
             if char == 'h':
                help()
+            elif char == 'm':
+               engine = 'montgomery'
             elif char == 'n':
                veb = False
             elif char == 'r':
@@ -1473,9 +2565,9 @@ def main():
             help()
 
    if len(sys.argv) > 1 and not is_switch(sys.argv[-1]):
-      command_line(veb, ra, ov, pr)
+      command_line(veb, ra, ov, pr, engine)
    else:
-      interactive(veb, ra, ov, pr)
+      interactive(veb, ra, ov, pr, engine)
 
 if __name__ == '__main__':
    try:
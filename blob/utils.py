@@ -1,14 +1,115 @@
+import collections
+import concurrent.futures
+import decimal
+import functools
 import itertools
 import operator
 import array
+import math
+import re
+import sys
+
+try:
+    import numpy
+    _numpy_fail = False
+except ImportError:
+    _numpy_fail = True
 
 from .pyecm import pyecm
 
 
-def factor(n):
+def factor(n, engine='montgomery', stages=None, budget=None, checkpoint=None, workers=None):
+    """
+    Factors n with pyecm. engine is 'montgomery' (the default, which needs no
+    modular inversions) or 'weierstrass' (pyecm's original engine). stages
+    are the quick methods to try before ECM, as (name, bounds) pairs (default:
+    pyecm.DEFAULT_STAGES, i.e., Fermat, rho, p-1 and p+1; () for none).
+    Composites of pyecm.SIQS_DIGITS (40) digits or more that a short run of
+    ECM cannot split go to the self-initializing quadratic sieve instead.
+
+    @param budget: a time limit in seconds, or a pyecm.Budget (which can also
+                   limit the number of curves, or be cancelled from another
+                   thread). When it runs out, pyecm.Stopped is raised, with
+                   the factors found so far in .found and the unfactored
+                   rest in .remaining.
+    @param checkpoint: the path of a file to save progress to, now and then
+                       and when stopped. If it exists, factoring resumes from
+                       it; it is removed when n is completely factored.
+    @param workers: the number of processes to run the quadratic sieve in
+    """
     if n == 0:
         return [0]
-    return list(pyecm.factors(n, False, True, 10, 1))
+    if budget is not None and not isinstance(budget, pyecm.Budget):
+        budget = pyecm.Budget(seconds=budget)
+    return list(pyecm.factors(n, False, True, 10, 1, engine, stages, budget, checkpoint, workers))
+
+
+# The big products and remainders of batch_gcd. Without gmpy, exact decimal
+# arithmetic (libmpdec) divides huge numbers much faster than int does.
+if pyecm.GMPY_EXISTS:
+    _batch_number = pyecm.mpz
+    _batch_mul = operator.mul
+
+    def _batch_mod_square(x, n):
+        return x % (n * n)
+else:
+    _EXACT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN,
+                             traps=[ decimal.Inexact, decimal.Rounded, decimal.InvalidOperation ])
+    _batch_number = _EXACT.create_decimal
+
+    def _batch_mul(a, b):
+        return _EXACT.multiply(a, b)
+
+    def _batch_mod_square(x, n):
+        return _EXACT.remainder(x, _EXACT.multiply(n, n))
+
+
+def batch_gcd(moduli, workers=None):
+    """
+    Finds what every modulus shares with the others, i.e., gcd(n, product of
+    the other moduli) for each n, with Bernstein's batch GCD: a product tree
+    of all the moduli, then a remainder tree that takes the product modulo
+    the square of every node on the way down. For RSA moduli, a result that
+    is neither 1 nor n is a prime that n shares with some other modulus.
+
+    @param moduli: positive integers
+    @param workers: the number of processes to compute each level of the
+                    trees with (default: compute them in this process)
+
+    @returns a list of the gcds, in the same order as moduli (1 if n shares
+             nothing, and n itself if all its primes are shared, e.g., if n
+             is repeated)
+    """
+    moduli = [ int(n) for n in moduli ]
+    if any(n < 1 for n in moduli):
+        raise ValueError("moduli must be positive")
+    if not moduli:
+        return [ ]
+
+    pool = None
+    if workers is not None and workers > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(workers)
+    mapper = map if pool is None else pool.map
+
+    try:
+        level = [ _batch_number(n) for n in moduli ]
+        tree = [ level ]
+        while len(level) > 1:
+            products = list(mapper(_batch_mul, level[0::2], level[1::2]))
+            if len(level) & 1:
+                products.append(level[-1])
+            level = products
+            tree.append(level)
+
+        remainders = tree.pop()
+        while tree:
+            level = tree.pop()
+            remainders = list(mapper(_batch_mod_square, [ remainders[i >> 1] for i in range(len(level)) ], level))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return [ math.gcd(int(r) // n, n) for r, n in zip(remainders, moduli) ]
 
 
 def insert_separators(st, sep, wordsize):
@@ -20,11 +121,15 @@ def insert_separators(st, sep, wordsize):
 #
 
 def to_bitstr(st):
+    if not st:
+        return ''
     bits = bin(int(st.hex(), 16))[2:].rjust(8 * len(st), '0')
     return bits
 
 
 def from_bitstr(st):
+    if not st:
+        return b''
     n = int(st, 2)
     hex_str = ('%x' % n).rjust(len(st) // 4, '0')
     return bytes.fromhex(hex_str)
@@ -48,12 +153,152 @@ def xor_bitstr(a, b, cycle=True):
 # byte stuff
 #
 
+# 1 for the bytes that GNU strings considers printable, 0 otherwise
+_PRINTABLE_MASK = bytes(1 if c == 9 or 0x20 <= c <= 0x7e else 0 for c in range(256))
+_ZERO_MASK = b'\x01' + bytes(255)
+
+# the unit that find_strings looks for in its mask, per encoding
+STRING_ENCODINGS = {
+    'ascii': b'\x01',
+    'utf-16le': b'\x01\x00',
+    'utf-16be': b'\x01\x00',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _run_regex(unit, min_len):
+    return re.compile(re.escape(unit * min_len) + b'(?:' + re.escape(unit) + b')*')
+
+
+def find_strings(st, min_len, encoding='ascii'):
+    """
+    Finds the runs of printable characters in st, like GNU strings. Rather
+    than matching a character class at every byte, st is translated into a
+    0/1 mask, where the regex engine can skip ahead to a literal run of ones.
+
+    Returns a list of (offset, bytes) tuples.
+    """
+    printable = st.translate(_PRINTABLE_MASK)
+    if encoding == 'ascii':
+        mask = printable
+    else:
+        # mark each printable byte that has a zero byte on the proper side
+        p = int.from_bytes(printable, 'little')
+        z = int.from_bytes(st.translate(_ZERO_MASK), 'little')
+        m = p & (z >> 8) if encoding == 'utf-16le' else z & (p >> 8)
+        mask = m.to_bytes(len(st), 'little')
+
+    r = _run_regex(STRING_ENCODINGS[encoding], min_len)
+    return [ (m.start(), st[m.start():m.end()]) for m in r.finditer(mask) ]
+
+
+def byte_runs(st, min_len=16):
+    """
+    Finds the runs of at least min_len copies of the same byte, as (offset,
+    length, value) tuples. XORing st with itself shifted by one byte turns
+    every run into a run of zero bytes, which a regex finds in C.
+    """
+    if min_len < 2:
+        raise ValueError("runs are at least 2 bytes long")
+    if len(st) < min_len:
+        return [ ]
+    diff = (int.from_bytes(st[:-1], 'big') ^ int.from_bytes(st[1:], 'big')).to_bytes(len(st) - 1, 'big')
+    r = _run_regex(b'\x00', min_len - 1)
+    return [ (m.start(), m.end() - m.start() + 1, st[m.start()]) for m in r.finditer(diff) ]
+
+
+# array typecodes for unsigned integers, keyed by their size in bytes
+_uint_typecodes = { array.array(t).itemsize: t for t in 'BHILQ' }
+
+
+# count_ngrams builds numpy keys for this many grams at a time
+_NGRAM_CHUNK = 1 << 20
+
+# the largest grams counted with numpy, into an array of 256**n bins
+_NGRAM_NUMPY_MAX = 3
+
+
+def _count_ngrams_numpy(st, n, overlapping):
+    a = numpy.frombuffer(st, dtype=numpy.uint8)
+    step = 1 if overlapping else n
+    grams = (len(a) - n) // step + 1
+    counts = numpy.zeros(1 << (8 * n), dtype=numpy.int64)
+
+    for g in range(0, grams, _NGRAM_CHUNK):
+        k = min(_NGRAM_CHUNK, grams - g)
+        start = g * step
+        # build the keys a byte at a time, from strided views of the data
+        keys = a[start:start+k*step:step].astype(numpy.uint32)
+        for j in range(1, n):
+            keys <<= 8
+            keys |= a[start+j:start+j+k*step:step]
+        if n < 3:
+            counts += numpy.bincount(keys, minlength=len(counts))
+        else:
+            # a bincount per chunk would add up all 16M bins every time
+            numpy.add.at(counts, keys, 1)
+
+    nz = numpy.flatnonzero(counts)
+    return collections.Counter(dict(zip(nz.tolist(), counts[nz].tolist())))
+
+
+def count_ngrams(st, n, overlapping=True):
+    """
+    Counts the n-byte grams of st, keyed by their big-endian integer value.
+    With numpy, grams of up to 3 bytes are counted with bincount. Otherwise,
+    grams of up to 8 bytes are widened into machine words with strided slice
+    assignments, so that the counting itself happens in C.
+    """
+    # scanning the 256**n bins for the results only pays off once there is
+    # about one gram for every 4 bins
+    grams = (len(st) - n) // (1 if overlapping else n) + 1
+    if not _numpy_fail and n <= _NGRAM_NUMPY_MAX and grams >= 1 << (8 * n - 2):
+        return _count_ngrams_numpy(st, n, overlapping)
+
+    counts = collections.Counter()
+    width = next((w for w in (1, 2, 4, 8) if w >= n), None)
+
+    for phase in range(n if overlapping else 1):
+        m = (len(st) - phase) // n
+        if m <= 0:
+            continue
+        end = phase + m * n
+
+        if width is None:
+            counts.update(int.from_bytes(st[i:i+n], 'big') for i in range(phase, end, n))
+            continue
+
+        if width == n:
+            buf = st[phase:end]
+        else:
+            buf = bytearray(m * width)
+            for j in range(n):
+                buf[width-n+j::width] = st[phase+j:end:n]
+
+        words = array.array(_uint_typecodes[width], buf)
+        if width > 1 and sys.byteorder == 'little':
+            words.byteswap()
+        counts.update(words)
+
+    return counts
+
+
+# ops that work the same on whole big ints as on individual bytes
+_int_ops = { operator.xor, operator.and_, operator.or_ }
+
+
 def _op_str(op, a, b, cycle):
     if len(a) < len(b):
         b, a = a, b
     if len(a) != len(b) and not cycle:
         raise XORError('unequal sizes (maybe add cycle=True?)')
 
+    if op in _int_ops:
+        # let big ints do the whole buffer at once
+        if len(b) != len(a) and b:
+            b = (b * (len(a) // len(b) + 1))[:len(a)]
+        return op(int.from_bytes(a, 'big'), int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
     aa = array.array('B', a)
     bb = array.array('B', b)
     bc = itertools.cycle(bb)
@@ -64,6 +309,129 @@ def _op_str(op, a, b, cycle):
     return aa.tobytes()
 
 
+# each byte value with its bits in reverse order
+_BIT_REVERSE = bytes(int('{:08b}'.format(c)[::-1], 2) for c in range(256))
+
+
+def byteswap(st, word_size):
+    """
+    Reverses the byte order of every word_size-byte word of st, over the whole
+    buffer at once.
+    """
+    if len(st) % word_size != 0:
+        raise ValueError('word size does not evenly divide the data size')
+
+    t = _uint_typecodes.get(word_size)
+    if t is not None:
+        a = array.array(t, st)
+        a.byteswap()
+        return a.tobytes()
+
+    out = bytearray(len(st))
+    for j in range(word_size):
+        out[j::word_size] = st[word_size-1-j::word_size]
+    return bytes(out)
+
+
+def reverse_bits(st):
+    """
+    Reverses the order of the bits within each byte of st.
+    """
+    return st.translate(_BIT_REVERSE)
+
+
+def popcount(st):
+    """
+    Counts the set bits in st.
+    """
+    return int.from_bytes(st, 'big').bit_count()
+
+
+def hamming(a, b):
+    """
+    Computes the Hamming distance (the number of differing bits) between two
+    equally-sized byte strings.
+    """
+    if len(a) != len(b):
+        raise XORError('unequal sizes')
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).bit_count()
+
+
+def hamming_matrix(blocks):
+    """
+    Computes the pairwise Hamming distances between byte strings (which need
+    not all be the same size, as long as the ones being compared are). Each
+    block is converted into an int once, so each distance is a single XOR and
+    popcount.
+
+    Returns a list of lists, where m[i][j] is the distance between blocks i
+    and j.
+    """
+    ints = [ int.from_bytes(b, 'big') for b in blocks ]
+    sizes = [ len(b) for b in blocks ]
+    m = [ [ 0 ] * len(ints) for _ in ints ]
+    for i, a in enumerate(ints):
+        row = m[i]
+        for j in range(i + 1, len(ints)):
+            if sizes[i] != sizes[j]:
+                raise XORError('unequal sizes')
+            row[j] = m[j][i] = (a ^ ints[j]).bit_count()
+    return m
+
+
+# relative frequencies of characters in English text, spaces included
+ENGLISH_FREQUENCIES = {
+    ' ': 0.1918, 'e': 0.1041, 't': 0.0729, 'a': 0.0652, 'o': 0.0596, 'n': 0.0564,
+    'i': 0.0558, 's': 0.0515, 'r': 0.0497, 'h': 0.0493, 'd': 0.0350, 'l': 0.0331,
+    'u': 0.0225, 'c': 0.0217, 'm': 0.0202, 'f': 0.0198, 'w': 0.0171, 'g': 0.0158,
+    'y': 0.0146, 'p': 0.0137, 'b': 0.0129, 'v': 0.0080, 'k': 0.0056, 'x': 0.0014,
+    'j': 0.0010, 'q': 0.0009, 'z': 0.0006,
+}
+
+
+def byte_log_weights(freqs=None):
+    """
+    Turns a mapping of characters (or byte values) to relative frequencies
+    into a list of 256 log-likelihood weights. By default, English text is
+    assumed: uppercase letters get a tenth of their lowercase frequency, and
+    other printable characters are rare but possible.
+    """
+    if freqs is None:
+        freqs = { }
+        for c, f in ENGLISH_FREQUENCIES.items():
+            freqs[c] = f
+            freqs[c.upper()] = max(freqs.get(c.upper(), 0), f / 10)
+        for c in range(0x20, 0x7f):
+            freqs.setdefault(chr(c), 0.0005)
+        freqs.setdefault('\n', 0.005)
+
+    probs = [ 1e-7 ] * 256
+    for c, f in freqs.items():
+        probs[ord(c) if isinstance(c, str) else c] = max(f, 1e-7)
+    total = sum(probs)
+    return [ math.log(p / total) for p in probs ]
+
+
+_default_xor_score_table = None
+
+
+def xor_score_table(freqs=None):
+    """
+    Returns a 256x256 table where table[k][v] is the log-likelihood weight of
+    the plaintext byte v ^ k, so that scoring a key byte k against a column's
+    byte counts is a single dot product.
+    """
+    global _default_xor_score_table
+    if freqs is None and _default_xor_score_table is not None:
+        return _default_xor_score_table
+
+    weights = byte_log_weights(freqs)
+    table = [ [ weights[v ^ k] for v in range(256) ] for k in range(256) ]
+    if freqs is None:
+        _default_xor_score_table = table
+    return table
+
+
 def xor_str(a, b, cycle=True):
     return _op_str(operator.xor, a, b, cycle)
 
@@ -1,5 +1,13 @@
+import binascii
+import collections
+import hashlib
+import os
+import pickle
 import pytest
 import random
+import subprocess
+import sys
+import zlib
 
 import blob
 import blob.blob as bb
@@ -36,6 +44,24 @@ class TestConstruction:
         assert b.size == 1
         assert b.size_bits == 8
 
+    def test_filename_recorded(self, tmp_path):
+        p = tmp_path / "test.bin"
+        p.write_bytes(b"hello")
+        assert blob.Blob(filename="test.bin", dirname=str(tmp_path)).filename == "test.bin"
+        assert blob.Blob(data=b"hello").filename is None
+
+    def test_slotted(self):
+        b = blob.Blob(data=b"ABCD")
+        assert not hasattr(b, "__dict__")
+        assert b.split(size=1)[0]._meta is None
+
+    def test_pickle_primary_representation(self):
+        b = blob.Blob(data=b"ABCD")
+        _ = b.data_bits
+        p = pickle.dumps(b)
+        assert b.data_bits.encode() not in p
+        assert pickle.loads(p) == b"ABCD"
+
     def test_none_data(self):
         b = blob.Blob()
         # No data set at all - accessing data will fail, but construction succeeds
@@ -97,6 +123,48 @@ class TestEquality:
         s = {a}
         assert b in s
 
+    def test_hash_matches_bytes(self):
+        a = blob.Blob(data_bits=blob.utils.to_bitstr(b"ABCD"))
+        assert hash(a) == hash(b"ABCD")
+        assert b"ABCD" in {a}
+
+    def test_hash_unaligned(self):
+        a = blob.Blob(data_bits="111")
+        b = blob.Blob(data_bits="00000111")
+        assert a != b
+        assert hash(a) == hash(blob.Blob(data_bits="111"))
+        assert len({a, b}) == 2
+
+    def test_hash_cache_invalidated(self):
+        a = blob.Blob(data=b"ABCD")
+        h = hash(a)
+        a.data = b"EFGH"
+        assert hash(a) != h
+        assert hash(a) == hash(b"EFGH")
+
+    def test_eq_different_length(self):
+        assert blob.Blob(data=b"AB") != b"ABC"
+        assert blob.Blob(data=b"AB") != blob.Blob(data_bits="0100000101")
+
+    def test_eq_bits(self):
+        assert blob.Blob(data_bits="101") == blob.Blob(data_bits="101")
+        assert blob.Blob(data_bits="101") != blob.Blob(data_bits="100")
+
+    def test_eq_cached_hash(self):
+        a = blob.Blob(data_bits="0100000101")
+        b = blob.Blob(data_bits="0100000101")
+        c = blob.Blob(data_bits="0100000100")
+        hash(a), hash(b), hash(c)
+        assert a == b
+        assert a != c
+        # mismatched cached hashes are trusted without comparing the data
+        b._meta.hash += 1
+        assert a != b
+
+    def test_eq_other_type(self):
+        assert blob.Blob(data=b"A") != 65
+        assert blob.Blob(data=b"A") not in [None, 65]
+
     def test_repr_bytes(self):
         a = blob.Blob(data=b"AB")
         r = repr(a)
@@ -107,6 +175,54 @@ class TestEquality:
         r = repr(a)
         assert "b'" in r
 
+    def test_repr_large_bytes(self):
+        a = blob.Blob(data=b"A" * 16 + b"B" * 1000 + b"C" * 16)
+        r = repr(a)
+        assert r == "B(%r...%r, size=1032)" % (b"A" * 16, b"C" * 16)
+        assert a._data_bits is None
+
+    def test_repr_large_bits(self):
+        a = blob.Blob(data_bits="1" * 16 + "0" * 100 + "1" * 15)
+        r = repr(a)
+        assert r.startswith("B(b'1111111111111111'...b'0")
+        assert r.endswith("size_bits=131)")
+
+    def test_repr_large_aligned_bits(self):
+        a = blob.Blob(data_bits="01000001" * 100)
+        assert repr(a) == "B(%r...%r, size=100)" % (b"A" * 16, b"A" * 16)
+        assert a._data_bytes is None
+
+
+# --- Hexdump ---
+
+class TestHexdump:
+    def test_hexdump(self):
+        a = blob.Blob(data=b"ABCDEFGHIJKLMNOP\x00\x7fz")
+        assert a.hexdump().split("\n") == [
+            "00000000  41 42 43 44 45 46 47 48 49 4a 4b 4c 4d 4e 4f 50  |ABCDEFGHIJKLMNOP|",
+            "00000010  00 7f 7a                                         |..z|",
+        ]
+
+    def test_hexdump_range(self):
+        a = blob.Blob(data=bytes(range(256)))
+        assert a.hexdump(0x41, 3, width=4) == "00000041  41 42 43     |ABC|"
+        assert a.hexdump(-2) == "000000fe  fe ff" + " " * 42 + "  |..|"
+        assert a.hexdump(300) == ""
+
+    def test_iter_hexdump_chunks(self):
+        d = bytes(range(256)) * 100
+        a = blob.Blob(data=d)
+        lines = list(a.iter_hexdump(width=7))
+        assert len(lines) == -(-len(d) // 7)
+        assert lines[-1].startswith("%08x  " % (len(d) // 7 * 7))
+        assert "".join(bytes.fromhex(l[10:10+20]).hex() for l in lines) == d.hex()
+
+    def test_hexdump_bits(self):
+        a = blob.Blob(data_bits="0100000101000010")
+        assert a.hexdump() == "00000000  41 42" + " " * 42 + "  |AB|"
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="101").hexdump()
+
 
 # --- Bitwise Operations ---
 
@@ -261,6 +377,10 @@ class TestBlocks:
         bs = b.blocksize_candidates(min_blocksize=2)
         assert all(s >= 2 for s in bs)
 
+    def test_blocksize_candidates_power_of_two(self):
+        b = blob.Blob(data=bytes(1 << 20))
+        assert b.blocksize_candidates() == [ 1 << i for i in range(20) ]
+
 
 # --- Split ---
 
@@ -319,6 +439,53 @@ class TestSplit:
         assert parts[3] == b"D"
 
 
+# --- Interleaving ---
+
+class TestInterleave:
+    def test_deinterleave_bytes(self):
+        b = blob.Blob(data=b"LRLRLRL")
+        assert b.deinterleave(2) == [b"LLLL", b"RRR"]
+
+    def test_deinterleave_units(self):
+        b = blob.Blob(data=b"AABBCCAABBCC")
+        assert b.deinterleave(3, unit=2) == [b"AAAA", b"BBBB", b"CCCC"]
+
+    def test_deinterleave_large_units(self, monkeypatch):
+        monkeypatch.setattr(bb, "_STRIPE_JOIN_UNIT", 2)
+        b = blob.Blob(data=b"AABBCCAABB")
+        assert b.deinterleave(3, unit=2) == [b"AAAA", b"BBBB", b"CC"]
+        assert blob.Blob.interleave(*b.deinterleave(3, unit=2), unit=2) == b
+
+    def test_deinterleave_bits(self):
+        b = blob.Blob(data=b"\xf0")
+        assert [l.data_bits for l in b.deinterleave(2, unit=1.)] == ["1100", "1100"]
+        assert [l.data_bits for l in b.deinterleave(2, unit=2.)] == ["1100", "1100"]
+
+    def test_interleave(self):
+        l = blob.Blob(data=b"LLLL")
+        assert l.interleave(b"RRR") == b"LRLRLRL"
+        assert blob.Blob.interleave(l, b"RRRR", unit=2) == b"LLRRLLRR"
+
+    def test_interleave_bits(self):
+        a = blob.Blob(data_bits="1100")
+        assert a.interleave(blob.Blob(data_bits="1100"), unit=1.) == b"\xf0"
+
+    def test_roundtrip(self):
+        data = bytes(random.randrange(256) for _ in range(96))
+        b = blob.Blob(data=data)
+        for k in (1, 2, 3, 5):
+            for unit in (1, 2, 4):
+                assert blob.Blob.interleave(*b.deinterleave(k, unit=unit), unit=unit) == b
+
+    def test_invalid(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"ABC").deinterleave(2, unit=2)
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"A").interleave(b"BBB")
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"A").deinterleave(0)
+
+
 # --- MP Split ---
 
 class TestMpSplit:
@@ -434,6 +601,49 @@ class TestUnpack:
             b.unpack('>I', repeat=False)
 
 
+# --- Endianness ---
+
+class TestEndianness:
+    def test_byteswap(self):
+        b = blob.Blob(data=b"\x01\x02\x03\x04\x05\x06\x07\x08")
+        assert b.byteswap(2) == b"\x02\x01\x04\x03\x06\x05\x08\x07"
+        assert b.byteswap(4) == b"\x04\x03\x02\x01\x08\x07\x06\x05"
+        assert b.byteswap(8) == b"\x08\x07\x06\x05\x04\x03\x02\x01"
+        assert b.byteswap(1) == b
+
+    def test_byteswap_odd_word(self):
+        b = blob.Blob(data=b"ABCDEF")
+        assert b.byteswap(3) == b"CBAFED"
+
+    def test_byteswap_bad_size(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"ABC").byteswap(2)
+
+    def test_reverse_bits(self):
+        b = blob.Blob(data=b"\x01\x80\xf0\x35")
+        assert b.reverse_bits() == b"\x80\x01\x0f\xac"
+        assert b.reverse_bits().reverse_bits() == b
+
+    def test_reinterpret_endianness(self):
+        b = blob.Blob(data=b"AABBBBCC")
+        assert b.reinterpret('>I', '<I').unpack('<I') == b.unpack('>I')
+        assert b.reinterpret('>H', '!H') == b
+
+    def test_reinterpret_widen(self):
+        b = blob.Blob(data=b"\x00\x01\x00\x02")
+        assert b.reinterpret('>H', '<I') == b"\x01\x00\x00\x00\x02\x00\x00\x00"
+
+    def test_reinterpret_multi_field(self):
+        b = blob.Blob(data=b"\x00\x01\x00\x00\x00\x02")
+        assert b.reinterpret('>HI', '<HI') == b"\x01\x00\x02\x00\x00\x00"
+
+    def test_reinterpret_invalid(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"ABC").reinterpret('>H', '<H')
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"\xff\xff").reinterpret('>H', '<b')
+
+
 # --- Bit/Byte Conversion ---
 
 class TestBitByte:
@@ -574,6 +784,277 @@ class TestChiSquare:
         assert len(result) == 2
 
 
+# --- N-grams ---
+
+class TestNgrams:
+    def test_unigrams(self):
+        b = blob.Blob(data=b"AABBBC")
+        assert b.ngrams(1) == {0x41: 2, 0x42: 3, 0x43: 1}
+
+    def test_bigrams_overlapping(self):
+        b = blob.Blob(data=b"ABAB")
+        assert b.ngrams(2) == {0x4142: 2, 0x4241: 1}
+
+    def test_bigrams_non_overlapping(self):
+        b = blob.Blob(data=b"ABABC")
+        assert b.ngrams(2, overlapping=False) == {0x4142: 2}
+
+    def test_trigrams(self):
+        b = blob.Blob(data=b"ABCABCA")
+        assert b.ngrams(3) == {0x414243: 2, 0x424341: 2, 0x434142: 1}
+        assert b.ngrams(3, overlapping=False) == {0x414243: 2}
+
+    def test_long_grams(self):
+        b = blob.Blob(data=b"ABCDEFGHIJ" * 2)
+        assert b.ngrams(10, overlapping=False) == {int.from_bytes(b"ABCDEFGHIJ", 'big'): 2}
+        assert len(b.ngrams(10)) == 10
+
+    def test_bit_grams(self):
+        b = blob.Blob(data=b"\xf0")
+        assert b.ngrams(2, bits=True) == {0b11: 3, 0b10: 1, 0b00: 3}
+        assert b.ngrams(2, bits=True, overlapping=False) == {0b11: 2, 0b00: 2}
+
+    def test_bit_grams_match_naive(self):
+        b = blob.Blob(data=bytes(random.randrange(256) for _ in range(64)))
+        for n in (1, 3, 8, 9, 13):
+            d = b.data_bits
+            naive = collections.Counter(int(d[i:i+n], 2) for i in range(len(d) - n + 1))
+            assert b.ngrams(n, bits=True) == naive
+
+    def test_bit_grams_unaligned(self):
+        b = blob.Blob(data_bits="10110")
+        assert b.ngrams(2, bits=True) == {0b10: 2, 0b01: 1, 0b11: 1}
+
+    def test_top(self):
+        b = blob.Blob(data=b"AAAABBBC")
+        assert list(b.ngrams(1, top=2).items()) == [(0x41, 4), (0x42, 3)]
+
+    def test_short_blob(self):
+        assert blob.Blob(data=b"AB").ngrams(3) == {}
+
+    def test_invalid(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"AB").ngrams(0)
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="101").ngrams(1)
+
+
+# --- Strings ---
+
+class TestStrings:
+    def test_ascii(self):
+        b = blob.Blob(data=b"\x00\x01hello world\x00ab\x00tab\there\xff")
+        assert b.strings(encodings=('ascii',)) == [(2, "hello world"), (17, "tab\there")]
+
+    def test_min_len(self):
+        b = blob.Blob(data=b"\x00ab\x00abc\x00")
+        assert b.strings(min_len=3) == [(4, "abc")]
+        assert b.strings(min_len=2) == [(1, "ab"), (4, "abc")]
+
+    def test_utf16(self):
+        b = blob.Blob(data=b"\xff" + "wide".encode("utf-16le") + b"\xff" + "big!".encode("utf-16be"))
+        assert b.strings(encodings=('utf-16le',)) == [(1, "wide")]
+        assert b.strings(encodings=('utf-16be',)) == [(10, "big!")]
+
+    def test_default_encodings(self):
+        b = blob.Blob(data=b"ascii\xff" + "wide".encode("utf-16le"))
+        assert b.strings() == [(0, "ascii"), (6, "wide")]
+
+    def test_chunked(self, monkeypatch):
+        monkeypatch.setattr(bb, "_STRINGS_CHUNK", 7)
+        data = bytes(random.choice(b"ab \x00\x01") for _ in range(2000))
+        expected = blob.Blob(data=data).strings()
+        monkeypatch.undo()
+        assert blob.Blob(data=data).strings() == expected
+
+    def test_shared(self):
+        b = blob.Blob(data=b"\x00hello\x00").share()
+        try:
+            assert b.strings() == [(1, "hello")]
+        finally:
+            b.shared_memory.unlink()
+
+    def test_invalid_encoding(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"hello").strings(encodings=('ebcdic',))
+
+
+# --- Hashes and Checksums ---
+
+class TestHashes:
+    def test_digest(self):
+        b = blob.Blob(data=b"hello")
+        assert b.digest() == hashlib.sha256(b"hello").digest()
+        assert b.digest('md5') == hashlib.md5(b"hello").digest()
+        assert b.digest('sha3_256') == hashlib.sha3_256(b"hello").digest()
+
+    def test_digest_chunked(self, monkeypatch):
+        monkeypatch.setattr(bb, "_HASH_CHUNK", 3)
+        b = blob.Blob(data=b"hello world")
+        assert b.digest() == hashlib.sha256(b"hello world").digest()
+        assert b.checksum() == zlib.crc32(b"hello world")
+
+    def test_digest_from_bits(self):
+        b = blob.Blob(data_bits=blob.utils.to_bitstr(b"hello"))
+        assert b.digest('sha1') == hashlib.sha1(b"hello").digest()
+
+    def test_checksum(self):
+        b = blob.Blob(data=b"hello")
+        assert b.checksum() == zlib.crc32(b"hello")
+        assert b.checksum('adler32') == zlib.adler32(b"hello")
+        assert b.checksum('crc_hqx') == binascii.crc_hqx(b"hello", 0)
+
+    def test_block_digests(self):
+        data = bytes(range(256)) * 5
+        expected = [ hashlib.sha1(data[i:i+100]).digest() for i in range(0, len(data), 100) ]
+        b = blob.Blob(data=data)
+        assert b.block_digests(100, 'sha1') == expected
+        assert b.block_digests(100, 'sha1', workers=3) == expected
+
+    def test_block_digests_dedupe(self):
+        b = blob.Blob(data=b"A" * 16 + b"B" * 16 + b"A" * 16)
+        assert len(set(b.block_digests(16))) == 2
+
+    def test_invalid(self):
+        b = blob.Blob(data=b"hello")
+        with pytest.raises(bb.BlobError):
+            b.digest('nope')
+        with pytest.raises(bb.BlobError):
+            b.checksum('nope')
+        with pytest.raises(bb.BlobError):
+            b.block_digests(0)
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="101").digest()
+
+
+# --- Bit Counting ---
+
+class TestBitCounting:
+    def test_popcount(self):
+        assert blob.Blob(data=b"\x00\xff\x0f").popcount() == 12
+        assert blob.Blob(data=b"").popcount() == 0
+        assert blob.Blob(data_bits="10110").popcount() == 3
+
+    def test_hamming(self):
+        a = blob.Blob(data=b"this is a test")
+        assert a.hamming(b"wokka wokka!!!") == 37
+        assert a.hamming(a) == 0
+
+    def test_hamming_bits(self):
+        assert blob.Blob(data_bits="10110").hamming(blob.Blob(data_bits="00111")) == 2
+
+    def test_hamming_unequal(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"AB").hamming(b"ABC")
+
+    def test_hamming_matrix(self):
+        blocks = blob.Blob(data=b"\x00\x01\x03\xff").split(size=1)
+        m = blob.Blob.hamming_matrix(blocks)
+        assert m == [[0, 1, 2, 8], [1, 0, 1, 7], [2, 1, 0, 6], [8, 7, 6, 0]]
+
+    def test_hamming_matrix_bits(self):
+        m = blob.Blob.hamming_matrix([blob.Blob(data_bits="101"), blob.Blob(data_bits="010")])
+        assert m == [[0, 3], [3, 0]]
+
+    def test_hamming_matrix_unequal(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob.hamming_matrix([b"A", b"AB"])
+
+
+# --- Repeating-key XOR ---
+
+ENGLISH = (
+    b"It is intentionally small, direct, and useful in CTF workflows. "
+    b"Blob provides a class that lets you flip between byte and bit views "
+    b"without manually converting, index and slice by bytes or bits, split "
+    b"by size, count, or separator, and run bitwise operations directly on "
+    b"binary blobs. The design goals are to be well tested, familiar, and "
+    b"flexible, so that we can do stuff that we do not anticipate with it. "
+) * 4
+
+
+class TestXorSolver:
+    def test_keysize_scores(self):
+        c = blob.Blob(data=ENGLISH) ^ b"ICEsecret"
+        scores = c.xor_keysize_scores(20)
+        # multiples of the key length score as well as the key length
+        assert scores[0][0] == 9
+        assert scores[1][0] == 18
+        assert max(scores, key=lambda s: s[2])[0] % 9 == 0
+
+    def test_keysize_scores_short(self):
+        # on short inputs, multiples often score a little better by chance
+        for length, key in ((150, b"k3y"), (300, b"k3y"), (300, b"ICEsecret")):
+            c = blob.Blob(data=ENGLISH[:length]) ^ key
+            scores = c.xor_keysize_scores(40)
+            assert scores[0][0] == len(key)
+            assert min(scores, key=lambda s: s[1])[0] != len(key)
+
+    def test_keysize_scores_values(self):
+        scores = dict((k, (d, ic)) for k, d, ic in blob.Blob(data=b"\x00\xff\x00\xff").xor_keysize_scores(3))
+        assert scores[1] == (1.0, 0.0)
+        assert scores[2] == (0.0, 1.0)
+
+    def test_key_recover(self):
+        c = blob.Blob(data=ENGLISH) ^ b"ICEsecret"
+        assert c.xor_key_recover(9) == b"ICEsecret"
+
+    def test_key_recover_custom_freqs(self):
+        c = blob.Blob(data=b"\x00\x01" * 50 + b"\x02") ^ b"\x42"
+        assert c.xor_key_recover(1, freqs={0: 0.5, 1: 0.4, 2: 0.1}) == b"\x42"
+
+    def test_invalid(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data=b"AB").xor_key_recover(0)
+
+
+# --- Autocorrelation ---
+
+class TestAutocorrelation:
+    @pytest.fixture(params=["int", "numpy", "fft"])
+    def method(self, request, monkeypatch):
+        if request.param == "int":
+            monkeypatch.setattr(bb, "_numpy_fail", True)
+        else:
+            try:
+                import numpy  # noqa: F401
+            except ImportError:
+                pytest.skip("numpy not installed")
+            fft = request.param == "fft"
+            monkeypatch.setattr(bb, "_autocorrelation_uses_fft", lambda n, values, max_shift: fft)
+        return request.param
+
+    def test_matches_naive(self, method):
+        d = bytes(random.randrange(4) for _ in range(300))
+        naive = [ sum(1 for i in range(len(d) - k) if d[i] == d[i + k]) for k in range(len(d)) ]
+        assert blob.Blob(data=d).autocorrelation() == naive
+
+    def test_noisy_period(self, method):
+        d = bytearray(b"periodic" * 200)
+        for i in range(0, len(d), 7):
+            d[i] ^= 0x01
+        c = blob.Blob(data=bytes(d)).autocorrelation(20)
+        assert len(c) == 21
+        assert max(range(1, 21), key=lambda k: c[k]) % 8 == 0
+
+    def test_short(self, method):
+        assert blob.Blob(data=b"A").autocorrelation(5) == [1]
+        assert blob.Blob(data=b"").autocorrelation() == []
+
+    def test_cost_model(self):
+        # few values and many shifts: FFT
+        assert bb._autocorrelation_uses_fft(1 << 16, 4, 1 << 15)
+        # a handful of shifts, or many distinct values: comparisons
+        assert not bb._autocorrelation_uses_fft(1 << 16, 4, 64)
+        assert not bb._autocorrelation_uses_fft(1 << 16, 256, 1 << 15)
+
+    def test_index_of_coincidence(self):
+        assert blob.Blob(data=b"AAAA").index_of_coincidence() == 1.0
+        assert blob.Blob(data=b"ABCD").index_of_coincidence() == 0.0
+        assert blob.Blob(data=b"AABB").index_of_coincidence() == pytest.approx(1 / 3)
+        assert blob.Blob(data=b"A").index_of_coincidence() == 0.0
+
+
 # --- Rotating XORs ---
 
 class TestRotatingXors:
@@ -662,6 +1143,257 @@ class TestJust:
             a.rjust("4")
 
 
+# --- Shared Memory ---
+
+class TestSharedMemory:
+    @pytest.fixture
+    def shared(self):
+        b = blob.Blob(data=b"AAAABBBBCCCC").share()
+        yield b
+        b.shared_memory.unlink()
+
+    def test_share(self, shared):
+        assert shared.shared_memory is not None
+        assert shared.size == 12
+        assert shared == b"AAAABBBBCCCC"
+
+    def test_pickle_sends_reference(self, shared):
+        p = pickle.dumps(shared)
+        assert b"AAAABBBBCCCC" not in p
+        u = pickle.loads(p)
+        assert u.shared_memory.name == shared.shared_memory.name
+        assert u.data == b"AAAABBBBCCCC"
+
+    def test_slice_stays_shared(self, shared):
+        s = shared[4:8]
+        assert s.shared_memory is shared.shared_memory
+        assert pickle.loads(pickle.dumps(s)).data == b"BBBB"
+        assert shared[-1].shared_memory is shared.shared_memory
+        assert shared[-1] == b"C"
+
+    def test_index_out_of_range(self, shared):
+        with pytest.raises(IndexError):
+            shared[12]
+        with pytest.raises(IndexError):
+            shared[-13]
+
+    def test_from_shared_memory(self, shared):
+        b = blob.Blob.from_shared_memory(shared.shared_memory.name, offset=8, length=4)
+        assert b.data == b"CCCC"
+
+    def test_split_shared(self, shared):
+        assert shared.split(size=4) == [b"AAAA", b"BBBB", b"CCCC"]
+
+    def test_sees_writes(self, shared):
+        shared.data
+        shared.data_bits
+        shared.shared_memory.buf[0] = 0x42
+        assert shared.data == b"BAAABBBBCCCC"
+        assert shared.data_bits.startswith("01000010")
+        assert shared.histogram()[0x42] == 5
+        assert shared.split(size=4)[0] == b"BAAA"
+        assert shared.unpack(">I")[0] == 0x42414141
+        assert shared[0.:8.] == b"B"
+        assert shared[::4] == b"BBC"
+
+    def test_hash_sees_writes(self, shared):
+        hash(shared)
+        shared.shared_memory.buf[0] = 0x42
+        assert hash(shared) == hash(b"BAAABBBBCCCC")
+        assert shared in { blob.Blob(data=b"BAAABBBBCCCC") }
+
+    def test_other_process_keeps_segment(self, shared):
+        # an unrelated process that attaches must not unlink the segment on exit
+        code = "import blob, sys; sys.stdout.write(blob.Blob.from_shared_memory(sys.argv[1]).data.decode())"
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        out = subprocess.run([ sys.executable, "-c", code, shared.shared_memory.name ], env=env, capture_output=True, text=True, check=True)
+        assert out.stdout == "AAAABBBBCCCC"
+        shm = bb.shared_memory.SharedMemory(name=shared.shared_memory.name)
+        assert bytes(shm.buf[:4]) == b"AAAA"
+        shm.close()
+
+    def test_pickle_private(self):
+        b = pickle.loads(pickle.dumps(blob.Blob(data=b"ABCD")))
+        assert b.shared_memory is None
+        assert b.data == b"ABCD"
+
+    def test_share_unaligned(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="111").share()
+
+
+# --- Hierarchy and Analysis Cache ---
+
+class TestHierarchy:
+    def test_untracked(self):
+        b = blob.Blob(data=b"ABCDEFGH")
+        assert not b.tracked
+        assert b[2:4].parent is None
+        assert b[2:4].parent_offset is None
+
+    def test_slices(self):
+        b = blob.Blob(data=b"ABCDEFGH").track()
+        c = b[2:6]
+        assert c.tracked and c.parent is b
+        assert c.parent_offset == 2
+        assert c.derivation == "slice"
+        assert b[-1].parent_offset == 7
+        assert b[::2].derivation == "stride"
+        assert b[4.:12.].parent_offset == 4.
+        assert b.offset(3).parent_offset == 3
+        assert b.truncate(3).parent_offset == 0
+
+    def test_chain(self):
+        b = blob.Blob(data=b"ABCDEFGH").track()
+        c = b[2:][1:][1.:]
+        assert c.ancestors()[-1] is b
+        assert len(c.ancestors()) == 3
+        assert c.root_offset == 25.
+        assert b[2:][2:].root_offset == 4
+
+    def test_split(self):
+        b = blob.Blob(data=b"aXbXXc").track()
+        assert [ p.parent_offset for p in b.split(sep=b"X") ] == [ 0, 2, 5 ]
+        assert [ p.parent_offset for p in b.split(sep=b"X", allow_empty=True) ] == [ 0, 2, 4, 5 ]
+        assert [ p.parent_offset for p in b.split(size=2) ] == [ 0, 2, 4 ]
+        assert [ p.derivation for p in b.split(size=2) ] == [ "split" ] * 3
+        bits = blob.Blob(data_bits="1100101").track()
+        assert [ p.parent_offset for p in bits.split(sep_bits="0") ] == [ 0, 4., 6. ]
+
+    def test_bitwise(self):
+        b = blob.Blob(data=b"ABCD").track()
+        assert (b ^ b"\x01").derivation == "xor"
+        assert (~b).parent is b
+        assert (~b).parent_offset == 0
+
+    def test_histogram(self):
+        assert blob.Blob(data=b"AAB").histogram()[0x41:0x43] == [ 2, 1 ]
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="101").histogram()
+
+    def test_histogram_chunks(self, monkeypatch):
+        data = bytes(random.randrange(256) for _ in range(5000))
+        monkeypatch.setattr(bb, "_HISTOGRAM_CHUNK", 1000)
+        counts = collections.Counter(data)
+        assert blob.Blob(data=data).histogram() == [ counts.get(i, 0) for i in range(256) ]
+
+    def test_histogram_reuses_parent(self):
+        data = bytes(random.randrange(256) for _ in range(4096))
+        b = blob.Blob(data=data).track()
+        b.histogram()
+        assert b[10:].histogram() == blob.Blob(data=data[10:]).histogram()
+        assert b.split(size=4000)[0].histogram() == blob.Blob(data=data[:4000]).histogram()
+        assert (~b).histogram() == blob.Blob(data=(~b).data).histogram()
+
+    def test_histogram_parent_replaced(self):
+        data = bytes(random.randrange(256) for _ in range(4096))
+        p = blob.Blob(data=data).track()
+        c = p[0:3000]
+        d = (~p).track()
+        p.data = bytes(random.randrange(256) for _ in range(1000))
+        p.track()
+        p.histogram()
+        assert c.histogram() == blob.Blob(data=data[:3000]).histogram()
+        assert d.histogram() == blob.Blob(data=d.data).histogram()
+
+    def test_cache(self):
+        b = blob.Blob(data=b"ABCD")
+        assert b.digest() is b.digest()
+        assert b.digest() == hashlib.sha256(b"ABCD").digest()
+        h = b.histogram()
+        h[0] = 99
+        assert b.histogram()[0] == 0
+        b.data = b"AAAA"
+        assert b.digest() == hashlib.sha256(b"AAAA").digest()
+        assert b.histogram()[0x41] == 4
+
+    def test_cached_entropy(self):
+        try:
+            import scipy.stats  # noqa: F401
+        except ImportError:
+            pytest.skip("scipy not installed")
+        b = blob.Blob(data=b"AABBBBCC")
+        assert b.entropy(blocksize=1) == 1.5
+        assert b.entropy(blocksize=1) is b.entropy(blocksize=1)
+        assert b.entropy(blocksize=2) == 1.5
+        assert b.chisquare(blocksize=1) == b.chisquare(blocksize=1)
+
+
+# --- Automatic Analysis ---
+
+class TestAnalyze:
+    def test_text(self):
+        a = blob.Blob(data=b"The quick brown fox jumps over the lazy dog.\n" * 20).analyze()
+        assert a["tags"] == ["text"]
+        assert a["printable_ratio"] == 1.0
+        assert a["size"] == 900
+        assert sum(a["histogram"]) == 900
+
+    def test_encrypted(self):
+        rng = random.Random(1)
+        a = blob.Blob(data=bytes(rng.randrange(256) for _ in range(1 << 16))).analyze()
+        assert a["tags"] == ["encrypted"]
+        assert a["entropy"] > 7.99
+        assert a["duplicate_blocks"] == {8: 0, 16: 0, 32: 0, 64: 0}
+
+    def test_compressed(self):
+        data = zlib.compress(bytes(random.randrange(256) for _ in range(4096)))
+        assert blob.Blob(data=data).analyze()["tags"] == ["compressed"]
+
+    def test_ecb(self):
+        rng = random.Random(2)
+        block = bytes(rng.randrange(256) for _ in range(16))
+        data = bytes(rng.randrange(256) for _ in range(4096)) + block * 8
+        a = blob.Blob(data=data).analyze()
+        assert a["tags"] == ["encrypted", "ecb"]
+        assert a["duplicate_blocks"][16] == 7
+
+    def test_structured(self):
+        data = b"".join(bytes([ i, 1, 2, 3 ]) + bytes(28) for i in range(256))
+        a = blob.Blob(data=data).analyze()
+        assert a["tags"] == ["structured"]
+        assert a["null_runs"][0] == (4, 28)
+        assert a["longest_repeats"][0][1] == 28
+        assert a["duplicate_blocks"][8] > 0
+
+    def test_null_runs(self):
+        a = blob.Blob(data=b"A" * 20 + bytes(100) + b"B").analyze(min_run=8)
+        assert a["null_runs"] == [(20, 100)]
+        assert a["longest_repeats"] == [(20, 100, 0), (0, 20, 0x41)]
+
+    def test_duplicate_blocks(self):
+        data = b"ABCDEFGH" * 4 + b"12345678" * 2
+        assert blob.Blob(data=data).analyze(block_sizes=(8, 16, 24))["duplicate_blocks"] == {8: 4, 16: 1, 24: 0}
+
+    def test_duplicate_blocks_no_numpy(self):
+        data = bytes(random.choice(b"\x00\x01") for _ in range(2000))
+        orig = bb._numpy_fail
+        bb._numpy_fail = True
+        try:
+            without = bb._duplicate_blocks(data, (8, 12, 16, 24, 32))[0]
+        finally:
+            bb._numpy_fail = orig
+        assert without == bb._duplicate_blocks(data, (8, 12, 16, 24, 32))[0]
+        for size, count in without.items():
+            blocks = [ data[i:i+size] for i in range(0, len(data) // size * size, size) ]
+            assert count == len(blocks) - len(set(blocks))
+
+    def test_empty(self):
+        a = blob.Blob(data=b"").analyze()
+        assert a["tags"] == ["empty"]
+        assert a["entropy"] == 0
+
+    def test_cached(self):
+        b = blob.Blob(data=bytes(range(8)) * 100)
+        a = b.analyze()
+        a["tags"].append("mine")
+        assert b.analyze()["tags"] == ["structured"]
+
+    def test_unaligned(self):
+        with pytest.raises(bb.BlobError):
+            blob.Blob(data_bits="101").analyze()
+
+
 # --- Edge Cases ---
 
 class TestEdgeCases:
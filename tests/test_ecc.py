@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import blob
+from blob import ecc
+from blob.errors import ECCError
+
+
+# the "hello world" QR code example: 16 data codewords, 10 EC codewords
+QR_MESSAGE = bytes.fromhex("40d2754776173206272696c6c69670ec")
+QR_PARITY = bytes.fromhex("bc2a90136bafeffd4be0")
+
+
+def corrupt(data, positions):
+    data = bytearray(data)
+    for p in positions:
+        data[p] ^= 0xa5
+    return bytes(data)
+
+
+# --- Single codewords ---
+
+class TestCodeword:
+    def test_encode_known_vector(self):
+        assert ecc.RSCodec(10).encode(QR_MESSAGE) == QR_MESSAGE + QR_PARITY
+
+    def test_syndromes(self):
+        rs = ecc.RSCodec(10)
+        assert not any(rs.syndromes(QR_MESSAGE + QR_PARITY))
+        assert any(rs.syndromes(corrupt(QR_MESSAGE + QR_PARITY, [ 3 ])))
+
+    def test_decode_errors(self):
+        rs = ecc.RSCodec(10)
+        message, positions = rs.decode(corrupt(QR_MESSAGE + QR_PARITY, [ 0, 7, 12, 20, 25 ]))
+        assert message == QR_MESSAGE
+        assert positions == [ 0, 7, 12, 20, 25 ]
+
+    def test_decode_erasures(self):
+        rs = ecc.RSCodec(10)
+        erased = list(range(2, 12))
+        message, _ = rs.decode(corrupt(QR_MESSAGE + QR_PARITY, erased), erase_pos=erased)
+        assert message == QR_MESSAGE
+
+    def test_too_many_errors(self):
+        rs = ecc.RSCodec(4)
+        with pytest.raises(ECCError):
+            rs.decode(corrupt(rs.encode(b"some message"), [ 0, 1, 2, 3, 4, 5 ]))
+
+    @pytest.mark.parametrize("prim,fcr", [ (0x11d, 1), (0x187, 112), (0x12d, 0) ])
+    def test_other_fields(self, prim, fcr):
+        rs = ecc.RSCodec(8, prim, fcr)
+        message, _ = rs.decode(corrupt(rs.encode(b"hello world"), [ 1, 14 ]))
+        assert message == b"hello world"
+
+    def test_random(self):
+        rng = random.Random(1)
+        rs = ecc.RSCodec(16)
+        for _ in range(50):
+            msg = bytes(rng.randrange(256) for _ in range(rng.randint(1, 239)))
+            codeword = rs.encode(msg)
+            positions = rng.sample(range(len(codeword)), rng.randint(0, 8))
+            assert rs.decode(corrupt(codeword, positions)) == (msg, sorted(positions))
+
+
+# --- Many codewords ---
+
+class TestBlocks:
+    def test_encode_blocks(self):
+        rs = ecc.RSCodec(10)
+        data = bytes(range(256)) * 3 + b"tail"
+        encoded = rs.encode_blocks(data, 16)
+        assert encoded == b''.join(rs.encode(data[i:i+16]) for i in range(0, len(data), 16))
+
+    def test_decode_blocks(self):
+        rs = ecc.RSCodec(10)
+        data = bytes(range(256)) * 3 + b"tail"
+        encoded = rs.encode_blocks(data, 16)
+        bad = corrupt(encoded, [ 0, 4, 30, 52, len(encoded) - 1 ])
+        decoded, corrected = rs.decode_blocks(bad, 26)
+        assert decoded == data
+        assert corrected == { 0: [ 0, 4 ], 1: [ 4 ], 2: [ 0 ], len(encoded) // 26: [ 13 ] }
+
+    def test_decode_blocks_clean(self):
+        rs = ecc.RSCodec(4)
+        assert rs.decode_blocks(rs.encode_blocks(b"A" * 1000, 20), 24) == (b"A" * 1000, { })
+
+    def test_decode_blocks_uncorrectable(self):
+        rs = ecc.RSCodec(2)
+        with pytest.raises(ECCError, match="codeword 1"):
+            rs.decode_blocks(corrupt(rs.encode_blocks(b"B" * 40, 10), [ 12, 13 ]), 12)
+
+
+# --- Blob methods ---
+
+class TestBlob:
+    def test_roundtrip(self):
+        b = blob.Blob(bytes(range(200)))
+        encoded = b.rs_encode_blocks(32, 24)
+        assert encoded.size == 200 + 9 * 8
+        assert encoded.rs_decode_blocks(32, 24) == b
+
+    def test_decode_corrupted(self):
+        b = blob.Blob(b"The quick brown fox jumps over the lazy dog")
+        encoded = b.rs_encode_blocks(255, 223, prim=0x187, fcr=112)
+        bad = blob.Blob(corrupt(encoded.data, range(0, 60, 4)))
+        assert bad.rs_decode_blocks(255, 223, prim=0x187, fcr=112) == b
+
+    def test_invalid(self):
+        with pytest.raises(blob.errors.BlobError):
+            blob.Blob(b"abc").rs_decode_blocks(10, 10)
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+import blob
+from blob import instrument
+
+
+@pytest.fixture(autouse=True)
+def check_disabled():
+    yield
+    assert not instrument.enabled()
+
+
+# --- Recording ---
+
+class TestRecorder:
+    def test_zero_cost_when_disabled(self):
+        split = blob.Blob.split
+        getitem = blob.Blob.__getitem__
+        to_bitstr = blob.utils.to_bitstr
+        with instrument.record():
+            assert blob.Blob.split is not split
+            assert instrument.enabled()
+        assert blob.Blob.split is split
+        assert blob.Blob.__getitem__ is getitem
+        assert blob.utils.to_bitstr is to_bitstr
+
+    def test_operations(self):
+        b = blob.Blob(data=b"ABCD" * 4)
+        with instrument.record() as r:
+            b.split(size=4)
+            b.split(size=4)
+            b ^ b"\x01"
+        ops = r.as_dict()["operations"]
+        assert ops["Blob.split"]["calls"] == 2
+        assert ops["Blob.split"]["bytes"] == 32
+        assert ops["Blob.split"]["seconds"] >= 0
+        assert ops["Blob.__xor__"]["calls"] == 1
+        assert ops["utils._op_str"]["bytes"] == 16
+
+    def test_conversions(self):
+        b = blob.Blob(data=b"AB")
+        with instrument.record() as r:
+            b.data_bits
+            b.data_bits # cached, so not converted again
+            blob.Blob(data_bits="0100000101000010").data
+        conversions = r.as_dict()["conversions"]
+        assert conversions["bytes_to_bits"]["calls"] == 1
+        assert conversions["bytes_to_bits"]["bytes"] == 2
+        assert conversions["bits_to_bytes"]["calls"] == 1
+
+    def test_static_and_class_methods(self):
+        with instrument.record() as r:
+            blob.Blob.hamming_matrix([ b"a", b"b" ])
+        assert r.as_dict()["operations"]["Blob.hamming_matrix"]["calls"] == 1
+        assert blob.Blob.hamming_matrix([ b"a", b"b" ]) == [ [0, 2], [2, 0] ]
+
+    def test_generator(self):
+        with instrument.record() as r:
+            assert len(list(blob.Blob(data=b"ABCD").rotating_xors())) == 4
+        assert r.as_dict()["operations"]["Blob.rotating_xors"]["calls"] == 1
+
+    def test_exceptions_are_recorded(self):
+        with instrument.record() as r:
+            with pytest.raises(blob.errors.BlobError):
+                blob.Blob(data=b"ABC").unpack("<I")
+        assert r.calls["Blob.unpack"] == 1
+
+    def test_json(self):
+        with instrument.record() as r:
+            blob.Blob(data=b"AB").split(size=1)
+        assert json.loads(r.to_json())["operations"]["Blob.split"]["calls"] == 1
+
+    def test_nested(self):
+        outer = instrument.Recorder().start()
+        with instrument.record() as inner:
+            blob.Blob(data=b"AB").split(size=1)
+        assert instrument.enabled()
+        blob.Blob(data=b"AB").split(size=1)
+        outer.stop()
+        assert inner.calls["Blob.split"] == 1
+        assert outer.calls["Blob.split"] == 2
+
+    def test_reset(self):
+        with instrument.record() as r:
+            blob.Blob(data=b"AB").split(size=1)
+            r.reset()
+        assert r.as_dict() == { "operations": {}, "conversions": {} }
+
+
+# --- Hooks ---
+
+class TestHooks:
+    def test_hook(self):
+        events = [ ]
+        hook = lambda name, seconds, nbytes: events.append((name, nbytes))  # noqa: E731
+        instrument.add_hook(hook)
+        try:
+            blob.Blob(data=b"ABCD").split(size=2)
+        finally:
+            instrument.remove_hook(hook)
+        assert ("Blob.split", 4) in events
+        blob.Blob(data=b"ABCD").split(size=2)
+        assert len([ e for e in events if e[0] == "Blob.split" ]) == 1
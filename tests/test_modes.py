@@ -0,0 +1,125 @@
+import pytest
+
+import blob
+from blob import modes
+from blob.errors import BlobError
+
+
+KEY = bytes(range(16, 32))
+
+
+def encrypt(b):
+    # a toy invertible block function: xor with the key, then rotate
+    x = blob.utils.xor_str(b, KEY, cycle=False)
+    return x[1:] + x[:1]
+
+
+def decrypt(b):
+    x = b[-1:] + b[:-1]
+    return blob.utils.xor_str(x, KEY, cycle=False)
+
+
+IV = bytes(range(16))
+PLAIN = bytes(range(64)) * 2
+
+
+# --- Padding ---
+
+class TestPadding:
+    def test_pad(self):
+        assert modes.pad(b"YELLOW SUBMARINE", 20) == b"YELLOW SUBMARINE\x04\x04\x04\x04"
+        assert modes.pad(b"", 4) == b"\x04\x04\x04\x04"
+
+    def test_unpad(self):
+        assert modes.unpad(b"ICE ICE BABY\x04\x04\x04\x04") == b"ICE ICE BABY"
+        assert modes.unpad(modes.pad(b"A" * 16)) == b"A" * 16
+
+    def test_unpad_invalid(self):
+        with pytest.raises(BlobError):
+            modes.unpad(b"ICE ICE BABY\x05\x05\x05\x05")
+        with pytest.raises(BlobError):
+            modes.unpad(b"ICE ICE BABY\x01\x02\x03\x04")
+        with pytest.raises(BlobError):
+            modes.unpad(b"ICE ICE BABY\x00")
+
+
+# --- ECB ---
+
+class TestECB:
+    def test_roundtrip(self):
+        c = modes.ecb(PLAIN, encrypt)
+        assert isinstance(c, blob.Blob)
+        assert modes.ecb(c, decrypt) == PLAIN
+
+    def test_repeated_blocks(self):
+        c = modes.ecb(b"A" * 32, encrypt)
+        assert c[:16] == c[16:]
+
+    def test_parallel(self):
+        assert modes.ecb(PLAIN, encrypt, workers=3) == modes.ecb(PLAIN, encrypt)
+
+    def test_bad_size(self):
+        with pytest.raises(BlobError):
+            modes.ecb(b"A" * 17, encrypt)
+
+
+# --- CBC ---
+
+class TestCBC:
+    def test_first_block(self):
+        c = modes.cbc_encrypt(PLAIN, encrypt, IV)
+        assert c[:16] == encrypt(blob.utils.xor_str(PLAIN[:16], IV))
+
+    def test_roundtrip(self):
+        c = modes.cbc_encrypt(PLAIN, encrypt, IV)
+        assert modes.cbc_decrypt(c, decrypt, IV) == PLAIN
+        assert modes.cbc_decrypt(c, decrypt, IV, workers=4) == PLAIN
+
+    def test_bit_flipping(self):
+        c = bytearray(modes.cbc_encrypt(PLAIN, encrypt, IV).data)
+        c[0] ^= 0x01
+        p = modes.cbc_decrypt(bytes(c), decrypt, IV).data
+        assert p[16] == PLAIN[16] ^ 0x01
+        assert p[32:] == PLAIN[32:]
+
+    def test_bad_iv(self):
+        with pytest.raises(BlobError):
+            modes.cbc_encrypt(PLAIN, encrypt, b"short")
+
+
+# --- Stream Modes ---
+
+class TestStreamModes:
+    def test_ctr_roundtrip(self):
+        data = PLAIN[:-5]
+        c = modes.ctr(data, encrypt, nonce=b"\x00" * 8, byteorder='little')
+        assert len(c.data) == len(data)
+        assert modes.ctr(c, encrypt, nonce=b"\x00" * 8, byteorder='little') == data
+
+    def test_ctr_counter_blocks(self):
+        seen = [ ]
+        modes.ctr(b"\x00" * 40, lambda b: seen.append(b) or b, nonce=b"N" * 8, counter=1, byteorder='little')
+        assert seen == [ b"N" * 8 + i.to_bytes(8, 'little') for i in (1, 2, 3) ]
+
+    def test_ctr_full_block_counter(self):
+        c = modes.ctr(b"\x00" * 32, lambda b: b, counter=int.from_bytes(b"\xff" * 16, 'big'))
+        assert c == b"\xff" * 16 + b"\x00" * 16
+
+    def test_ctr_parallel(self):
+        assert modes.ctr(PLAIN, encrypt, workers=3) == modes.ctr(PLAIN, encrypt)
+
+    def test_ofb_roundtrip(self):
+        data = PLAIN[:-3]
+        c = modes.ofb(data, encrypt, IV)
+        assert modes.ofb(c, encrypt, IV) == data
+
+    def test_cfb_roundtrip(self):
+        data = PLAIN[:-7]
+        c = modes.cfb_encrypt(data, encrypt, IV)
+        assert c[:16] == blob.utils.xor_str(data[:16], encrypt(IV))
+        assert modes.cfb_decrypt(c, encrypt, IV) == data
+        assert modes.cfb_decrypt(c, encrypt, IV, workers=2) == data
+
+    def test_empty(self):
+        assert modes.ctr(b"", encrypt) == b""
+        assert modes.cbc_decrypt(b"", decrypt, IV) == b""
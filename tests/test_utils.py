@@ -1,8 +1,15 @@
+import collections
 import functools
+import json
+import math
 import operator
 import random
+import re
+
+import pytest
 
 import blob
+from blob.pyecm import pyecm
 
 
 # --- Factoring ---
@@ -37,6 +44,223 @@ class TestFactor:
         result = sorted(blob.utils.factor(64))
         assert functools.reduce(operator.__mul__, result) == 64
 
+    def test_factor_semiprime(self):
+        # too big for trial division, so this goes through ECM
+        assert sorted(blob.utils.factor(3000000019 * 7000000001)) == [3000000019, 7000000001]
+
+    @pytest.mark.parametrize("engine", ["weierstrass", "montgomery"])
+    def test_factor_engines(self, engine):
+        n = 1000003**2 * 3000000019
+        assert sorted(blob.utils.factor(n, engine)) == [1000003, 1000003, 3000000019]
+
+    def test_factor_montgomery_larger(self):
+        # 14- and 20-digit factors: far too slow for the Weierstrass engine without gmpy
+        p, q = 30000000000011, 70000000000000000013
+        assert sorted(blob.utils.factor(p * q)) == [p, q]
+
+    def test_factor_prime_power(self):
+        assert blob.utils.factor(1000003**3) == [1000003] * 3
+
+    def test_factor_bad_engine(self):
+        with pytest.raises(ValueError):
+            blob.utils.factor(1000003 * 1000033, 'edwards')
+
+
+
+
+class TestBatchGCD:
+    PRIMES = [ 1000000007, 998244353, 1000000009, 10000000019, 2147483647, 4294967311 ]
+
+    def brute_force(self, moduli):
+        return [ math.gcd(n, functools.reduce(operator.mul, moduli[:i] + moduli[i+1:], 1)) for i, n in enumerate(moduli) ]
+
+    def test_shared_primes(self):
+        p, q, r, s, t, u = self.PRIMES
+        moduli = [ p * q, r * s, p * r, t * u, 15 ]
+        assert blob.utils.batch_gcd(moduli) == [ p, r, p * r, 1, 1 ]
+
+    def test_random(self):
+        rng = random.Random(2)
+        primes = [ pyecm.next_prime(rng.getrandbits(80)) for _ in range(40) ]
+        moduli = [ rng.choice(primes) * rng.choice(primes) for _ in range(57) ]
+        assert blob.utils.batch_gcd(moduli) == self.brute_force(moduli)
+
+    def test_repeated(self):
+        n = self.PRIMES[0] * self.PRIMES[1]
+        assert blob.utils.batch_gcd([ n, n, 35 ]) == [ n, n, 1 ]
+
+    def test_small_inputs(self):
+        assert blob.utils.batch_gcd([ ]) == [ ]
+        assert blob.utils.batch_gcd([ 35 ]) == [ 1 ]
+        with pytest.raises(ValueError):
+            blob.utils.batch_gcd([ 35, 0 ])
+
+    def test_workers(self):
+        p, q, r, s, t, u = self.PRIMES
+        moduli = [ p * q, r * s, p * r, t * u, q * u ]
+        assert blob.utils.batch_gcd(moduli, workers=2) == self.brute_force(moduli)
+
+# --- pyecm ---
+
+class TestPyecm:
+    def test_next_prime(self):
+        primes = [ p for p in range(2, 3000) if all(p % d for d in range(2, p)) ]
+        assert [ pyecm.next_prime(p - 1) for p in primes ] == primes
+
+    def test_next_prime_large(self):
+        # around the end of the table, sieved windows, and a base-2 strong pseudoprime (2^64 + 1)
+        assert pyecm.next_prime((1 << 21) - 1) == 2097169
+        assert pyecm.next_prime(1 << 22) == 4194319
+        assert pyecm.next_prime(10**12) == 1000000000039
+        assert pyecm.next_prime(1 << 64) == 18446744073709551629
+
+    def test_root(self):
+        assert pyecm.root(1000003**3, 3) == (1000003, True)
+        r, exact = pyecm.root(1000003**3 + 1, 3)
+        assert (r, bool(exact)) == (1000003, False)
+        assert pyecm.sqrt(10**40 - 1) == 10**20 - 1
+
+    def test_isprime_small(self):
+        assert [ n for n in range(-5, 5000) if pyecm.isprime(n) ] == [ p for p in range(2, 5000) if all(p % d for d in range(2, p)) ]
+
+    def test_isprime_pseudoprimes(self):
+        # a Carmichael number, strong pseudoprimes to the bases below each MR_BASES limit, and 2^64 + 1
+        for n in (561, 3215031751, 3825123056546413051, 318665857834031151167461, 3317044064679887385961981, (1 << 64) + 1):
+            assert not pyecm.isprime(n)
+        # Mersenne primes, through Miller-Rabin and BPSW
+        for e in (61, 89, 127, 521):
+            assert pyecm.isprime((1 << e) - 1)
+        assert not pyecm.isprime((1 << 67) - 1)
+
+    def test_strong_lucas(self):
+        # the smallest strong Lucas pseudoprimes (with Selfridge's parameters) pass, as they should
+        assert all(pyecm.strong_lucas(n) for n in (5459, 5777, 10877, 16109, 18971))
+        assert not pyecm.strong_lucas(3825123056546413051)
+        assert pyecm.jacobi(1001, 9907) == -1
+
+    def test_isprime_many(self):
+        p = (1 << 89) - 1
+        numbers = [ p, 15, p, 2, p * 3, 1 ]
+        assert pyecm.isprime_many(numbers) == [ True, False, True, True, False, False ]
+        assert pyecm.isprime_many(numbers, workers=2) == [ True, False, True, True, False, False ]
+        pyecm.isprime.cache_clear()
+        pyecm.isprime_many(numbers)
+        assert pyecm.isprime.cache_info().misses == 5
+
+    def test_invert(self):
+        assert pyecm.invert(3, 7) == 5
+        if not pyecm.GMPY_EXISTS: # gmpy raises ZeroDivisionError instead
+            assert pyecm.invert(6, 9) == 0
+
+    # --- quick methods ---
+
+    Q = 1267650600228229401496703205653 # next_prime(2**100), with nothing special about it
+
+    def test_fermat(self):
+        q = pyecm.next_prime(self.Q + 10**6)
+        assert pyecm.fermat(self.Q * q, 1000) == self.Q
+        assert pyecm.fermat(self.Q * 1000003, 1000) == 1
+
+    def test_brent_rho(self):
+        assert pyecm.brent_rho(1000003 * self.Q, 5000) == 1000003
+
+    @pytest.mark.parametrize("method,p,bounds", [
+        # p - 1 = 4 * (11 primes below 1000), and then times 50021 for stage 2
+        ("pm1", 444331104252985446069376126469, (10000, 200000)),
+        ("pm1", 160276202207522769082387597636973, (10000, 200000)),
+        # the same, for p + 1 (with p = 3 mod 4)
+        ("pp1", 20958910696460382156100123, (5000, 100000)),
+        ("pp1", 696788203995763293037206936051091, (5000, 100000)),
+    ])
+    def test_smooth(self, method, p, bounds):
+        f = pyecm.QUICK_METHODS[method]
+        assert f(p * self.Q, *bounds) == p
+
+    def test_stage2(self):
+        p = 160276202207522769082387597636973
+        assert pyecm.pollard_pm1(p * self.Q, 10000, 10000) == 1
+
+    def test_stages(self):
+        n = 444331104252985446069376126469 * self.Q
+        assert sorted(pyecm.quick_split(n, pyecm.DEFAULT_STAGES, False)) == [ 444331104252985446069376126469, self.Q ]
+        assert pyecm.quick_split(n, [ ("fermat", (10,)) ], False) == [ n ]
+        assert sorted(blob.utils.factor(1000003 * 1000033, stages=())) == [ 1000003, 1000033 ]
+        with pytest.raises(ValueError):
+            blob.utils.factor(1000003 * 1000033, stages=[ ("squfof", ()) ])
+
+    def test_measure_inv_c(self):
+        assert pyecm.measure_inv_c(bits=64, count=20, repeat=1) > 0
+
+    # --- budgets and checkpoints ---
+
+    P, R = 100000000000031, 300000000000089 # too big for the quick methods with these stages
+
+    def test_budget_curves(self):
+        with pytest.raises(pyecm.Stopped) as e:
+            list(pyecm.factors(6 * self.P * self.R, False, False, 10, 1, 'montgomery', (), pyecm.Budget(curves=3)))
+        assert e.value.reason == 'out of curves'
+        assert e.value.found == [ 2, 3 ]
+        assert e.value.remaining == [ self.P * self.R ]
+        assert e.value.checkpoint is None
+
+    def test_budget_time(self):
+        with pytest.raises(pyecm.Stopped) as e:
+            blob.utils.factor(pyecm.next_prime(10**25) * pyecm.next_prime(10**26), budget=0.2)
+        assert e.value.reason == 'out of time'
+
+    def test_budget_cancel(self):
+        budget = pyecm.Budget()
+        budget.cancel()
+        with pytest.raises(pyecm.Stopped) as e:
+            blob.utils.factor(5 * self.P * self.R, budget=budget)
+        assert e.value.reason == 'cancelled'
+        assert e.value.found == [ 5 ]
+
+    @pytest.mark.parametrize("engine,p,q", [ ("montgomery", P, R), ("weierstrass", 3000000019, 7000000001) ])
+    def test_checkpoint_resume(self, tmp_path, engine, p, q):
+        path = tmp_path / "factor.json"
+        n = 6 * p * q
+        with pytest.raises(pyecm.Stopped) as e:
+            list(pyecm.factors(n, False, False, 10, 1, engine, (), pyecm.Budget(curves=2), path))
+        assert e.value.checkpoint == str(path)
+        assert json.loads(path.read_text())['state']['engine'] == engine
+        with pytest.raises(ValueError):
+            blob.utils.factor(n + 6, checkpoint=path)
+        assert sorted(blob.utils.factor(n, engine=engine, stages=(), checkpoint=path)) == [ 2, 3, p, q ]
+        assert not path.exists()
+
+    # --- quadratic sieve ---
+
+    def test_sqrt_mod(self):
+        for p in (3, 5, 13, 17, 41, 97, 257, 65537, 1000000009):
+            for a in (2, 3, 5, 7, 10, 12345):
+                if pow(a, (p - 1) // 2, p) == 1:
+                    r = pyecm.sqrt_mod(a, p)
+                    assert r * r % p == a % p
+
+    @pytest.mark.parametrize("workers", [ None, 2 ])
+    def test_siqs(self, workers):
+        q = 7000000000000000000037
+        assert pyecm.siqs(self.R * q, False, workers) in (self.R, q)
+
+    def test_siqs_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(pyecm, "NUMPY_EXISTS", False)
+        assert pyecm.siqs(self.P * self.R, False) in (self.P, self.R)
+
+    def test_siqs_small_factors(self):
+        assert pyecm.siqs(1000003**2, False) == 1000003
+        assert pyecm.siqs(101 * self.P * self.R, False) == 101
+
+    def test_factor_siqs(self):
+        # a 44-digit product of two 22-digit primes, which ECM alone takes far longer on
+        p, q = 3000000000000000000053, 7000000000000000000037
+        assert sorted(blob.utils.factor(6 * p * q)) == [ 2, 3, p, q ]
+        budget = pyecm.Budget(curves=1)
+        with pytest.raises(pyecm.Stopped) as e:
+            blob.utils.factor(p * q, stages=(), budget=budget)
+        assert e.value.budget is budget
+        assert e.value.remaining == [ p * q ]
+
 
 # --- Bit String Conversions ---
 
@@ -55,6 +279,10 @@ class TestBitStr:
         assert blob.utils.from_bitstr('10111000') == b'\xb8'
         assert blob.utils.from_bitstr('01111101') == b'\x7d'
 
+    def test_empty(self):
+        assert blob.utils.to_bitstr(b'') == ''
+        assert blob.utils.from_bitstr('') == b''
+
     def test_roundtrip(self):
         for val in [b'\x00', b'\xff', b'\x42', b'\xab\xcd']:
             assert blob.utils.from_bitstr(blob.utils.to_bitstr(val)) == val
@@ -135,6 +363,111 @@ class TestStr:
         assert blob.utils.or_str(data, b'\x00\x00\x00') == data
 
 
+# --- N-grams ---
+
+class TestCountNgrams:
+    def test_matches_naive(self):
+        data = bytes(random.randrange(4) for _ in range(257))
+        for n in range(1, 11):
+            for overlapping in (True, False):
+                step = 1 if overlapping else n
+                naive = collections.Counter(int.from_bytes(data[i:i+n], 'big') for i in range(0, len(data) - n + 1, step))
+                assert blob.utils.count_ngrams(data, n, overlapping) == naive
+
+    def test_empty(self):
+        assert blob.utils.count_ngrams(b"", 2) == {}
+
+    def test_numpy_chunks(self, monkeypatch):
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(blob.utils, "_NGRAM_CHUNK", 1000)
+        data = bytes(random.randrange(256) for _ in range(20000))
+        for n in (1, 2, 3):
+            for overlapping in (True, False):
+                step = 1 if overlapping else n
+                naive = collections.Counter(int.from_bytes(data[i:i+n], 'big') for i in range(0, len(data) - n + 1, step))
+                assert blob.utils._count_ngrams_numpy(data, n, overlapping) == naive
+                assert blob.utils.count_ngrams(data, n, overlapping) == naive
+
+
+# --- Strings ---
+
+class TestFindStrings:
+    def test_ascii(self):
+        assert blob.utils.find_strings(b"abc\x00abcd\x7fabcde", 4) == [(4, b"abcd"), (9, b"abcde")]
+
+    def test_utf16(self):
+        data = b"\x00" + "abcd".encode("utf-16le") + b"\x01"
+        assert blob.utils.find_strings(data, 4, 'utf-16le') == [(1, "abcd".encode("utf-16le"))]
+        assert blob.utils.find_strings(data, 4, 'utf-16be') == [(0, b"\x00a\x00b\x00c\x00d")]
+
+    def test_empty(self):
+        assert blob.utils.find_strings(b"", 4, 'utf-16le') == []
+
+
+# --- Byte Runs ---
+
+class TestByteRuns:
+    def test_runs(self):
+        data = b"xAAAAAy" + bytes(20) + b"z"
+        assert blob.utils.byte_runs(data, 4) == [(1, 5, 0x41), (7, 20, 0)]
+
+    def test_exact_and_short(self):
+        assert blob.utils.byte_runs(b"AAAA", 4) == [(0, 4, 0x41)]
+        assert blob.utils.byte_runs(b"AAA", 4) == []
+        assert blob.utils.byte_runs(b"", 4) == []
+
+    def test_matches_naive(self):
+        data = bytes(random.choice(b"ab") for _ in range(500))
+        naive = [ (m.start(), len(m.group()), m.group()[0]) for m in re.finditer(rb'(.)\1{2,}', data) ]
+        assert blob.utils.byte_runs(data, 3) == naive
+
+
+# --- Endianness ---
+
+class TestByteswap:
+    def test_byteswap(self):
+        assert blob.utils.byteswap(b'ABCDEFGH', 4) == b'DCBAHGFE'
+        assert blob.utils.byteswap(b'ABCDEF', 3) == b'CBAFED'
+
+    def test_byteswap_bad_size(self):
+        with pytest.raises(ValueError):
+            blob.utils.byteswap(b'ABC', 2)
+
+    def test_reverse_bits(self):
+        assert blob.utils.reverse_bits(b'\x01\x02\xaa') == b'\x80\x40\x55'
+
+
+# --- Bit Counting ---
+
+class TestBitCounting:
+    def test_popcount(self):
+        assert blob.utils.popcount(b'\xaa\x01') == 5
+
+    def test_hamming(self):
+        assert blob.utils.hamming(b'this is a test', b'wokka wokka!!!') == 37
+
+    def test_hamming_unequal(self):
+        with pytest.raises(blob.errors.XORError):
+            blob.utils.hamming(b'A', b'AB')
+
+    def test_hamming_matrix(self):
+        assert blob.utils.hamming_matrix([b'\x00', b'\x0f', b'\xff']) == [[0, 4, 8], [4, 0, 4], [8, 4, 0]]
+
+
+# --- XOR Scoring ---
+
+class TestXorScoring:
+    def test_byte_log_weights(self):
+        w = blob.utils.byte_log_weights()
+        assert len(w) == 256
+        assert w[ord(' ')] > w[ord('e')] > w[ord('E')] > w[0]
+
+    def test_score_table(self):
+        t = blob.utils.xor_score_table({0: 1.0})
+        assert t[0x42][0x42] == max(t[0x42])
+        assert blob.utils.xor_score_table() is blob.utils.xor_score_table()
+
+
 # --- Insert Separators ---
 
 class TestInsertSeparators: